@@ -4,13 +4,13 @@ Handles viewing, filtering, and managing access logs for the admin dashboard
 """
 import requests
 from django.db.models import Count, Q
-from django.http import HttpResponse
 from django.utils import timezone
 from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .csv_export import csv_response, export_rows
 from .models import AccessLog
 from .permissions import IsAdminUser
 from .serializers import AccessLogSerializer, AccessLogListSerializer, AccessLogStatsSerializer
@@ -172,11 +172,8 @@ class AccessLogExportView(APIView):
     permission_classes = [permissions.IsAuthenticated, IsAdminUser]
     
     def get(self, request):
-        import csv
-        from io import StringIO
-        
         # Get filtered queryset (reuse logic from list view)
-        queryset = AccessLog.objects.select_related('user').all()
+        queryset = AccessLog.objects.all()
         
         # Apply same filters as list view
         user_id = request.query_params.get('user_id', None)
@@ -201,40 +198,45 @@ class AccessLogExportView(APIView):
         
         queryset = queryset.order_by('-login_timestamp')
         
-        # Create CSV
-        output = StringIO()
-        writer = csv.writer(output)
-        
-        # Write header
-        writer.writerow([
+        header = [
             'ID', 'Username', 'Email', 'Role', 'Login Time', 'Logout Time',
             'Session Duration (min)', 'IP Address', 'Location', 'Status',
             'Device Type', 'Browser', 'Operating System'
-        ])
-        
-        # Write data rows
-        for log in queryset:
-            writer.writerow([
-                log.id,
-                log.username,
-                log.email,
-                log.role,
-                log.login_timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-                log.logout_timestamp.strftime('%Y-%m-%d %H:%M:%S') if log.logout_timestamp else 'Active',
-                log.session_duration if log.session_duration else 'N/A',
-                log.ip_address,
-                f"{log.location_city}, {log.location_country}" if log.location_city else 'Unknown',
-                log.status,
-                log.device_type,
-                log.browser,
-                log.operating_system,
-            ])
-        
-        # Create HTTP response
-        response = HttpResponse(output.getvalue(), content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="access_logs_{timezone.now().strftime("%Y%m%d_%H%M%S")}.csv"'
+        ]
+        fields = (
+            'id', 'username', 'email', 'role', 'login_timestamp', 'logout_timestamp',
+            'ip_address', 'location_city', 'location_country', 'status',
+            'device_type', 'browser', 'operating_system',
+        )
         
-        return response
+        def format_row(values):
+            (log_id, username, email, role, login_timestamp, logout_timestamp,
+             ip_address, city, country, log_status, device_type, browser, operating_system) = values
+            session_duration = None
+            if logout_timestamp and login_timestamp:
+                session_duration = int((logout_timestamp - login_timestamp).total_seconds() / 60)
+            return [
+                log_id,
+                username,
+                email,
+                role,
+                login_timestamp.strftime('%Y-%m-%d %H:%M:%S'),
+                logout_timestamp.strftime('%Y-%m-%d %H:%M:%S') if logout_timestamp else 'Active',
+                session_duration if session_duration else 'N/A',
+                ip_address,
+                f"{city}, {country}" if city else 'Unknown',
+                log_status,
+                device_type,
+                browser,
+                operating_system,
+            ]
+        
+        return csv_response(
+            request,
+            f'access_logs_{timezone.now().strftime("%Y%m%d_%H%M%S")}',
+            header,
+            export_rows(queryset, fields, format_row),
+        )
 
 
 @api_view(['GET'])
@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import User, ParkingSlot, Booking, PricingRate, Vehicle, ParkingLot, AccessLog, ZonePricingRate
+from django.db import transaction
+
+from . import occupancy_snapshot, pricing_engine
+from .models import User, ParkingSlot, Booking, PricingRate, Vehicle, ParkingLot, AccessLog, ZonePricingRate, PublicHoliday, Geofence
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
@@ -21,21 +24,25 @@ class ParkingSlotAdmin(admin.ModelAdmin):
     
     def set_car_type(self, request, queryset):
         queryset.update(vehicle_type='car')
+        transaction.on_commit(occupancy_snapshot.bump_version)
         self.message_user(request, f'{queryset.count()} slots updated to Car type')
     set_car_type.short_description = "Set selected slots to Car type"
     
     def set_bike_type(self, request, queryset):
         queryset.update(vehicle_type='bike')
+        transaction.on_commit(occupancy_snapshot.bump_version)
         self.message_user(request, f'{queryset.count()} slots updated to Bike type')
     set_bike_type.short_description = "Set selected slots to Bike type"
     
     def set_truck_type(self, request, queryset):
         queryset.update(vehicle_type='truck')
+        transaction.on_commit(occupancy_snapshot.bump_version)
         self.message_user(request, f'{queryset.count()} slots updated to Truck type')
     set_truck_type.short_description = "Set selected slots to Truck type"
     
     def set_any_type(self, request, queryset):
         queryset.update(vehicle_type='any')
+        transaction.on_commit(occupancy_snapshot.bump_version)
         self.message_user(request, f'{queryset.count()} slots updated to Any Vehicle type')
     set_any_type.short_description = "Set selected slots to Any Vehicle type"
 
@@ -128,10 +135,27 @@ class ZonePricingRateAdmin(admin.ModelAdmin):
     
     def activate_rates(self, request, queryset):
         queryset.update(is_active=True)
+        # update() skips the signals that invalidate the pricing table
+        transaction.on_commit(pricing_engine.bump_version)
         self.message_user(request, f'{queryset.count()} rates activated')
     activate_rates.short_description = "Activate selected rates"
     
     def deactivate_rates(self, request, queryset):
         queryset.update(is_active=False)
+        transaction.on_commit(pricing_engine.bump_version)
         self.message_user(request, f'{queryset.count()} rates deactivated')
     deactivate_rates.short_description = "Deactivate selected rates"
+
+
+@admin.register(PublicHoliday)
+class PublicHolidayAdmin(admin.ModelAdmin):
+    list_display = ('date', 'name')
+    search_fields = ('name',)
+    date_hierarchy = 'date'
+
+
+@admin.register(Geofence)
+class GeofenceAdmin(admin.ModelAdmin):
+    list_display = ('name', 'parking_zone', 'shape', 'radius_meters', 'is_active')
+    list_filter = ('shape', 'parking_zone', 'is_active')
+    search_fields = ('name',)
@@ -0,0 +1,230 @@
+"""
+Optional in-process slot availability index.
+
+Holds one bit per slot per 5-minute step over a rolling horizon, packed into
+a (slots x bytes) NumPy matrix built from active bookings. "Which of these
+slots are free between 17:00 and 19:30" is then one AND of the matrix with a
+window mask followed by any() per row, instead of a SQL overlap query.
+
+The index only narrows the candidates: free_slots_from_index() re-checks
+the slots it reports free with the database filter, so a booking the index
+has not seen yet never shows up as a free slot. Bits cover every step a
+booking touches, so the index is only consulted for windows whose start and
+end fall on step boundaries, where a slot it reports busy really was busy
+when the index last saw it.
+
+Freshness comes from a version counter in the default cache, bumped on
+commit by the Booking and ParkingSlot receivers in api/signals.py. A booking
+write also stores the slot it touched under the new version, and an index
+that is behind replays those changes by recomputing just the changed rows;
+slot writes, or changes that have expired from the cache, make it rebuild.
+An index is rebuilt in full once it is older than AVAILABILITY_INDEX_MAX_AGE
+seconds, which also moves its horizon forward. Without NumPy installed,
+get_index() returns None and callers fall back to the database.
+"""
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .booking_conflicts import free_slots
+from .models import Booking, ParkingSlot
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+RESOLUTION_MINUTES = 5
+HORIZON_DAYS = 7
+RESOLUTION = timedelta(minutes=RESOLUTION_MINUTES)
+VERSION_CACHE_KEY = 'availability_index_version'
+CHANGES_CACHE_KEY = 'availability_index_changes:{}'
+# More changes than this behind and a full rebuild is cheaper than the replay
+MAX_REPLAY = 500
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def _max_age():
+    return getattr(settings, 'AVAILABILITY_INDEX_MAX_AGE', 60)
+
+
+def bump_version(slot_ids=None):
+    """
+    Tell every process's index about a write: the slots whose bookings
+    changed, or None when slots themselves changed and indexes must rebuild
+    """
+    try:
+        version = cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        cache.add(VERSION_CACHE_KEY, 1, timeout=None)
+        return
+    if slot_ids is not None:
+        # Indexes older than the max age rebuild anyway, so nobody needs the change after that
+        cache.set(CHANGES_CACHE_KEY.format(version), sorted(set(slot_ids)), _max_age())
+
+
+def current_version():
+    return cache.get(VERSION_CACHE_KEY, 0)
+
+
+class SlotAvailabilityIndex:
+    """Packed per-slot occupancy bitmaps over [origin, origin + steps * RESOLUTION)"""
+
+    def __init__(self, origin, steps, slot_ids, bitmap, version, built_at=None):
+        self.origin = origin
+        self.steps = steps
+        self.slot_ids = np.asarray(slot_ids, dtype=np.int64)
+        self.rows = {slot_id: row for row, slot_id in enumerate(slot_ids)}
+        self.bitmap = bitmap
+        self.version = version
+        self.built_at = time.monotonic() if built_at is None else built_at
+
+    @classmethod
+    def build(cls, version=None, now=None):
+        """Build the index from all slots and the active bookings in the horizon"""
+        now = now or timezone.now()
+        origin = now.replace(minute=now.minute - now.minute % RESOLUTION_MINUTES, second=0, microsecond=0)
+        steps = HORIZON_DAYS * 24 * 60 // RESOLUTION_MINUTES
+        horizon_end = origin + steps * RESOLUTION
+
+        slot_ids = list(ParkingSlot.objects.order_by('pk').values_list('pk', flat=True))
+        bookings = Booking.objects.filter(is_active=True, start_time__lt=horizon_end, end_time__gt=origin)
+        bitmap = cls._pack(origin, steps, slot_ids, bookings)
+        return cls(origin, steps, slot_ids, bitmap, current_version() if version is None else version)
+
+    @classmethod
+    def _pack(cls, origin, steps, slot_ids, bookings):
+        """Packed bitmap rows for slot_ids from the bookings that overlap the horizon"""
+        rows = {slot_id: row for row, slot_id in enumerate(slot_ids)}
+        grid = np.zeros((len(slot_ids), steps), dtype=bool)
+        for slot_id, start_time, end_time in bookings.values_list('slot_id', 'start_time', 'end_time').iterator():
+            row = rows.get(slot_id)
+            if row is None:
+                continue
+            first, last = cls._step_range(origin, start_time, end_time, steps)
+            grid[row, first:last] = True
+        return np.packbits(grid, axis=1)
+
+    def with_slots_recomputed(self, slot_ids, version):
+        """
+        A copy of the index at version with the rows of slot_ids rebuilt from
+        their bookings, or None if one of them is not in the index
+        """
+        slot_ids = sorted(slot_ids)
+        if any(slot_id not in self.rows for slot_id in slot_ids):
+            return None
+        bitmap = self.bitmap.copy()
+        if slot_ids:
+            bookings = Booking.objects.filter(
+                slot_id__in=slot_ids,
+                is_active=True,
+                start_time__lt=self.origin + self.steps * RESOLUTION,
+                end_time__gt=self.origin,
+            )
+            bitmap[[self.rows[slot_id] for slot_id in slot_ids]] = self._pack(self.origin, self.steps, slot_ids, bookings)
+        return SlotAvailabilityIndex(self.origin, self.steps, self.slot_ids, bitmap, version, built_at=self.built_at)
+
+    @staticmethod
+    def _step_range(origin, start_time, end_time, steps):
+        """Steps touched by [start_time, end_time), clipped to the horizon"""
+        first = (start_time - origin) // RESOLUTION
+        last = -((origin - end_time) // RESOLUTION)  # ceiling division
+        return max(first, 0), min(last, steps)
+
+    def covers(self, start_time, end_time):
+        return self.origin <= start_time < end_time <= self.origin + self.steps * RESOLUTION
+
+    def answers_exactly(self, start_time, end_time):
+        """Whether the window is inside the horizon and on step boundaries, where bits match the database"""
+        return self.covers(start_time, end_time) and is_step_aligned(start_time) and is_step_aligned(end_time)
+
+    def free_slot_ids(self, start_time, end_time, slot_ids=None):
+        """
+        Return the ids of slots with no booking in [start_time, end_time).
+
+        Args:
+            start_time: Start of the window; must be inside the horizon
+            end_time: End of the window; must be inside the horizon
+            slot_ids: Restrict the answer to these slots (default: all)
+        """
+        if not self.covers(start_time, end_time):
+            raise ValueError("Window is outside the availability index horizon.")
+
+        first, last = self._step_range(self.origin, start_time, end_time, self.steps)
+        window = np.zeros(self.steps, dtype=bool)
+        window[first:last] = True
+        lo, hi = first // 8, -(-last // 8)
+        mask = np.packbits(window)[lo:hi]
+
+        if slot_ids is None:
+            rows = slice(None)
+            candidates = self.slot_ids
+        else:
+            rows = np.fromiter((self.rows[s] for s in slot_ids if s in self.rows), dtype=np.int64)
+            candidates = self.slot_ids[rows]
+
+        busy = (self.bitmap[rows, lo:hi] & mask).any(axis=1)
+        return candidates[~busy].tolist()
+
+
+def is_step_aligned(dt):
+    return dt.minute % RESOLUTION_MINUTES == 0 and dt.second == 0 and dt.microsecond == 0
+
+
+def get_index():
+    """
+    Return the process-wide index, rebuilding it if it is stale.
+
+    Returns None when NumPy is not installed.
+    """
+    global _index
+    if np is None:
+        return None
+
+    version = current_version()
+    index = _index
+    fresh = index is not None and time.monotonic() - index.built_at < _max_age()
+    if fresh and index.version == version:
+        return index
+
+    with _index_lock:
+        if _index is None or _index is index:
+            _index = (fresh and _replay(index, version)) or SlotAvailabilityIndex.build(version=version)
+        return _index
+
+
+def _replay(index, version):
+    """index brought up to version from the recorded booking changes, or None if it has to be rebuilt"""
+    if not index.version < version <= index.version + MAX_REPLAY:
+        return None
+    keys = [CHANGES_CACHE_KEY.format(v) for v in range(index.version + 1, version + 1)]
+    changes = cache.get_many(keys)
+    if len(changes) != len(keys):
+        return None
+    return index.with_slots_recomputed(set().union(*changes.values()), version)
+
+
+def free_slots_from_index(slots, start_time, end_time):
+    """
+    Narrow a ParkingSlot queryset to the slots free for [start_time, end_time),
+    like booking_conflicts.free_slots(). When the index answers the window,
+    only the slots it reports free are checked against the database.
+    """
+    index = get_index()
+    if index is not None and index.answers_exactly(start_time, end_time):
+        slots = slots.filter(pk__in=index.free_slot_ids(start_time, end_time))
+    return free_slots(slots, start_time, end_time)
+
+
+def get_free_slot_ids(start_time, end_time, slot_ids=None):
+    """Ids of slots free for [start_time, end_time), by free_slots_from_index()"""
+    slots = ParkingSlot.objects.all()
+    if slot_ids is not None:
+        slots = slots.filter(pk__in=list(slot_ids))
+    return list(free_slots_from_index(slots, start_time, end_time).order_by('pk').values_list('pk', flat=True))
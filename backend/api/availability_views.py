@@ -0,0 +1,68 @@
+from django.db.models import Count, Q
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .availability_index import free_slots_from_index
+from .models import ParkingSlot
+from .serializers import AvailableSlotSerializer, SlotAvailabilitySearchSerializer
+
+
+class SlotAvailabilityView(APIView):
+    """
+    Search for slots that are free for a given time window.
+
+    Query Parameters:
+    - zone: Parking zone code (optional)
+    - vehicle_type: Vehicle type; slots accepting 'any' are included (optional)
+    - start: Start of the window (ISO 8601, required)
+    - end: End of the window (ISO 8601, required)
+    - page: Page number for pagination
+    - page_size: Number of results per page (max 100)
+
+    Two queries in total: one grouped query for the facets (which also gives
+    the total count) and one for the requested page. Windows on 5-minute
+    boundaries run the per-slot booking subquery only over the slots the
+    in-process availability index reports free (see availability_index).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        params = SlotAvailabilitySearchSerializer(data=request.query_params)
+        if not params.is_valid():
+            return Response({'error': params.errors}, status=status.HTTP_400_BAD_REQUEST)
+        filters = params.validated_data
+
+        slots = ParkingSlot.objects.all()
+        if filters.get('zone'):
+            slots = slots.filter(parking_zone=filters['zone'])
+        if filters.get('vehicle_type'):
+            slots = slots.filter(Q(vehicle_type=filters['vehicle_type']) | Q(vehicle_type='any'))
+        slots = free_slots_from_index(slots, filters['start'], filters['end'])
+
+        facets = {'vehicle_type': {}, 'floor': {}, 'section': {}}
+        total_count = 0
+        groups = slots.values('vehicle_type', 'floor', 'section').annotate(count=Count('id')).order_by()
+        for group in groups:
+            total_count += group['count']
+            for field, counts in facets.items():
+                counts[group[field]] = counts.get(group[field], 0) + group['count']
+
+        page = filters['page']
+        page_size = filters['page_size']
+        start_idx = (page - 1) * page_size
+        page_slots = (
+            slots.select_related('parking_lot')
+            .order_by('floor', 'section', 'slot_number', 'id')[start_idx:start_idx + page_size]
+        )
+
+        return Response({
+            'start': filters['start'],
+            'end': filters['end'],
+            'count': total_count,
+            'page': page,
+            'page_size': page_size,
+            'total_pages': (total_count + page_size - 1) // page_size,
+            'facets': facets,
+            'results': AvailableSlotSerializer(page_slots, many=True).data,
+        }, status=status.HTTP_200_OK)
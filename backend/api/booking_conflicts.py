@@ -0,0 +1,279 @@
+"""
+Shared booking conflict engine.
+
+Every path that puts a booking on a slot (create, extend, early check-in and
+the overstay auto-extension task) asks the same two questions through this
+module: "can this slot hold [start, end)?" and "how far can this booking be
+extended before the next one starts?".
+
+Both questions are answered with a single probe of the partial
+(slot, start_time) index on active bookings. That is only exact because
+active bookings on a slot never overlap, which the database enforces with
+the `booking_slot_no_overlap` exclusion constraint (see Booking.Meta).
+Writers take a row lock on the slot with `slot_write_lock()` so concurrent
+requests for the same slot are serialised, and the constraint is the
+backstop for any write that bypasses the lock.
+"""
+import heapq
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.db.models import DateTimeField, FilteredRelation, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Booking, ParkingSlot, BOOKING_OVERLAP_CONSTRAINT
+
+
+class BookingConflictError(Exception):
+    """Raised when a slot cannot hold the requested time window."""
+
+
+def _pk(obj):
+    return getattr(obj, 'pk', obj)
+
+
+def _active_bookings(slot, exclude=None):
+    bookings = Booking.objects.filter(slot=_pk(slot), is_active=True)
+    if exclude is not None:
+        bookings = bookings.exclude(pk=_pk(exclude))
+    return bookings
+
+
+def is_slot_available(slot, start_time, end_time, exclude=None):
+    """
+    Check whether the slot can hold [start_time, end_time).
+
+    Active bookings on a slot are disjoint, so the only booking that can
+    overlap the window is the one that starts last before end_time.
+
+    Args:
+        slot: ParkingSlot instance or primary key
+        start_time: Start of the requested window
+        end_time: End of the requested window
+        exclude: Booking (or pk) to ignore, e.g. the booking being changed
+
+    Returns:
+        bool: True if no active booking overlaps the window
+    """
+    previous_end = (
+        _active_bookings(slot, exclude)
+        .filter(start_time__lt=end_time)
+        .order_by('-start_time')
+        .values_list('end_time', flat=True)
+        .first()
+    )
+    return previous_end is None or previous_end <= start_time
+
+
+def ensure_slot_available(slot, start_time, end_time, exclude=None):
+    """Raise BookingConflictError if the slot cannot hold the window."""
+    if not is_slot_available(slot, start_time, end_time, exclude=exclude):
+        raise BookingConflictError("This time slot is already booked.")
+
+
+def next_booking_start(slot, after, exclude=None):
+    """
+    Return the start time of the first active booking starting at or after
+    `after`, or None if the slot is free from then on.
+    """
+    return (
+        _active_bookings(slot, exclude)
+        .filter(start_time__gte=after)
+        .order_by('start_time')
+        .values_list('start_time', flat=True)
+        .first()
+    )
+
+
+def get_extension_limit(booking):
+    """
+    Latest end time the booking can be extended to.
+
+    Returns:
+        datetime or None: start of the next booking on the slot, or None if
+        the booking can be extended indefinitely
+    """
+    return next_booking_start(booking.slot_id, booking.end_time, exclude=booking)
+
+
+@contextmanager
+def slot_write_lock(slot):
+    """
+    Open a transaction holding a row lock on the slot.
+
+    Check availability again inside the block before writing: the lock makes
+    that check and the following write atomic with respect to other writers
+    on the same slot. An exclusion constraint violation raised by the write
+    is translated into BookingConflictError.
+    """
+    with slots_write_lock([slot]):
+        yield
+
+
+@contextmanager
+def slots_write_lock(slots):
+    """
+    slot_write_lock() for several slots at once.
+
+    Rows are locked in primary key order so two batches touching the same
+    slots cannot deadlock.
+    """
+    pks = sorted({_pk(slot) for slot in slots})
+    try:
+        with transaction.atomic():
+            list(
+                ParkingSlot.objects.select_for_update()
+                .filter(pk__in=pks)
+                .order_by('pk')
+                .values_list('pk', flat=True)
+            )
+            yield
+    except IntegrityError as e:
+        if BOOKING_OVERLAP_CONSTRAINT in str(e):
+            raise BookingConflictError("This time slot is already booked.") from e
+        raise
+
+
+def find_batch_conflicts(windows):
+    """
+    Check many (slot, start_time, end_time) windows with one query.
+
+    Windows are checked against active bookings and against each other; when
+    two windows in the batch overlap, the later one in the list is reported.
+
+    Returns:
+        dict mapping the index of each conflicting window to a reason
+    """
+    windows = [(_pk(slot), start, end) for slot, start, end in windows]
+    conflicts = {}
+    if not windows:
+        return conflicts
+
+    overlap = Q()
+    for slot_id, start, end in windows:
+        overlap |= Q(slot_id=slot_id, start_time__lt=end, end_time__gt=start)
+    existing = {}
+    for slot_id, start, end in Booking.objects.filter(overlap, is_active=True).values_list('slot_id', 'start_time', 'end_time'):
+        existing.setdefault(slot_id, []).append((start, end))
+
+    by_slot = {}
+    for i, (slot_id, start, end) in enumerate(windows):
+        if any(b_start < end and b_end > start for b_start, b_end in existing.get(slot_id, ())):
+            conflicts[i] = "This time slot is already booked."
+        else:
+            by_slot.setdefault(slot_id, []).append((start, end, i))
+
+    # Overlaps inside the batch: sweep each slot's remaining windows in start order
+    for slot_windows in by_slot.values():
+        slot_windows.sort()
+        kept_end = kept_index = None
+        for start, end, i in slot_windows:
+            if kept_end is not None and start < kept_end:
+                loser = max(i, kept_index)
+                conflicts[loser] = "Overlaps another booking in this request."
+                if loser == kept_index:
+                    kept_end, kept_index = end, i
+            else:
+                kept_end, kept_index = end, i
+    return conflicts
+
+
+def free_slots(slots, start_time, end_time):
+    """
+    Narrow a ParkingSlot queryset to the slots that can hold [start_time, end_time).
+
+    Applies the same rule as is_slot_available() as a correlated subquery, so
+    the whole filter runs as a single statement with one index probe per slot.
+    """
+    previous_end = (
+        Booking.objects.filter(slot=OuterRef('pk'), is_active=True, start_time__lt=end_time)
+        .order_by('-start_time')
+        .values('end_time')[:1]
+    )
+    # A slot with no earlier booking is treated as if one ended exactly at start_time
+    return slots.alias(
+        previous_booking_end=Coalesce(Subquery(previous_end), Value(start_time), output_field=DateTimeField())
+    ).filter(previous_booking_end__lte=start_time)
+
+
+def find_alternative_slots(slot, requested_start, requested_end, max_alternatives=3, horizon_hours=24):
+    """
+    Suggest the closest feasible alternatives when a booking conflicts.
+
+    Looks at the requested slot and every sibling slot in the same zone that
+    takes the same vehicle type, `horizon_hours` either side of the request.
+    All candidate slots and their active bookings in that horizon are read in
+    one query, ordered by (slot, start_time), and swept once to collect the
+    free gaps that can hold the full requested duration.
+
+    Args:
+        slot: The ParkingSlot that has a conflict
+        requested_start: The originally requested start time
+        requested_end: The originally requested end time
+        max_alternatives: Maximum number of alternatives to return
+        horizon_hours: How far before and after the request to search
+
+    Returns:
+        A list of dictionaries with slot_id, slot_number, start_time and
+        end_time, ordered by how far they move the booking from the request
+    """
+    duration = requested_end - requested_start
+    horizon = timedelta(hours=horizon_hours)
+    window_start = max(requested_start - horizon, timezone.now())
+    window_end = requested_end + horizon
+    if window_end - window_start < duration:
+        return []
+
+    siblings = ParkingSlot.objects.filter(Q(pk=slot.pk) | Q(
+        parking_zone=slot.parking_zone,
+        vehicle_type__in={slot.vehicle_type, 'any'},
+    ))
+    rows = (
+        siblings
+        .annotate(window_booking=FilteredRelation('booking', condition=Q(
+            booking__is_active=True,
+            booking__start_time__lt=window_end,
+            booking__end_time__gt=window_start,
+        )))
+        .order_by('pk', 'window_booking__start_time')
+        .values_list('pk', 'slot_number', 'window_booking__start_time', 'window_booking__end_time')
+    )
+
+    candidates = []
+
+    def consider(slot_id, slot_number, gap_start, gap_end):
+        if gap_end - gap_start < duration:
+            return
+        # The start inside the gap that is nearest to the requested start
+        start = min(max(requested_start, gap_start), gap_end - duration)
+        shift = abs(start - requested_start)
+        if shift == timedelta(0) and slot_id == slot.pk:
+            return
+        candidates.append((shift, slot_id != slot.pk, start, slot_number, slot_id))
+
+    current_id = current_number = None
+    cursor = window_start
+    for slot_id, slot_number, booking_start, booking_end in rows:
+        if slot_id != current_id:
+            if current_id is not None:
+                consider(current_id, current_number, cursor, window_end)
+            current_id, current_number, cursor = slot_id, slot_number, window_start
+        if booking_start is None:
+            continue
+        consider(slot_id, slot_number, cursor, booking_start)
+        cursor = max(cursor, booking_end)
+    if current_id is not None:
+        consider(current_id, current_number, cursor, window_end)
+
+    return [
+        {
+            'slot_id': slot_id,
+            'slot_number': slot_number,
+            'start_time': start,
+            'end_time': start + duration,
+            'message': 'Available slot' if slot_id == slot.pk else f'Slot {slot_number} available',
+        }
+        for _, _, start, slot_number, slot_id in heapq.nsmallest(max_alternatives, candidates)
+    ]
@@ -0,0 +1,114 @@
+"""
+Fan-out-on-read broadcast notifications.
+
+A system alert or maintenance notice is one BroadcastNotification row,
+optionally limited to a user role, instead of one Notification row per
+active user. Each user's feed and unread count merge in the broadcasts
+targeted at them that were sent after they joined.
+
+Read state is a per-user cursor (BroadcastCursor.read_through: every
+broadcast up to it is read, which is what "mark all as read" moves) plus a
+sparse BroadcastReceipt row when a user reads or deletes a single broadcast.
+Broadcasts are exposed in the notification API with ids of the form
+'broadcast-<id>'.
+"""
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from rest_framework import serializers
+
+from . import notification_counter
+from .models import BroadcastCursor, BroadcastNotification, BroadcastReceipt
+
+ID_PREFIX = 'broadcast-'
+# target_users values accepted by the alert endpoints -> audience_role
+AUDIENCES = {
+    'all': '',
+    'customers': 'customer',
+    'admins': 'admin',
+    'security': 'security',
+}
+
+
+def create_broadcast(notification_type, title, message, audience='all', created_by=None, additional_data=None):
+    """Send a notification to every user in the audience with a single insert"""
+    return BroadcastNotification.objects.create(
+        notification_type=notification_type,
+        title=title,
+        message=message,
+        audience_role=AUDIENCES.get(audience, ''),
+        created_by=created_by,
+        additional_data=additional_data or {},
+    )
+
+
+def _read_through(user):
+    return BroadcastCursor.objects.filter(user=user).values_list('read_through', flat=True).first()
+
+
+def visible_broadcasts(user):
+    """Broadcasts in the user's feed, with is_read annotated, newest first"""
+    receipts = BroadcastReceipt.objects.filter(broadcast=OuterRef('pk'), user=user)
+    read_through = _read_through(user)
+    is_read = Exists(receipts.filter(is_read=True))
+    if read_through is not None:
+        is_read = is_read | Q(created_at__lte=read_through)
+    return (
+        BroadcastNotification.objects
+        .filter(Q(audience_role='') | Q(audience_role=user.role), created_at__gte=user.date_joined)
+        .exclude(Exists(receipts.filter(is_deleted=True)))
+        .annotate(is_read=is_read)
+        .order_by('-created_at')
+    )
+
+
+def unread_count(user):
+    """Number of unread broadcasts in the user's feed"""
+    return visible_broadcasts(user).filter(is_read=False).count()
+
+
+def as_notification(broadcast, user_data):
+    """A broadcast shaped like NotificationSerializer output (ids are 'broadcast-<id>')"""
+    return {
+        'id': f'{ID_PREFIX}{broadcast.pk}',
+        'user': user_data,
+        'notification_type': broadcast.notification_type,
+        'title': broadcast.title,
+        'message': broadcast.message,
+        'related_object_id': None,
+        'related_object_type': None,
+        'additional_data': broadcast.additional_data,
+        'is_read': broadcast.is_read,
+        'created_at': serializers.DateTimeField().to_representation(broadcast.created_at),
+        'is_broadcast': True,
+    }
+
+
+def _receipt(user, pk, **changes):
+    """Apply changes to the user's receipt for a visible broadcast; False if not visible"""
+    if not visible_broadcasts(user).filter(pk=pk).exists():
+        return False
+    with transaction.atomic():
+        receipt, _ = BroadcastReceipt.objects.select_for_update().get_or_create(user=user, broadcast_id=pk)
+        for field, value in changes.items():
+            setattr(receipt, field, value)
+        receipt.save()
+        notification_counter.touch(user.pk)
+    return True
+
+
+def mark_read(user, pk):
+    return _receipt(user, pk, is_read=True)
+
+
+def delete_for_user(user, pk):
+    return _receipt(user, pk, is_deleted=True)
+
+
+def mark_all_read(user):
+    """Move the user's cursor to now; receipts older than it are no longer needed"""
+    now = timezone.now()
+    with transaction.atomic():
+        BroadcastCursor.objects.update_or_create(user=user, defaults={'read_through': now})
+        BroadcastReceipt.objects.filter(user=user, is_deleted=False, broadcast__created_at__lte=now).delete()
+        notification_counter.touch(user.pk)
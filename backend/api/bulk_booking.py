@@ -0,0 +1,211 @@
+from rest_framework import serializers
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status, permissions
+from django.db.models import Q
+from django.utils import timezone
+
+from .booking_conflicts import BookingConflictError, find_batch_conflicts, slots_write_lock
+from .models import Booking, ParkingSlot, Vehicle
+from .notification_utils import create_rich_notification
+from .permissions import IsCustomerUser
+from .pricing import calculate_booking_prices
+from .signals import on_bookings_created
+
+MAX_BULK_BOOKINGS = 500
+
+
+class BulkBookingItemSerializer(serializers.Serializer):
+    slot_id = serializers.IntegerField()
+    start_time = serializers.DateTimeField()
+    end_time = serializers.DateTimeField()
+    vehicle_id = serializers.IntegerField(required=False)
+
+    def validate(self, data):
+        if data['start_time'] >= data['end_time']:
+            raise serializers.ValidationError("End time must be after start time.")
+        return data
+
+
+class BulkBookingSerializer(serializers.Serializer):
+    MODE_CHOICES = ['all_or_nothing', 'best_effort']
+
+    mode = serializers.ChoiceField(choices=MODE_CHOICES, default='all_or_nothing')
+    bookings = serializers.ListField(
+        child=serializers.DictField(),
+        min_length=1,
+        max_length=MAX_BULK_BOOKINGS,
+    )
+
+
+class BulkBookingCreateView(APIView):
+    """
+    Create many bookings in one request (fleet and event bookings).
+
+    Request body:
+    - mode: 'all_or_nothing' (default) creates nothing if any item fails;
+      'best_effort' creates every item that passes
+    - bookings: list of {slot_id, start_time, end_time, vehicle_id?}; items
+      without vehicle_id use the user's default vehicle
+
+    All items are checked for overlaps with one query, priced with one rate
+    query and inserted with one bulk insert inside a single transaction that
+    holds row locks on the affected slots. The response has one result per
+    item, in request order.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsCustomerUser]
+
+    def post(self, request):
+        serializer = BulkBookingSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        mode = serializer.validated_data['mode']
+        raw_items = serializer.validated_data['bookings']
+
+        results = [None] * len(raw_items)
+        items = {}
+        for i, raw in enumerate(raw_items):
+            item = BulkBookingItemSerializer(data=raw)
+            if item.is_valid():
+                items[i] = item.validated_data
+            else:
+                results[i] = {'index': i, 'status': 'invalid', 'errors': item.errors}
+
+        slots = ParkingSlot.objects.in_bulk({item['slot_id'] for item in items.values()})
+        vehicles = {
+            vehicle.pk: vehicle
+            for vehicle in Vehicle.objects.filter(
+                Q(pk__in={item['vehicle_id'] for item in items.values() if 'vehicle_id' in item}) | Q(is_default=True),
+                user=request.user,
+            )
+        }
+        default_vehicle = next((v for v in vehicles.values() if v.is_default), None)
+
+        # Checks that need no booking data
+        for i, item in list(items.items()):
+            slot = slots.get(item['slot_id'])
+            vehicle = vehicles.get(item['vehicle_id']) if 'vehicle_id' in item else default_vehicle
+            error = None
+            if slot is None:
+                error = "Slot not found."
+            elif vehicle is None:
+                error = "Vehicle not found." if 'vehicle_id' in item else "No vehicle provided and no default vehicle set."
+            elif not slot.is_compatible_with_vehicle(vehicle.vehicle_type):
+                error = f'This slot is designated for {slot.get_vehicle_type_display()} vehicles only.'
+            elif slot.is_occupied:
+                error = "This parking slot is already occupied."
+            if error:
+                results[i] = {'index': i, 'status': 'invalid', 'error': error}
+                del items[i]
+            else:
+                item['slot'], item['vehicle'] = slot, vehicle
+
+        if mode == 'all_or_nothing' and len(items) < len(raw_items):
+            return self.respond(mode, results, items, status.HTTP_400_BAD_REQUEST)
+
+        created = []
+        if items:
+            try:
+                with slots_write_lock(item['slot'] for item in items.values()):
+                    order = sorted(items)
+                    conflicts = find_batch_conflicts(
+                        (items[i]['slot'], items[i]['start_time'], items[i]['end_time']) for i in order
+                    )
+                    for position, reason in conflicts.items():
+                        i = order[position]
+                        results[i] = {'index': i, 'status': 'conflict', 'error': reason}
+                        del items[i]
+
+                    if mode == 'all_or_nothing' and conflicts:
+                        return self.respond(mode, results, items, status.HTTP_409_CONFLICT)
+
+                    created = self.create_bookings(request.user, items, results)
+            except BookingConflictError as e:
+                # Only reachable if a writer bypassed the slot locks; nothing was saved
+                for i in items:
+                    results[i] = {'index': i, 'status': 'conflict', 'error': str(e)}
+                items = {}
+                created = []
+
+        if created:
+            self.notify(request.user, created)
+
+        return self.respond(
+            mode, results, items,
+            status.HTTP_201_CREATED if created else status.HTTP_409_CONFLICT,
+        )
+
+    def create_bookings(self, user, items, results):
+        order = sorted(items)
+        prices = calculate_booking_prices(
+            (
+                items[i]['start_time'], items[i]['end_time'], items[i]['vehicle'].vehicle_type,
+                items[i]['slot'].parking_zone, items[i]['slot'].parking_lot_id,
+            )
+            for i in order
+        )
+        bookings = Booking.objects.bulk_create([
+            Booking(
+                user=user,
+                slot=items[i]['slot'],
+                vehicle=items[i]['vehicle'],
+                start_time=items[i]['start_time'],
+                end_time=items[i]['end_time'],
+                initial_end_time=items[i]['end_time'],
+                total_price=price,
+            )
+            for i, price in zip(order, prices)
+        ])
+
+        slot_ids = {b.slot_id for b in bookings}
+        ParkingSlot.objects.filter(pk__in=slot_ids).update(is_occupied=True)
+        # bulk_create and update() skip signals
+        on_bookings_created(bookings, occupied_slot_ids=slot_ids)
+
+        for i, booking in zip(order, bookings):
+            results[i] = {
+                'index': i,
+                'status': 'created',
+                'booking_id': str(booking.id),
+                'slot_id': str(booking.slot_id),
+                'start_time': booking.start_time,
+                'end_time': booking.end_time,
+                'total_price': str(booking.total_price),
+            }
+        return bookings
+
+    def notify(self, user, bookings):
+        """One summary notification instead of two per booking"""
+        total = sum(b.total_price for b in bookings)
+        first_start = min(b.start_time for b in bookings)
+        create_rich_notification(
+            user=user,
+            notification_type='booking_confirmation',
+            title=f'{len(bookings)} Bookings Confirmed!',
+            message=(
+                f"Your bulk booking of {len(bookings)} slots has been confirmed.\n\n"
+                f"📅 First booking starts: {first_start.strftime('%A, %B %d at %I:%M %p')}\n"
+                f"💰 Total Price: ${total}"
+            ),
+            related_object_type='Booking',
+            additional_data={
+                'booking_ids': [str(b.id) for b in bookings],
+                'total_price': str(total),
+                'created_at': timezone.now().isoformat(),
+            },
+        )
+
+    def respond(self, mode, results, items, status_code):
+        created = sum(1 for r in results if r and r['status'] == 'created')
+        if status_code != status.HTTP_201_CREATED:
+            # Items that passed their own checks but were not written
+            for i in items:
+                if results[i] is None:
+                    results[i] = {'index': i, 'status': 'skipped', 'error': "Not created because another item failed."}
+        return Response({
+            'success': created > 0,
+            'mode': mode,
+            'created': created,
+            'failed': len(results) - created,
+            'results': results,
+        }, status=status_code)
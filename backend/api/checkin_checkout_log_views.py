@@ -2,8 +2,7 @@
 Check-In/Check-Out Log Views
 Handles viewing, filtering, and managing check-in/check-out logs for admin and security
 """
-from django.db.models import Q, Count, Avg, F, ExpressionWrapper, DurationField
-from django.http import HttpResponse
+from django.db.models import Q
 from django.utils import timezone
 from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
@@ -11,6 +10,8 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from datetime import timedelta
 
+from . import checkin_rollup
+from .csv_export import csv_response, export_rows
 from .models import AuditLog, Booking, ParkingSlot
 from .permissions import IsAdminUser
 from .serializers import (
@@ -179,106 +180,33 @@ class CheckInCheckOutLogStatsView(APIView):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        # Date range
+        # Date range (default: last 30 days), in whole hours
         date_from = request.query_params.get('date_from')
         date_to = request.query_params.get('date_to')
+        if not date_from:
+            date_from = checkin_rollup.hour_of(timezone.now() - timedelta(days=30))
         
-        queryset = AuditLog.objects.filter(
-            action__in=[
-                'check_in_attempt', 'check_in_success', 'check_in_failed',
-                'check_out_attempt', 'check_out_success', 'check_out_failed'
-            ]
-        )
-        
-        if date_from:
-            queryset = queryset.filter(timestamp__gte=date_from)
-        else:
-            # Default to last 30 days
-            thirty_days_ago = timezone.now() - timedelta(days=30)
-            queryset = queryset.filter(timestamp__gte=thirty_days_ago)
-        
-        if date_to:
-            queryset = queryset.filter(timestamp__lte=date_to)
-        
-        # Calculate stats
-        total_check_ins = queryset.filter(action='check_in_success').count()
-        failed_check_ins = queryset.filter(action='check_in_failed').count()
-        total_check_outs = queryset.filter(action='check_out_success').count()
-        failed_check_outs = queryset.filter(action='check_out_failed').count()
+        # Counts, durations and hourly breakdowns from the hourly rollups
+        stats = checkin_rollup.summarize(date_from, date_to, today=timezone.now().date())
         
         # Currently parked vehicles
-        currently_parked = Booking.objects.filter(status='checked_in').count()
-        
-        # Average parking duration (in hours)
-        completed_bookings = Booking.objects.filter(
-            status='checked_out',
-            checked_in_at__isnull=False,
-            checked_out_at__isnull=False
-        )
-        
-        if date_from:
-            completed_bookings = completed_bookings.filter(checked_out_at__gte=date_from)
-        if date_to:
-            completed_bookings = completed_bookings.filter(checked_out_at__lte=date_to)
-        
-        # Calculate average duration
-        total_duration = 0
-        booking_count = completed_bookings.count()
-        
-        for booking in completed_bookings:
-            duration = (booking.checked_out_at - booking.checked_in_at).total_seconds() / 3600
-            total_duration += duration
-        
-        avg_duration = round(total_duration / booking_count, 2) if booking_count > 0 else 0
-        
-        # Check-ins by vehicle type
-        check_ins_by_vehicle = dict(
-            queryset.filter(action='check_in_success')
-            .values('booking__vehicle__vehicle_type')
-            .annotate(count=Count('id'))
-            .values_list('booking__vehicle__vehicle_type', 'count')
-        )
-        
-        # Check-ins by hour (for today)
-        today_start = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        hourly_check_ins = []
-        for hour in range(24):
-            hour_start = today_start + timedelta(hours=hour)
-            hour_end = hour_start + timedelta(hours=1)
-            count = queryset.filter(
-                action='check_in_success',
-                timestamp__gte=hour_start,
-                timestamp__lt=hour_end
-            ).count()
-            hourly_check_ins.append({'hour': hour, 'count': count})
+        stats['currently_parked'] = Booking.objects.filter(status='checked_in').count()
         
         # Recent failed attempts (last 10)
-        recent_failed = queryset.filter(success=False).order_by('-timestamp')[:10]
-        recent_failed_data = AuditLogListSerializer(recent_failed, many=True).data
-        
-        # Peak parking hours (top 5 hours with most check-ins in date range)
-        from django.db.models.functions import ExtractHour
-        peak_hours = (
-            queryset.filter(action='check_in_success')
-            .annotate(hour=ExtractHour('timestamp'))
-            .values('hour')
-            .annotate(count=Count('id'))
-            .order_by('-count')[:5]
+        recent_failed = AuditLog.objects.filter(
+            action__in=[
+                'check_in_attempt', 'check_in_success', 'check_in_failed',
+                'check_out_attempt', 'check_out_success', 'check_out_failed'
+            ],
+            success=False,
+            timestamp__gte=date_from,
         )
-        
-        stats = {
-            'total_check_ins': total_check_ins,
-            'failed_check_ins': failed_check_ins,
-            'total_check_outs': total_check_outs,
-            'failed_check_outs': failed_check_outs,
-            'currently_parked': currently_parked,
-            'average_parking_duration_hours': avg_duration,
-            'total_completed_sessions': booking_count,
-            'check_ins_by_vehicle_type': check_ins_by_vehicle,
-            'hourly_check_ins_today': hourly_check_ins,
-            'peak_hours': list(peak_hours),
-            'recent_failed_attempts': recent_failed_data,
-        }
+        if date_to:
+            recent_failed = recent_failed.filter(timestamp__lte=date_to)
+        recent_failed = recent_failed.select_related(
+            'booking__user', 'booking__vehicle', 'booking__slot'
+        ).order_by('-timestamp')[:10]
+        stats['recent_failed_attempts'] = AuditLogListSerializer(recent_failed, many=True).data
         
         serializer = AuditLogStatsSerializer(stats)
         return Response(serializer.data)
@@ -301,18 +229,12 @@ class CheckInCheckOutLogExportView(APIView):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        import csv
-        from io import StringIO
-        
         # Get filtered queryset (reuse logic from list view)
         queryset = AuditLog.objects.filter(
             action__in=[
                 'check_in_attempt', 'check_in_success', 'check_in_failed',
                 'check_out_attempt', 'check_out_success', 'check_out_failed'
             ]
-        ).select_related(
-            'booking', 'user', 'booking__vehicle', 'booking__slot',
-            'booking__slot__parking_lot', 'booking__user'
         )
         
         # Apply same filters as list view
@@ -350,44 +272,51 @@ class CheckInCheckOutLogExportView(APIView):
         
         queryset = queryset.order_by('-timestamp')
         
-        # Create CSV
-        output = StringIO()
-        writer = csv.writer(output)
-        
-        # Write header
-        writer.writerow([
+        header = [
             'ID', 'Booking ID', 'Action', 'Status', 'Timestamp',
             'User', 'Email', 'Vehicle Type', 'Number Plate',
             'Parking Lot', 'Slot', 'Floor', 'Section',
             'IP Address', 'Error Message', 'Notes'
-        ])
-        
-        # Write data rows
-        for log in queryset:
-            writer.writerow([
-                log.id,
-                log.booking.id if log.booking else 'N/A',
-                log.get_action_display(),
-                'Success' if log.success else 'Failed',
-                log.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-                log.booking.user.username if log.booking and log.booking.user else 'N/A',
-                log.booking.user.email if log.booking and log.booking.user else 'N/A',
-                log.booking.vehicle.vehicle_type if log.booking and log.booking.vehicle else 'N/A',
-                log.booking.vehicle.number_plate if log.booking and log.booking.vehicle else 'N/A',
-                log.booking.slot.parking_lot.name if log.booking and log.booking.slot and log.booking.slot.parking_lot else 'N/A',
-                log.booking.slot.slot_number if log.booking and log.booking.slot else 'N/A',
-                log.booking.slot.floor if log.booking and log.booking.slot else 'N/A',
-                log.booking.slot.section if log.booking and log.booking.slot else 'N/A',
-                log.ip_address or 'N/A',
-                log.error_message or '',
-                log.notes or '',
-            ])
-        
-        # Create HTTP response
-        response = HttpResponse(output.getvalue(), content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="checkin_checkout_logs_{timezone.now().strftime("%Y%m%d_%H%M%S")}.csv"'
-        
-        return response
+        ]
+        fields = (
+            'id', 'booking_id', 'action', 'success', 'timestamp',
+            'booking__user__username', 'booking__user__email',
+            'booking__vehicle__vehicle_type', 'booking__vehicle__number_plate',
+            'booking__slot__parking_lot__name', 'booking__slot__slot_number',
+            'booking__slot__floor', 'booking__slot__section',
+            'ip_address', 'error_message', 'notes',
+        )
+        action_display = dict(AuditLog.ACTION_CHOICES)
+        
+        def format_row(values):
+            (log_id, booking_id, action, success, timestamp, username, email,
+             vehicle_type, number_plate, lot_name, slot_number, floor, section,
+             ip_address, error_message, notes) = values
+            return [
+                log_id,
+                booking_id if booking_id else 'N/A',
+                action_display.get(action, action),
+                'Success' if success else 'Failed',
+                timestamp.strftime('%Y-%m-%d %H:%M:%S'),
+                username if username is not None else 'N/A',
+                email if email is not None else 'N/A',
+                vehicle_type if vehicle_type is not None else 'N/A',
+                number_plate if number_plate is not None else 'N/A',
+                lot_name if lot_name is not None else 'N/A',
+                slot_number if slot_number is not None else 'N/A',
+                floor if floor is not None else 'N/A',
+                section if section is not None else 'N/A',
+                ip_address or 'N/A',
+                error_message or '',
+                notes or '',
+            ]
+        
+        return csv_response(
+            request,
+            f'checkin_checkout_logs_{timezone.now().strftime("%Y%m%d_%H%M%S")}',
+            header,
+            export_rows(queryset, fields, format_row),
+        )
 
 
 @api_view(['GET'])
@@ -0,0 +1,236 @@
+"""
+Pre-aggregated check-in/check-out activity per (hour, zone, vehicle type).
+
+CheckInOutRollup holds the successful and failed check-ins and check-outs
+recorded in AuditLog, plus the summed parking duration of the successful
+check-outs, bucketed by the hour of the log timestamp. The check-in/check-out
+stats endpoint answers any date window with one range query over it instead
+of counting audit logs hour by hour and looping over completed bookings.
+
+A log is rolled up under the zone, vehicle type and parking duration its
+booking had when the log was written. Those are stored in the log's
+additional_data under ROLLUP_KEY when it is created (see stamp()), so
+adding and removing a log's contribution, and rebuilding the table, never
+depend on later changes to the booking.
+
+The table is kept up to date incrementally: the AuditLog post_save/post_delete
+receivers in api/signals.py add or remove each log's contribution in the same
+transaction. `rebuild()` recomputes the table from raw audit logs; run it with
+`manage.py rebuild_checkin_rollups`.
+"""
+from django.db import connection, transaction
+from django.db.models import BigIntegerField, Count, F, Q, Sum
+from django.db.models.fields.json import KeyTextTransform, KeyTransform
+from django.db.models.functions import Cast, Coalesce, TruncHour
+
+from .models import AuditLog, Booking, CheckInOutRollup
+
+# AuditLog action -> rollup counter
+COUNTERS = {
+    'check_in_success': 'check_ins',
+    'check_in_failed': 'failed_check_ins',
+    'check_out_success': 'check_outs',
+    'check_out_failed': 'failed_check_outs',
+}
+FIELDS = (
+    'check_ins', 'failed_check_ins', 'check_outs', 'failed_check_outs', 'completed_sessions', 'total_duration_seconds',
+)
+# AuditLog.additional_data key holding what the log is rolled up under
+ROLLUP_KEY = 'rollup'
+
+
+def hour_of(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def session_seconds(checked_in_at, checked_out_at):
+    """Whole seconds parked, or None if either time is missing"""
+    if checked_in_at is None or checked_out_at is None:
+        return None
+    return int((checked_out_at - checked_in_at).total_seconds())
+
+
+def stamp(log):
+    """
+    Store the zone, vehicle type and, for a successful check-out, the
+    parking duration of the log's booking in its additional_data; called
+    before a new audit log is saved.
+    """
+    counter = COUNTERS.get(log.action)
+    if counter is None or ROLLUP_KEY in (log.additional_data or {}):
+        return
+    row = (
+        Booking.objects.filter(pk=log.booking_id)
+        .values_list('slot__parking_zone', 'vehicle__vehicle_type', 'checked_in_at', 'checked_out_at')
+        .first()
+    )
+    if row is None:
+        return
+    parking_zone, vehicle_type, checked_in_at, checked_out_at = row
+    log.additional_data = {
+        **(log.additional_data or {}),
+        ROLLUP_KEY: {
+            'parking_zone': parking_zone or '',
+            'vehicle_type': vehicle_type or '',
+            'duration_seconds': session_seconds(checked_in_at, checked_out_at) if counter == 'check_outs' else None,
+        },
+    }
+
+
+def log_contribution(log):
+    """
+    The (hour, zone, vehicle_type, counter, duration seconds) an audit log
+    adds to the rollups, from the values stored by stamp(), or None if the
+    log is not rolled up.
+    """
+    counter = COUNTERS.get(log.action)
+    stored = (log.additional_data or {}).get(ROLLUP_KEY)
+    if counter is None or stored is None or log.timestamp is None:
+        return None
+    seconds = stored['duration_seconds'] if counter == 'check_outs' else None
+    return (hour_of(log.timestamp), stored['parking_zone'], stored['vehicle_type'], counter, seconds)
+
+
+def apply_contribution(contribution, sign):
+    """Add (sign=1) or remove (sign=-1) one audit log's contribution"""
+    hour, parking_zone, vehicle_type, counter, seconds = contribution
+    changes = {counter: F(counter) + sign}
+    if seconds is not None:
+        changes['completed_sessions'] = F('completed_sessions') + sign
+        changes['total_duration_seconds'] = F('total_duration_seconds') + sign * seconds
+    with transaction.atomic():
+        CheckInOutRollup.objects.bulk_create(
+            [CheckInOutRollup(hour=hour, parking_zone=parking_zone, vehicle_type=vehicle_type)],
+            ignore_conflicts=True,
+        )
+        CheckInOutRollup.objects.filter(hour=hour, parking_zone=parking_zone, vehicle_type=vehicle_type).update(
+            **changes
+        )
+
+
+def _stored(name):
+    return KeyTextTransform(name, KeyTransform(ROLLUP_KEY, 'additional_data'))
+
+
+def expected_rows():
+    """
+    Recompute the rollups from the values stored on the audit logs, with one
+    grouped query
+    """
+    check_out = Q(action='check_out_success', seconds__isnull=False)
+    rows = (
+        AuditLog.objects.filter(action__in=COUNTERS, additional_data__has_key=ROLLUP_KEY)
+        .annotate(
+            hour=TruncHour('timestamp'),
+            zone=_stored('parking_zone'),
+            stored_vehicle_type=_stored('vehicle_type'),
+            seconds=Cast(_stored('duration_seconds'), BigIntegerField()),
+        )
+        .values('hour', 'zone', 'stored_vehicle_type')
+        .annotate(
+            **{counter: Count('id', filter=Q(action=action)) for action, counter in COUNTERS.items()},
+            completed_sessions=Count('id', filter=check_out),
+            total_duration_seconds=Coalesce(Sum('seconds', filter=check_out), 0),
+        )
+        .order_by()
+    )
+    return {
+        (row['hour'], row['zone'], row['stored_vehicle_type']): tuple(row[field] for field in FIELDS)
+        for row in rows.iterator()
+    }
+
+
+def rebuild(verify_only=False):
+    """
+    Compare the table against raw audit logs and, unless verify_only, replace it.
+
+    The table is locked against the incremental writers while it is rebuilt,
+    so logs written during the rebuild are counted exactly once.
+
+    Returns:
+        dict with the number of rows written and a list of mismatches as
+        (hour, zone, vehicle_type, stored, expected) tuples, where stored and
+        expected are the counters in FIELDS order
+    """
+    with transaction.atomic():
+        if not verify_only:
+            with connection.cursor() as cursor:
+                cursor.execute(f'LOCK TABLE {CheckInOutRollup._meta.db_table} IN EXCLUSIVE MODE')
+
+        expected = expected_rows()
+        stored = {
+            (hour, zone, vehicle_type): tuple(totals)
+            for hour, zone, vehicle_type, *totals
+            in CheckInOutRollup.objects.values_list('hour', 'parking_zone', 'vehicle_type', *FIELDS)
+            if any(totals)
+        }
+        empty = (0,) * len(FIELDS)
+        mismatches = sorted(
+            key + (stored.get(key, empty), expected.get(key, empty))
+            for key in stored.keys() | expected.keys()
+            if stored.get(key, empty) != expected.get(key, empty)
+        )
+
+        if not verify_only:
+            CheckInOutRollup.objects.all().delete()
+            CheckInOutRollup.objects.bulk_create(
+                [
+                    CheckInOutRollup(
+                        hour=hour, parking_zone=zone, vehicle_type=vehicle_type, **dict(zip(FIELDS, totals))
+                    )
+                    for (hour, zone, vehicle_type), totals in expected.items()
+                ],
+                batch_size=5000,
+            )
+
+    return {'rows': len(expected), 'mismatches': mismatches}
+
+
+def summarize(date_from, date_to=None, today=None):
+    """
+    Check-in/check-out stats for a window of whole hours, from one range query.
+
+    Args:
+        date_from: First hour included (anything the hour lookup accepts)
+        date_to: Last hour included, or None for no upper bound
+        today: Date reported in hourly_check_ins_today
+
+    Returns:
+        dict with the totals, average parking duration, check-ins by vehicle
+        type, hourly check-ins for today and the five busiest hours of day
+    """
+    rollups = CheckInOutRollup.objects.filter(hour__gte=date_from)
+    if date_to:
+        rollups = rollups.filter(hour__lte=date_to)
+    rows = rollups.values_list('hour', 'vehicle_type', *FIELDS)
+
+    totals = dict.fromkeys(FIELDS, 0)
+    by_vehicle_type = {}
+    by_hour_of_day = {}
+    today_counts = [0] * 24
+    for hour, vehicle_type, *counts in rows.iterator():
+        for field, count in zip(FIELDS, counts):
+            totals[field] += count
+        check_ins = counts[0]
+        if check_ins:
+            vehicle_type = vehicle_type or None
+            by_vehicle_type[vehicle_type] = by_vehicle_type.get(vehicle_type, 0) + check_ins
+            by_hour_of_day[hour.hour] = by_hour_of_day.get(hour.hour, 0) + check_ins
+            if hour.date() == today:
+                today_counts[hour.hour] += check_ins
+
+    sessions = totals['completed_sessions']
+    peak_hours = sorted(by_hour_of_day.items(), key=lambda item: (-item[1], item[0]))[:5]
+    return {
+        'total_check_ins': totals['check_ins'],
+        'failed_check_ins': totals['failed_check_ins'],
+        'total_check_outs': totals['check_outs'],
+        'failed_check_outs': totals['failed_check_outs'],
+        'average_parking_duration_hours': (
+            round(totals['total_duration_seconds'] / 3600 / sessions, 2) if sessions else 0
+        ),
+        'total_completed_sessions': sessions,
+        'check_ins_by_vehicle_type': by_vehicle_type,
+        'hourly_check_ins_today': [{'hour': hour, 'count': count} for hour, count in enumerate(today_counts)],
+        'peak_hours': [{'hour': hour, 'count': count} for hour, count in peak_hours],
+    }
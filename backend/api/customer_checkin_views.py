@@ -6,7 +6,7 @@ from django.utils import timezone
 from .models import Booking, AuditLog
 from .serializers import BookingSerializer
 from .permissions import IsCustomerUser
-from .secret_code_utils import generate_unique_secret_code
+from .secret_code_utils import save_with_secret_code
 from .notification_utils import create_rich_notification
 
 
@@ -84,16 +84,12 @@ class CustomerCheckInView(APIView):
         
         try:
             with transaction.atomic():
-                # Generate secret code
-                secret_code = generate_unique_secret_code()
-                booking.secret_code = secret_code
-                
-                # Update booking to checked_in
+                # Update booking to checked_in and generate its secret code
                 booking.status = 'checked_in'
                 booking.checked_in_at = timezone.now()
                 booking.checked_in_by = request.user
                 booking.checked_in_ip = self.get_client_ip(request)
-                booking.save()
+                secret_code = save_with_secret_code(booking)
                 
                 # Mark slot as occupied
                 booking.slot.is_occupied = True
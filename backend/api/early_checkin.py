@@ -6,6 +6,7 @@ from django.utils import timezone
 from decimal import Decimal
 from .models import Booking, Notification
 from .pricing import calculate_booking_price
+from .booking_conflicts import BookingConflictError, ensure_slot_available, is_slot_available, slot_write_lock
 
 class EarlyCheckInSerializer(serializers.Serializer):
     booking_id = serializers.IntegerField()
@@ -29,14 +30,7 @@ class EarlyCheckInSerializer(serializers.Serializer):
             raise serializers.ValidationError("New start time cannot be in the past.")
         
         # Check if the slot is available for the earlier time
-        conflicting_bookings = Booking.objects.filter(
-            slot=booking.slot,
-            start_time__lt=booking.start_time,
-            end_time__gt=new_start_time,
-            is_active=True
-        ).exclude(pk=booking_id).exists()
-        
-        if conflicting_bookings:
+        if not is_slot_available(booking.slot, new_start_time, booking.start_time, exclude=booking):
             raise serializers.ValidationError("Slot is not available for early check-in at the requested time.")
         
         data['booking'] = booking
@@ -73,23 +67,33 @@ class EarlyCheckInView(APIView):
         
         price_difference = new_price - original_price
         
-        # Update booking
-        booking.start_time = new_start_time
-        booking.total_price = new_price
-        
-        # Add to extension history even though it's not technically an extension
-        if not booking.extension_history:
-            booking.extension_history = []
-            
-        booking.extension_history.append({
-            'action': 'early_check_in',
-            'original_start_time': booking.start_time.isoformat(),
-            'new_start_time': new_start_time.isoformat(),
-            'additional_cost': str(price_difference),
-            'timestamp': timezone.now().isoformat()
-        })
-        
-        booking.save()
+        try:
+            # Re-check under the slot lock so a concurrent booking cannot slip in
+            with slot_write_lock(booking.slot):
+                ensure_slot_available(booking.slot, new_start_time, booking.start_time, exclude=booking)
+                
+                # Update booking
+                booking.start_time = new_start_time
+                booking.total_price = new_price
+                
+                # Add to extension history even though it's not technically an extension
+                if not booking.extension_history:
+                    booking.extension_history = []
+                    
+                booking.extension_history.append({
+                    'action': 'early_check_in',
+                    'original_start_time': booking.start_time.isoformat(),
+                    'new_start_time': new_start_time.isoformat(),
+                    'additional_cost': str(price_difference),
+                    'timestamp': timezone.now().isoformat()
+                })
+                
+                booking.save()
+        except BookingConflictError:
+            return Response(
+                {"error": "Slot is not available for early check-in at the requested time."},
+                status=status.HTTP_409_CONFLICT
+            )
         
         # Create notification
         Notification.objects.create(
@@ -0,0 +1,229 @@
+"""
+Publish/subscribe for live dashboard events.
+
+Writers (signal receivers and the bulk paths that skip signals) call
+publish(), which sends the event with pg_notify on PG_CHANNEL. NOTIFY is
+transactional, so events leave only when the write commits, and every
+process listening on the channel receives them whichever worker made the
+change. Events published inside an ASGI worker are also handed to that
+worker's subscribers directly on commit, and skipped when they come back
+through LISTEN.
+
+Each ASGI worker keeps one LISTEN connection, opened when its first client
+subscribes (api/event_stream.py). Subscribers are asyncio queues on the
+worker's event loop, so an idle stream costs a parked coroutine and nothing
+else. A subscriber that falls EVENT_QUEUE_SIZE events behind is sent a
+'resync' event instead of the backlog, telling the client to refetch.
+
+Event shape: {'topic', 'event', 'data', 'user_id', 'role'}. user_id limits
+an event to one user and role to one user role or a list of roles; both None
+means everyone subscribed to the topic. Booking events carry booking ids and
+statuses, so they go to STAFF_ROLES only; customers see slot occupancy
+through the slot events.
+"""
+import asyncio
+import json
+import logging
+import os
+import uuid
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+
+try:
+    import psycopg2
+    import psycopg2.extensions
+except ImportError:
+    psycopg2 = None
+
+logger = logging.getLogger(__name__)
+
+PG_CHANNEL = 'parking_events'
+TOPICS = ('slots', 'notifications', 'long_stay')
+# pg_notify payloads must stay under 8000 bytes
+MAX_PAYLOAD_BYTES = 7900
+RECONNECT_SECONDS = 5
+STAFF_ROLES = ['admin', 'security']
+
+# Identifies this process's own events when they come back through LISTEN
+PROCESS_ID = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+
+_loop = None
+_listener = None
+_subscribers = set()
+
+
+def publish(topic, event, data, user_id=None, role=None):
+    """Queue an event for every subscriber of the topic once the current transaction commits"""
+    message = {'topic': topic, 'event': event, 'data': data, 'user_id': user_id, 'role': role}
+    payload = json.dumps({**message, 'origin': PROCESS_ID}, default=str)
+    if len(payload.encode('utf-8')) > MAX_PAYLOAD_BYTES:
+        message = {'topic': topic, 'event': 'resync', 'data': {}, 'user_id': user_id, 'role': role}
+        payload = json.dumps({**message, 'origin': PROCESS_ID})
+
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [PG_CHANNEL, payload])
+    loop = _loop
+    if loop is not None and not loop.is_closed():
+        transaction.on_commit(lambda: loop.call_soon_threadsafe(_dispatch, message))
+
+
+def slot_changed(slot):
+    publish('slots', 'slot', {
+        'slot_id': slot.pk,
+        'parking_lot_id': slot.parking_lot_id,
+        'parking_zone': slot.parking_zone,
+        'is_occupied': slot.is_occupied,
+    })
+
+
+def slots_occupied(slot_ids, is_occupied):
+    """One event for slots changed together by a queryset update()"""
+    publish('slots', 'slots', {'slot_ids': sorted(slot_ids), 'is_occupied': is_occupied})
+
+
+def booking_changed(booking, deleted=False):
+    publish('slots', 'booking', {
+        'booking_id': booking.pk,
+        'slot_id': booking.slot_id,
+        'status': 'deleted' if deleted else booking.status,
+        'is_active': False if deleted else booking.is_active,
+    }, role=STAFF_ROLES)
+
+
+def notification_created(notification):
+    """A new notification for its owner; long-stay alerts go out on their own topic"""
+    alert_type = (notification.additional_data or {}).get('alert_type') or ''
+    topic = 'long_stay' if alert_type.startswith('long_stay') else 'notifications'
+    publish(topic, 'notification', {
+        'id': notification.pk,
+        'notification_type': notification.notification_type,
+        'title': notification.title,
+        'alert_type': alert_type or None,
+        'related_object_id': notification.related_object_id,
+    }, user_id=notification.user_id)
+
+
+def broadcast_created(broadcast):
+    publish('notifications', 'notification', {
+        'id': f'broadcast-{broadcast.pk}',
+        'notification_type': broadcast.notification_type,
+        'title': broadcast.title,
+    }, role=broadcast.audience_role or None)
+
+
+class Subscription:
+    """One client's filtered view of the event stream"""
+
+    def __init__(self, user_id, role, topics, parking_zone=None):
+        self.user_id = user_id
+        self.role = role
+        self.topics = set(topics)
+        self.parking_zone = parking_zone
+        self.queue = asyncio.Queue(maxsize=getattr(settings, 'EVENT_QUEUE_SIZE', 100))
+        self.overflowed = False
+
+    def wants(self, message):
+        if message['topic'] not in self.topics:
+            return False
+        if message['user_id'] is not None and message['user_id'] != self.user_id:
+            return False
+        roles = message['role']
+        if roles is not None and self.role not in ([roles] if isinstance(roles, str) else roles):
+            return False
+        zone = message['data'].get('parking_zone')
+        return self.parking_zone is None or zone is None or zone == self.parking_zone
+
+    def offer(self, message):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Drop the backlog; the client refetches on 'resync'
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({'topic': None, 'event': 'resync', 'data': {}})
+
+    async def get(self):
+        message = await self.queue.get()
+        if message['event'] == 'resync':
+            self.overflowed = False
+        return message
+
+
+def _dispatch(message):
+    for subscription in tuple(_subscribers):
+        if subscription.wants(message):
+            subscription.offer(message)
+
+
+def subscribe(subscription):
+    """Register a subscription on the running loop, starting this worker's listener if needed"""
+    global _loop, _listener
+    _loop = asyncio.get_running_loop()
+    if _listener is None or _listener.done():
+        _listener = _loop.create_task(_listen())
+    _subscribers.add(subscription)
+
+
+def unsubscribe(subscription):
+    _subscribers.discard(subscription)
+
+
+def _connect():
+    params = connections['default'].get_connection_params()
+    conn = psycopg2.connect(**params)
+    conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+    with conn.cursor() as cursor:
+        cursor.execute(f'LISTEN {PG_CHANNEL}')
+    return conn
+
+
+async def _listen():
+    """Relay NOTIFY messages from other processes to this worker's subscribers, reconnecting on failure"""
+    if psycopg2 is None or connections['default'].vendor != 'postgresql':
+        logger.warning('Event bus LISTEN bridge needs PostgreSQL and psycopg2; serving local events only')
+        return
+
+    loop = asyncio.get_running_loop()
+    while True:
+        conn = None
+        lost = loop.create_future()
+        try:
+            conn = await loop.run_in_executor(None, _connect)
+
+            def on_readable():
+                try:
+                    conn.poll()
+                except Exception as e:
+                    if not lost.done():
+                        lost.set_exception(e)
+                    return
+                while conn.notifies:
+                    _receive(conn.notifies.pop(0).payload)
+
+            loop.add_reader(conn.fileno(), on_readable)
+            await lost
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception('Event bus LISTEN connection lost; reconnecting in %ss', RECONNECT_SECONDS)
+        finally:
+            if conn is not None:
+                loop.remove_reader(conn.fileno())
+                conn.close()
+        await asyncio.sleep(RECONNECT_SECONDS)
+
+
+def _receive(payload):
+    try:
+        message = json.loads(payload)
+    except ValueError:
+        logger.warning('Ignoring malformed event bus payload')
+        return
+    if message.pop('origin', None) == PROCESS_ID:
+        return
+    _dispatch(message)
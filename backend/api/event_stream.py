@@ -0,0 +1,131 @@
+"""
+Server-Sent Events endpoint for live slot status, notifications and
+long-stay alerts.
+
+A plain ASGI application served on its own by backend/asgi.py (the rest of
+the API runs under WSGI), so an open stream is one coroutine parked on its
+subscription queue rather than a thread. Events come from api/event_bus.py.
+
+    GET /api/events/?token=<access token>&topics=slots,notifications,long_stay&parking_zone=<zone>
+
+EventSource cannot set headers, so the JWT access token is passed as the
+token query parameter. topics defaults to all of them; parking_zone limits
+slot events to one zone. Each stream starts with a 'ready' event and gets a
+comment line every EVENT_STREAM_HEARTBEAT seconds to keep proxies from
+closing it. Clients should refetch their state on 'ready' and 'resync'.
+"""
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import event_bus
+
+EVENT_STREAM_PATH = '/api/events/'
+
+User = get_user_model()
+
+
+def _authenticate(token):
+    """(user id, role) for a valid access token of an active user, else None"""
+    try:
+        user_id = AccessToken(token)[settings.SIMPLE_JWT.get('USER_ID_CLAIM', 'user_id')]
+    except (TokenError, KeyError):
+        return None
+    return User.objects.filter(pk=user_id, is_active=True).values_list('pk', 'role').first()
+
+
+def _cors_headers(scope):
+    """CORS headers for the request's Origin, mirroring the django-cors-headers settings"""
+    origin = next((value for name, value in scope['headers'] if name == b'origin'), None)
+    if origin is None:
+        return []
+    allowed = getattr(settings, 'CORS_ALLOW_ALL_ORIGINS', False) or (
+        origin.decode('latin1') in getattr(settings, 'CORS_ALLOWED_ORIGINS', [])
+    )
+    if not allowed:
+        return []
+    headers = [(b'access-control-allow-origin', origin), (b'vary', b'Origin')]
+    if getattr(settings, 'CORS_ALLOW_CREDENTIALS', False):
+        headers.append((b'access-control-allow-credentials', b'true'))
+    return headers
+
+
+async def _reject(send, scope, status, error):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json; charset=utf-8')] + _cors_headers(scope),
+    })
+    await send({'type': 'http.response.body', 'body': json.dumps({'success': False, 'error': error}).encode()})
+
+
+def _format(message):
+    data = {key: message[key] for key in ('topic', 'data')}
+    return f"event: {message['event']}\ndata: {json.dumps(data, default=str)}\n\n".encode()
+
+
+async def event_stream_app(scope, receive, send):
+    if scope['method'] != 'GET':
+        await _reject(send, scope, 405, 'Method not allowed')
+        return
+
+    query = parse_qs(scope.get('query_string', b'').decode('latin1'))
+    user = await sync_to_async(_authenticate)(query.get('token', [''])[0])
+    if user is None:
+        await _reject(send, scope, 401, 'A valid access token is required')
+        return
+
+    topics = [t for t in query.get('topics', [','.join(event_bus.TOPICS)])[0].split(',') if t]
+    unknown = set(topics) - set(event_bus.TOPICS)
+    if unknown or not topics:
+        await _reject(send, scope, 400, f'Unknown topics. Valid topics: {", ".join(event_bus.TOPICS)}')
+        return
+
+    subscription = event_bus.Subscription(user[0], user[1], topics, query.get('parking_zone', [None])[0])
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ] + _cors_headers(scope),
+    })
+
+    async def wait_for_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    disconnected = asyncio.ensure_future(wait_for_disconnect())
+    heartbeat = getattr(settings, 'EVENT_STREAM_HEARTBEAT', 20)
+    event_bus.subscribe(subscription)
+    try:
+        await send({
+            'type': 'http.response.body',
+            'body': b'retry: 5000\n' + _format({'event': 'ready', 'topic': None, 'data': {'topics': topics}}),
+            'more_body': True,
+        })
+        while not disconnected.done():
+            next_event = asyncio.ensure_future(subscription.get())
+            done, _ = await asyncio.wait({next_event, disconnected}, timeout=heartbeat,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if next_event in done:
+                body = _format(next_event.result())
+            else:
+                next_event.cancel()
+                if disconnected.done():
+                    break
+                body = b': ping\n\n'
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+    except OSError:
+        # Client went away mid-send
+        pass
+    finally:
+        event_bus.unsubscribe(subscription)
+        disconnected.cancel()
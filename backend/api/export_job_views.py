@@ -0,0 +1,124 @@
+"""
+Background Export Job Views
+Queue large audit, booking and revenue extracts, poll their status and
+download the finished file (see api/export_jobs.py)
+"""
+import os
+
+from django.http import FileResponse
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .export_jobs import request_export
+from .models import ExportJob
+from .permissions import IsAdminUser
+from .serializers import ExportJobSerializer
+
+
+class ExportJobListCreateView(APIView):
+    """
+    GET: List recent export jobs
+    POST: Queue an export, or reuse an equivalent queued, running or recent one
+    Admin only
+    """
+    permission_classes = [permissions.IsAuthenticated, IsAdminUser]
+
+    def get(self, request):
+        jobs = ExportJob.objects.select_related('requested_by')[:50]
+        serializer = ExportJobSerializer(jobs, many=True, context={'request': request})
+        return Response({
+            'success': True,
+            'count': len(serializer.data),
+            'jobs': serializer.data
+        }, status=status.HTTP_200_OK)
+
+    def post(self, request):
+        """
+        Body:
+        - dataset: audit_logs, bookings or revenue
+        - file_format: csv_gz (default) or parquet
+        - filters: e.g. {"date_from": "2025-01-01", "date_to": "2025-03-31"}
+        """
+        filters = request.data.get('filters') or {}
+        if not isinstance(filters, dict):
+            return Response({
+                'success': False,
+                'error': 'filters must be an object'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            job, created = request_export(
+                request.data.get('dataset'),
+                request.data.get('file_format', 'csv_gz'),
+                filters,
+                user=request.user,
+            )
+        except ValueError as e:
+            return Response({
+                'success': False,
+                'error': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'success': True,
+            'reused': not created,
+            'job': ExportJobSerializer(job, context={'request': request}).data
+        }, status=status.HTTP_202_ACCEPTED if created else status.HTTP_200_OK)
+
+
+class ExportJobDetailView(APIView):
+    """
+    GET: Poll an export job's status
+    Admin only
+    """
+    permission_classes = [permissions.IsAuthenticated, IsAdminUser]
+
+    def get(self, request, pk):
+        job = ExportJob.objects.select_related('requested_by').filter(pk=pk).first()
+        if job is None:
+            return Response({
+                'success': False,
+                'error': 'Export job not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        return Response({
+            'success': True,
+            'job': ExportJobSerializer(job, context={'request': request}).data
+        }, status=status.HTTP_200_OK)
+
+
+class ExportJobDownloadView(APIView):
+    """
+    GET: Download a completed export job's file
+    Admin only
+    """
+    permission_classes = [permissions.IsAuthenticated, IsAdminUser]
+
+    def get(self, request, pk):
+        job = ExportJob.objects.filter(pk=pk).first()
+        if job is None:
+            return Response({
+                'success': False,
+                'error': 'Export job not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        if job.status != 'completed':
+            return Response({
+                'success': False,
+                'error': f'Export job is {job.status}'
+            }, status=status.HTTP_409_CONFLICT)
+
+        if not os.path.exists(job.file_path):
+            return Response({
+                'success': False,
+                'error': 'Export file has been removed; queue the export again'
+            }, status=status.HTTP_410_GONE)
+
+        content_type = 'application/vnd.apache.parquet' if job.file_format == 'parquet' else 'application/gzip'
+        return FileResponse(
+            open(job.file_path, 'rb'),
+            as_attachment=True,
+            filename=os.path.basename(job.file_path),
+            content_type=content_type,
+        )
@@ -0,0 +1,379 @@
+"""
+Background export jobs for large extracts.
+
+An ExportJob records what to extract (dataset, file format and filters). The
+API only creates the row; `manage.py run_export_jobs` claims pending jobs and
+writes them in a process pool outside the request cycle, to gzipped CSV or,
+when pyarrow is installed, Parquet under EXPORT_JOB_DIR. Rows are projected
+with values_list() and read with a server-side cursor, so memory stays flat
+whatever the extract size.
+
+A request for the same dataset, format and filters as a job that is still
+queued or running, or that completed within EXPORT_JOB_MAX_AGE seconds and
+whose file still exists, returns that job instead of queueing a new one.
+
+Claimed jobs record the worker_id of the run_export_jobs process running
+them. A worker puts its running jobs back in the queue when it stops, and
+when it starts again under the same id; jobs still running after
+EXPORT_JOB_TIMEOUT seconds are treated as abandoned by a worker that never
+came back. Every run writes its own file and records the outcome only if
+the job is still the claim it started from, so a job requeued while its
+first run was still going cannot be completed twice or overwrite the
+other run's file.
+
+Files of jobs that completed more than EXPORT_JOB_MAX_AGE seconds ago are
+deleted by delete_expired_files(), which the worker runs periodically.
+"""
+import csv
+import gzip
+import hashlib
+import json
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .csv_export import export_rows
+from .models import AuditLog, Booking, ExportJob, RevenueRollup
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+PARQUET_BATCH_ROWS = 10000
+
+
+def _date_range(queryset, field, filters):
+    """Apply the date_from/date_to (YYYY-MM-DD, inclusive) filters to a date or datetime field"""
+    if filters.get('date_from'):
+        queryset = queryset.filter(**{f'{field}__gte': filters['date_from']})
+    if filters.get('date_to'):
+        end = datetime.strptime(filters['date_to'], '%Y-%m-%d') + timedelta(days=1)
+        queryset = queryset.filter(**{f'{field}__lt': end.date() if field == 'day' else end})
+    return queryset
+
+
+def _audit_logs(filters):
+    queryset = AuditLog.objects.all()
+    if filters.get('action'):
+        queryset = queryset.filter(action=filters['action'])
+    if filters.get('status') == 'success':
+        queryset = queryset.filter(success=True)
+    elif filters.get('status') == 'failed':
+        queryset = queryset.filter(success=False)
+    return _date_range(queryset, 'timestamp', filters).order_by('timestamp', 'id')
+
+
+def _bookings(filters):
+    queryset = Booking.objects.all()
+    if filters.get('status'):
+        queryset = queryset.filter(status=filters['status'])
+    if filters.get('parking_zone'):
+        queryset = queryset.filter(slot__parking_zone=filters['parking_zone'])
+    if filters.get('user_id'):
+        queryset = queryset.filter(user_id=filters['user_id'])
+    return _date_range(queryset, 'start_time', filters).order_by('start_time', 'id')
+
+
+def _revenue(filters):
+    queryset = RevenueRollup.objects.exclude(booking_count=0)
+    if filters.get('parking_zone'):
+        queryset = queryset.filter(parking_zone=filters['parking_zone'])
+    if filters.get('vehicle_type'):
+        queryset = queryset.filter(vehicle_type=filters['vehicle_type'])
+    return _date_range(queryset, 'day', filters)
+
+
+# dataset -> (queryset builder, allowed filters, (column, values_list lookup) pairs)
+DATASETS = {
+    'audit_logs': (_audit_logs, ('date_from', 'date_to', 'action', 'status'), (
+        ('id', 'id'),
+        ('booking_id', 'booking_id'),
+        ('action', 'action'),
+        ('success', 'success'),
+        ('timestamp', 'timestamp'),
+        ('username', 'booking__user__username'),
+        ('vehicle_type', 'booking__vehicle__vehicle_type'),
+        ('number_plate', 'booking__vehicle__number_plate'),
+        ('parking_zone', 'booking__slot__parking_zone'),
+        ('slot_number', 'booking__slot__slot_number'),
+        ('ip_address', 'ip_address'),
+        ('error_message', 'error_message'),
+    )),
+    'bookings': (_bookings, ('date_from', 'date_to', 'status', 'parking_zone', 'user_id'), (
+        ('id', 'id'),
+        ('user_id', 'user_id'),
+        ('username', 'user__username'),
+        ('slot_id', 'slot_id'),
+        ('parking_zone', 'slot__parking_zone'),
+        ('vehicle_type', 'vehicle__vehicle_type'),
+        ('number_plate', 'vehicle__number_plate'),
+        ('status', 'status'),
+        ('start_time', 'start_time'),
+        ('end_time', 'end_time'),
+        ('checked_in_at', 'checked_in_at'),
+        ('checked_out_at', 'checked_out_at'),
+        ('total_price', 'total_price'),
+        ('overstay_amount', 'overstay_amount'),
+    )),
+    'revenue': (_revenue, ('date_from', 'date_to', 'parking_zone', 'vehicle_type'), (
+        ('day', 'day'),
+        ('parking_zone', 'parking_zone'),
+        ('vehicle_type', 'vehicle_type'),
+        ('booking_revenue', 'booking_revenue'),
+        ('overstay_revenue', 'overstay_revenue'),
+        ('booking_count', 'booking_count'),
+        ('overstay_count', 'overstay_count'),
+    )),
+}
+
+
+def export_dir():
+    return Path(getattr(settings, 'EXPORT_JOB_DIR', Path(settings.BASE_DIR) / 'exports'))
+
+
+def normalize_filters(dataset, file_format, filters):
+    """
+    Validate a job request and return its filters in canonical form.
+
+    Raises:
+        ValueError: Unknown dataset, format or filter, bad date, or Parquet
+            requested without pyarrow installed
+    """
+    if dataset not in DATASETS:
+        raise ValueError(f'Unknown dataset. Valid datasets: {", ".join(DATASETS)}')
+    if file_format not in dict(ExportJob.FORMAT_CHOICES):
+        raise ValueError(f'Unknown format. Valid formats: {", ".join(dict(ExportJob.FORMAT_CHOICES))}')
+    if file_format == 'parquet' and pa is None:
+        raise ValueError('Parquet exports require pyarrow to be installed')
+
+    allowed = DATASETS[dataset][1]
+    unknown = set(filters) - set(allowed)
+    if unknown:
+        raise ValueError(f'Unknown filters: {", ".join(sorted(unknown))}. Valid filters: {", ".join(allowed)}')
+
+    normalized = {key: str(value) for key, value in filters.items() if value not in (None, '')}
+    for key in ('date_from', 'date_to'):
+        if key in normalized:
+            datetime.strptime(normalized[key], '%Y-%m-%d')
+    return normalized
+
+
+def filter_hash(dataset, file_format, filters):
+    payload = json.dumps([dataset, file_format, filters], sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _stale_cutoff():
+    return timezone.now() - timedelta(seconds=getattr(settings, 'EXPORT_JOB_TIMEOUT', 3600))
+
+
+def _max_age():
+    return getattr(settings, 'EXPORT_JOB_MAX_AGE', 3600)
+
+
+def request_export(dataset, file_format, filters, user=None):
+    """
+    Queue an export, or return an equivalent queued, running or recent job.
+
+    Returns:
+        (job, created)
+    """
+    filters = normalize_filters(dataset, file_format, filters)
+    key = filter_hash(dataset, file_format, filters)
+    recent = timezone.now() - timedelta(seconds=_max_age())
+    stale = _stale_cutoff()
+
+    with transaction.atomic():
+        for job in ExportJob.objects.select_for_update().filter(filter_hash=key).exclude(status='failed')[:5]:
+            # A job still running past EXPORT_JOB_TIMEOUT belongs to a dead worker; queue a fresh one
+            if job.status == 'pending' or (job.status == 'running' and job.started_at >= stale):
+                return job, False
+            if job.status == 'completed' and job.finished_at >= recent and os.path.exists(job.file_path):
+                return job, False
+        job = ExportJob.objects.create(
+            dataset=dataset, file_format=file_format, filters=filters, filter_hash=key, requested_by=user,
+        )
+    return job, True
+
+
+def claim_jobs(limit, worker_id=''):
+    """Mark up to limit pending jobs as running by worker_id and return their ids, oldest first"""
+    with transaction.atomic():
+        jobs = list(
+            ExportJob.objects.select_for_update(skip_locked=True)
+            .filter(status='pending').order_by('created_at')[:limit]
+        )
+        ExportJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+            status='running', started_at=timezone.now(), worker_id=worker_id,
+        )
+    return [job.pk for job in jobs]
+
+
+def requeue_stale_jobs():
+    """Put jobs left running by a worker that died back in the queue"""
+    return ExportJob.objects.filter(status='running', started_at__lt=_stale_cutoff()).update(
+        status='pending', started_at=None, worker_id='',
+    )
+
+
+def requeue_worker_jobs(worker_id):
+    """Put the jobs one worker still has running back in the queue, when it stops or restarts"""
+    return ExportJob.objects.filter(status='running', worker_id=worker_id).update(
+        status='pending', started_at=None, worker_id='',
+    )
+
+
+def fail_job(job_id, error):
+    """Record a running job whose worker process died before run_job could"""
+    return ExportJob.objects.filter(pk=job_id, status='running').update(
+        status='failed', error_message=error, finished_at=timezone.now(),
+    )
+
+
+def delete_expired_files():
+    """
+    Delete the files of jobs that completed more than EXPORT_JOB_MAX_AGE
+    seconds ago, and partial files left by killed runs; returns the number
+    of files removed
+    """
+    removed = 0
+    cutoff = timezone.now() - timedelta(seconds=_max_age())
+    expired = ExportJob.objects.filter(status='completed', finished_at__lt=cutoff).exclude(file_path='')
+    for job_id, file_path in expired.values_list('pk', 'file_path'):
+        if os.path.exists(file_path):
+            os.remove(file_path)
+            removed += 1
+        # The download view reports the job's file as removed
+        ExportJob.objects.filter(pk=job_id).update(file_path='')
+
+    directory = export_dir()
+    if directory.exists():
+        part_cutoff = time.time() - getattr(settings, 'EXPORT_JOB_TIMEOUT', 3600)
+        for partial in directory.glob('*.part'):
+            try:
+                if partial.stat().st_mtime < part_cutoff:
+                    partial.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                # Finished or removed by its run meanwhile
+                pass
+    return removed
+
+
+def _write_csv_gz(path, columns, rows):
+    count = 0
+    with gzip.open(path, 'wt', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+INTEGER_FIELDS = {
+    'AutoField', 'BigAutoField', 'SmallAutoField', 'IntegerField', 'BigIntegerField',
+    'SmallIntegerField', 'PositiveIntegerField', 'PositiveSmallIntegerField', 'PositiveBigIntegerField',
+}
+
+
+def _arrow_type(model, lookup):
+    """Arrow type of the model field a values_list() lookup resolves to"""
+    *path, name = lookup.split('__')
+    for part in path:
+        model = model._meta.get_field(part).related_model
+    field = model._meta.get_field(name)
+    if field.is_relation:
+        field = field.target_field
+    internal_type = field.get_internal_type()
+    if internal_type in INTEGER_FIELDS:
+        return pa.int64()
+    if internal_type == 'FloatField':
+        return pa.float64()
+    if internal_type == 'DecimalField':
+        return pa.decimal128(field.max_digits, field.decimal_places)
+    if internal_type == 'BooleanField':
+        return pa.bool_()
+    if internal_type == 'DateTimeField':
+        return pa.timestamp('us')
+    if internal_type == 'DateField':
+        return pa.date32()
+    return pa.string()
+
+
+def _write_parquet(path, schema, rows):
+    count = 0
+    with pq.ParquetWriter(path, schema, compression='snappy') as writer:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= PARQUET_BATCH_ROWS:
+                writer.write_table(_arrow_table(schema, batch))
+                count += len(batch)
+                batch = []
+        if batch:
+            writer.write_table(_arrow_table(schema, batch))
+            count += len(batch)
+    return count
+
+
+def _arrow_table(schema, rows):
+    columns = zip(*rows)
+    return pa.Table.from_arrays(
+        [pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema,
+    )
+
+
+def run_job(job_id):
+    """
+    Write one claimed job's file and record the outcome; returns the final
+    status, or 'superseded' if the job was requeued and claimed again while
+    this run was writing it
+    """
+    job = ExportJob.objects.get(pk=job_id)
+    # This claim; a requeue or a new claim changes it
+    claim = ExportJob.objects.filter(pk=job.pk, status='running', worker_id=job.worker_id, started_at=job.started_at)
+    build_queryset, _, spec = DATASETS[job.dataset]
+    columns = [column for column, _ in spec]
+    lookups = [lookup for _, lookup in spec]
+    extension = 'parquet' if job.file_format == 'parquet' else 'csv.gz'
+
+    directory = export_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    run = uuid.uuid4().hex[:8]
+    path = directory / f'{job.dataset}_{job.pk}_{job.filter_hash[:12]}_{run}.{extension}'
+    partial = path.with_name(path.name + '.part')
+
+    try:
+        queryset = build_queryset(job.filters)
+        rows = export_rows(queryset, lookups, tuple)
+        if job.file_format == 'parquet':
+            schema = pa.schema([
+                (column, _arrow_type(queryset.model, lookup)) for column, lookup in spec
+            ])
+            count = _write_parquet(partial, schema, rows)
+        else:
+            count = _write_csv_gz(partial, columns, rows)
+        os.replace(partial, path)
+    except Exception as e:
+        if partial.exists():
+            partial.unlink()
+        if not claim.update(status='failed', error_message=str(e), finished_at=timezone.now()):
+            return 'superseded'
+        return 'failed'
+
+    if not claim.update(
+        status='completed', file_path=str(path), row_count=count, file_size=path.stat().st_size,
+        finished_at=timezone.now(),
+    ):
+        path.unlink()
+        return 'superseded'
+    return 'completed'
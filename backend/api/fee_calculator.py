@@ -0,0 +1,199 @@
+"""
+Segment-accurate parking fee calculation.
+
+A booking is split into 15-minute steps and every step is charged the rate
+in force at that moment, instead of charging the whole duration at the rate
+that applies at the start:
+
+- each rate is compiled once into a minute-of-week rate array (hourly rate,
+  special time-slot rate, weekend rate, in increasing precedence, matching
+  PricingRate.get_applicable_rate), cached on the pricing table;
+- steps on a PublicHoliday date use the rate's holiday_rate when set;
+- steps after `overtime_from` are multiplied by extension_rate_multiplier;
+- the charge for each 24-hour block from the booking start is rounded to
+  the cent and capped at the rate's daily_rate.
+
+Rates are held in integer cents and block charges are summed as int64, so
+totals are built from whole cents rather than formatted from a float.
+
+Which rate applies is still decided once per booking, at its start, by the
+pricing table. calculate_fees() prices any number of bookings in one set of
+NumPy operations; calculate_fee() is the single-booking wrapper.
+"""
+from datetime import datetime
+from decimal import Decimal
+
+import numpy as np
+from django.utils import timezone
+
+from .pricing_engine import get_pricing_table
+
+STEP_MINUTES = 15
+STEPS_PER_DAY = 24 * 60 // STEP_MINUTES
+STEPS_PER_WEEK = 7 * STEPS_PER_DAY
+MINUTES_PER_DAY = 24 * 60
+
+# Fallback when no pricing is configured (same as the old hardcoded rate)
+FALLBACK_HOURLY_RATE = Decimal('10.00')
+
+NO_HOLIDAY_RATE = -1
+NO_DAILY_CAP = np.iinfo(np.int64).max
+
+# A Monday, so step 0 of every week starts on Monday 00:00
+_EPOCH = datetime(1970, 1, 5)
+_EPOCH_ORDINAL = _EPOCH.toordinal()
+
+
+def _minutes(dt):
+    """Minutes since _EPOCH"""
+    if timezone.is_aware(dt):
+        dt = timezone.make_naive(dt)
+    return (dt - _EPOCH).total_seconds() / 60
+
+
+def _to_float(value, default):
+    return float(value) if value else default
+
+
+def _to_cents(value, default):
+    return int((Decimal(value) * 100).to_integral_value()) if value else default
+
+
+class RateProfile:
+    """A rate compiled into arrays for vectorised pricing"""
+
+    def __init__(self, hourly_rate, weekend_rate=None, holiday_rate=None, daily_rate=None,
+                 special_rate=None, time_slot_start=None, time_slot_end=None, overtime_multiplier=1):
+        week = np.full(STEPS_PER_WEEK, _to_cents(hourly_rate, 0), dtype=np.int64)
+
+        if special_rate and time_slot_start and time_slot_end:
+            minute_of_day = np.arange(STEPS_PER_DAY) * STEP_MINUTES
+            slot_start = time_slot_start.hour * 60 + time_slot_start.minute
+            slot_end = time_slot_end.hour * 60 + time_slot_end.minute
+            if slot_start <= slot_end:
+                in_slot = (minute_of_day >= slot_start) & (minute_of_day < slot_end)
+            else:
+                # Time slot crosses midnight
+                in_slot = (minute_of_day >= slot_start) | (minute_of_day < slot_end)
+            week[np.tile(in_slot, 7)] = _to_cents(special_rate, 0)
+
+        if weekend_rate:
+            week[5 * STEPS_PER_DAY:] = _to_cents(weekend_rate, 0)
+
+        self.week = week
+        self.holiday_rate = _to_cents(holiday_rate, NO_HOLIDAY_RATE)
+        self.daily_cap = _to_cents(daily_rate, NO_DAILY_CAP)
+        self.overtime_multiplier = _to_float(overtime_multiplier, 1.0)
+
+    @classmethod
+    def from_rate(cls, rate):
+        """Compile a PricingRate or ZonePricingRate"""
+        return cls(
+            rate.hourly_rate,
+            weekend_rate=rate.weekend_rate,
+            holiday_rate=getattr(rate, 'holiday_rate', None),
+            daily_rate=rate.daily_rate,
+            special_rate=getattr(rate, 'special_rate', None),
+            time_slot_start=getattr(rate, 'time_slot_start', None),
+            time_slot_end=getattr(rate, 'time_slot_end', None),
+            overtime_multiplier=getattr(rate, 'extension_rate_multiplier', 1),
+        )
+
+
+_FALLBACK_PROFILE = RateProfile(FALLBACK_HOURLY_RATE)
+
+
+def _profile_for(table, rate):
+    if rate is None:
+        return _FALLBACK_PROFILE
+    profiles = table.memo.setdefault('fee_profiles', {})
+    key = (rate._meta.label, rate.pk)
+    if key not in profiles:
+        profiles[key] = RateProfile.from_rate(rate)
+    return profiles[key]
+
+
+def calculate_fees(bookings):
+    """
+    Price many bookings at once.
+
+    Args:
+        bookings: Iterable of (start_time, end_time, vehicle_type, parking_zone)
+            tuples, optionally with a fifth overtime_from element; time after
+            overtime_from is charged with the extension multiplier.
+            parking_zone may be None.
+
+    Returns:
+        list of Decimal fees, in input order
+    """
+    bookings = list(bookings)
+    count = len(bookings)
+    if not count:
+        return []
+
+    table = get_pricing_table()
+    profiles = []
+    profile_rows = {}
+    profile_index = np.empty(count, dtype=np.int64)
+    start_min = np.empty(count)
+    end_min = np.empty(count)
+    overtime_min = np.full(count, np.inf)
+
+    for i, booking in enumerate(bookings):
+        start_time, end_time, vehicle_type, parking_zone = booking[:4]
+        profile = _profile_for(table, table.resolve_rate(vehicle_type, start_time, parking_zone))
+        if id(profile) not in profile_rows:
+            profile_rows[id(profile)] = len(profiles)
+            profiles.append(profile)
+        profile_index[i] = profile_rows[id(profile)]
+        start_min[i] = _minutes(start_time)
+        end_min[i] = _minutes(end_time)
+        if len(booking) > 4 and booking[4] is not None:
+            overtime_min[i] = _minutes(booking[4])
+
+    # Expand every booking into its 15-minute steps
+    first_step = np.floor(start_min / STEP_MINUTES).astype(np.int64)
+    last_step = np.ceil(end_min / STEP_MINUTES).astype(np.int64)
+    step_counts = np.where(end_min > start_min, last_step - first_step, 0)
+    total_steps = int(step_counts.sum())
+    if not total_steps:
+        return [Decimal('0.00')] * count
+
+    owner = np.repeat(np.arange(count), step_counts)
+    offsets = np.cumsum(step_counts) - step_counts
+    step = np.repeat(first_step, step_counts) + (np.arange(total_steps) - np.repeat(offsets, step_counts))
+
+    # Minutes of each step actually booked, and how many of those are overtime
+    seg_start = np.maximum(step * STEP_MINUTES, start_min[owner])
+    seg_end = np.minimum((step + 1) * STEP_MINUTES, end_min[owner])
+    minutes = seg_end - seg_start
+    overtime = np.clip(seg_end - np.maximum(seg_start, overtime_min[owner]), 0, None)
+
+    # Rate in cents for each step: week array, overridden on holidays
+    row = profile_index[owner]
+    week = np.stack([p.week for p in profiles])
+    rate = week[row, step % STEPS_PER_WEEK]
+    holiday_rate = np.array([p.holiday_rate for p in profiles], dtype=np.int64)[row]
+    if table.holidays:
+        holiday_days = np.array([d.toordinal() - _EPOCH_ORDINAL for d in table.holidays])
+        on_holiday = np.isin(step // STEPS_PER_DAY, holiday_days) & (holiday_rate != NO_HOLIDAY_RATE)
+        rate = np.where(on_holiday, holiday_rate, rate)
+
+    multiplier = np.array([p.overtime_multiplier for p in profiles])[row]
+    charge = rate / 60 * (minutes - overtime + overtime * multiplier)
+
+    # Charge each 24-hour block from the booking start in whole cents,
+    # capped at the daily rate
+    block = ((seg_start - start_min[owner]) // MINUTES_PER_DAY).astype(np.int64)
+    blocks = int(block.max()) + 1
+    block_totals = np.bincount(owner * blocks + block, weights=charge, minlength=count * blocks)
+    block_cents = np.rint(block_totals).astype(np.int64).reshape(count, blocks)
+    daily_cap = np.array([p.daily_cap for p in profiles], dtype=np.int64)[profile_index]
+    totals = np.minimum(block_cents, daily_cap[:, None]).sum(axis=1)
+
+    return [Decimal(int(cents)).scaleb(-2) for cents in totals]
+
+
+def calculate_fee(start_time, end_time, vehicle_type, parking_zone=None, overtime_from=None):
+    """Price a single booking; see calculate_fees()"""
+    return calculate_fees([(start_time, end_time, vehicle_type, parking_zone, overtime_from)])[0]
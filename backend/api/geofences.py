@@ -0,0 +1,186 @@
+"""
+In-process geofence registry for check-in/check-out location validation.
+
+Active Geofence rows are loaded into a GeofenceRegistry that maps every
+GRID_DEGREES x GRID_DEGREES lat/lon cell to the fences whose bounding box
+touches it. Locating a point is one dict lookup for its cell followed by an
+exact circle or polygon test on the few fences registered there, so the
+cost does not grow with the number of sites.
+
+Saving or deleting a Geofence bumps a version key in the default cache (see
+the receivers in api/signals.py), and each process rebuilds its registry
+when it sees a new version. GEOFENCE_REGISTRY_MAX_AGE caps the age of a
+registry should the version key be evicted.
+"""
+import math
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from .geo_index import haversine_km
+from .models import Geofence
+from .utils import calculate_distance
+
+VERSION_CACHE_KEY = 'geofence_registry_version'
+# ~1.1 km of latitude; a 500 m fence touches at most four cells
+GRID_DEGREES = 0.01
+METERS_PER_DEGREE_LAT = 111195.0
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def bump_version():
+    """Invalidate every process's registry after a geofence change"""
+    global _registry
+    try:
+        cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        cache.add(VERSION_CACHE_KEY, 1, timeout=None)
+    _registry = None
+
+
+def current_version():
+    return cache.get(VERSION_CACHE_KEY, 0)
+
+
+def _cell(lat, lon):
+    return (math.floor(lat / GRID_DEGREES), math.floor(lon / GRID_DEGREES))
+
+
+class Fence:
+    """A geofence compiled for containment tests"""
+
+    def __init__(self, name, parking_zone, shape, latitude=None, longitude=None, radius_meters=None, polygon=()):
+        self.name = name
+        self.parking_zone = parking_zone
+        self.shape = shape
+        self.vertices = tuple((float(lat), float(lon)) for lat, lon in polygon)
+
+        if shape == 'polygon':
+            lats = [lat for lat, _ in self.vertices]
+            lons = [lon for _, lon in self.vertices]
+            self.latitude = sum(lats) / len(lats)
+            self.longitude = sum(lons) / len(lons)
+            # Radius of the circle around the centroid that holds the polygon
+            self.radius_meters = max(calculate_distance(self.latitude, self.longitude, lat, lon)
+                                     for lat, lon in self.vertices)
+            self.bbox = (min(lats), max(lats), min(lons), max(lons))
+        else:
+            self.latitude = latitude
+            self.longitude = longitude
+            self.radius_meters = radius_meters
+            dlat = radius_meters / METERS_PER_DEGREE_LAT
+            dlon = dlat / max(math.cos(math.radians(abs(latitude) + dlat)), 1e-6)
+            self.bbox = (latitude - dlat, latitude + dlat, longitude - dlon, longitude + dlon)
+
+    @classmethod
+    def from_model(cls, geofence):
+        return cls(
+            geofence.name, geofence.parking_zone, geofence.shape,
+            geofence.latitude, geofence.longitude, geofence.radius_meters, geofence.polygon or (),
+        )
+
+    def cells(self):
+        min_lat, max_lat, min_lon, max_lon = self.bbox
+        (row0, col0), (row1, col1) = _cell(min_lat, min_lon), _cell(max_lat, max_lon)
+        for row in range(row0, row1 + 1):
+            for col in range(col0, col1 + 1):
+                yield (row, col)
+
+    def _in_polygon(self, lat, lon):
+        """Even-odd ray casting in lat/lon coordinates (fine for site-sized polygons)"""
+        inside = False
+        previous = self.vertices[-1]
+        for current in self.vertices:
+            (lat1, lon1), (lat2, lon2) = previous, current
+            if (lat1 > lat) != (lat2 > lat):
+                crossing = lon1 + (lat - lat1) * (lon2 - lon1) / (lat2 - lat1)
+                if lon < crossing:
+                    inside = not inside
+            previous = current
+        return inside
+
+    def contains(self, lat, lon):
+        """Return (is_inside, distance in meters from the fence center)"""
+        distance = calculate_distance(lat, lon, self.latitude, self.longitude)
+        if self.shape == 'polygon':
+            return self._in_polygon(lat, lon), distance
+        return distance <= self.radius_meters, distance
+
+    def as_location(self):
+        """Location dict as returned by utils.get_parking_locations()"""
+        return {
+            'lat': self.latitude,
+            'lon': self.longitude,
+            'radius_meters': self.radius_meters,
+            'name': self.name,
+            'parking_zone': self.parking_zone,
+            'shape': self.shape,
+        }
+
+
+class GeofenceRegistry:
+    """Immutable grid index over the active geofences"""
+
+    def __init__(self, fences, version):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.fences = tuple(fences)
+
+        grid = {}
+        for fence in self.fences:
+            for cell in fence.cells():
+                grid.setdefault(cell, []).append(fence)
+        self.grid = {cell: tuple(fences) for cell, fences in grid.items()}
+
+        self._lats = np.array([f.latitude for f in self.fences], dtype=float)
+        self._lons = np.array([f.longitude for f in self.fences], dtype=float)
+        self.locations = [fence.as_location() for fence in self.fences]
+
+    @classmethod
+    def build(cls, version=None):
+        return cls(
+            [Fence.from_model(g) for g in Geofence.objects.filter(is_active=True)],
+            current_version() if version is None else version,
+        )
+
+    def locate(self, lat, lon):
+        """
+        The fence containing the point, nearest center first.
+
+        Returns:
+            (fence, distance_meters), or (None, None) if no fence contains it
+        """
+        best = (None, None)
+        for fence in self.grid.get(_cell(lat, lon), ()):
+            inside, distance = fence.contains(lat, lon)
+            if inside and (best[1] is None or distance < best[1]):
+                best = (fence, distance)
+        return best
+
+    def nearest(self, lat, lon):
+        """(fence, distance_meters) of the fence with the nearest center, or (None, inf)"""
+        if not self.fences:
+            return None, float('inf')
+        distances = haversine_km(lat, lon, self._lats, self._lons)
+        i = int(np.argmin(distances))
+        return self.fences[i], calculate_distance(lat, lon, self.fences[i].latitude, self.fences[i].longitude)
+
+
+def get_registry():
+    """Return the process-wide geofence registry, rebuilding it if stale"""
+    global _registry
+    max_age = getattr(settings, 'GEOFENCE_REGISTRY_MAX_AGE', 60)
+    version = current_version()
+    registry = _registry
+    if registry is not None and registry.version == version and time.monotonic() - registry.built_at < max_age:
+        return registry
+
+    with _registry_lock:
+        if _registry is None or _registry is registry:
+            _registry = GeofenceRegistry.build(version=version)
+        return _registry
@@ -0,0 +1,93 @@
+"""
+Cached live occupancy counters per parking lot and per zone.
+
+Counts of occupied and total slots are kept in the default cache so pricing
+can read occupancy on every request without counting slots. On a miss, one
+grouped query fills the counters for every lot and zone at once; after that
+ParkingSlot saves adjust them in place with cache.incr/decr (see the
+receivers in api/signals.py). Counters expire after
+LIVE_OCCUPANCY_TIMEOUT seconds, which bounds drift from queryset.update()
+calls that bypass signals.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .models import ParkingSlot
+
+SCOPES = {'lot': 'parking_lot', 'zone': 'parking_zone'}
+
+
+def _key(scope, value, counter):
+    return f'live_occupancy:{scope}:{value}:{counter}'
+
+
+def _timeout():
+    return getattr(settings, 'LIVE_OCCUPANCY_TIMEOUT', 300)
+
+
+def refresh():
+    """Recount every lot and zone with one grouped query per scope"""
+    values = {}
+    for scope, field in SCOPES.items():
+        rows = ParkingSlot.objects.values(field).annotate(
+            total=Count('id'),
+            occupied=Count('id', filter=Q(is_occupied=True)),
+        ).order_by()
+        for row in rows:
+            values[_key(scope, row[field], 'total')] = row['total']
+            values[_key(scope, row[field], 'occupied')] = row['occupied']
+        values[_key(scope, '*', 'loaded')] = 1
+    cache.set_many(values, _timeout())
+
+
+def invalidate():
+    """Force a recount on the next read, e.g. after a bulk queryset.update()"""
+    cache.delete_many([_key(scope, '*', 'loaded') for scope in SCOPES])
+
+
+def get_occupancy(scope, value):
+    """
+    Return (occupied, total, percent) for a lot id or zone code.
+
+    Args:
+        scope: 'lot' or 'zone'
+        value: ParkingLot id or parking zone code
+    """
+    keys = [_key(scope, value, 'occupied'), _key(scope, value, 'total'), _key(scope, '*', 'loaded')]
+    cached = cache.get_many(keys)
+    if keys[2] not in cached:
+        refresh()
+        cached = cache.get_many(keys)
+    occupied = cached.get(keys[0], 0)
+    total = cached.get(keys[1], 0)
+    percent = round(occupied * 100 / total, 1) if total else 0.0
+    return occupied, total, percent
+
+
+def slot_state(slot):
+    """The (lot id, zone, is_occupied) a slot contributes to the counters"""
+    return (slot.parking_lot_id, slot.parking_zone, slot.is_occupied)
+
+
+def _adjust(state, sign):
+    lot_id, zone, is_occupied = state
+    for scope, value in (('lot', lot_id), ('zone', zone)):
+        for counter, amount in (('total', 1), ('occupied', 1 if is_occupied else 0)):
+            if not amount:
+                continue
+            try:
+                cache.incr(_key(scope, value, counter), sign * amount)
+            except ValueError:
+                # Counter not loaded; the next read recounts
+                pass
+
+
+def move_slot(before, after):
+    """Move a slot's contribution between counters after a save or delete"""
+    if before == after:
+        return
+    if before is not None:
+        _adjust(before, -1)
+    if after is not None:
+        _adjust(after, 1)
@@ -0,0 +1,68 @@
+"""
+Per-zone slot availability for the parking location views.
+
+Total, occupied and available slot counts for every parking zone come from
+one grouped query and are cached in the default cache for
+LOCATION_AVAILABILITY_TTL seconds. Booking and ParkingSlot writes drop the
+cached value on commit (see the receivers in api/signals.py), so the TTL
+only bounds staleness from bookings that start or end with no write.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Exists, OuterRef, Q
+from django.utils import timezone
+
+from .models import Booking, ParkingSlot
+
+CACHE_KEY = 'location_availability'
+ACTIVE_BOOKING_STATUSES = ['confirmed', 'checked_in']
+
+
+def compute():
+    """
+    Count slots per zone with one grouped query.
+
+    A slot is occupied if it is flagged occupied or has an active booking in
+    progress now.
+
+    Returns:
+        dict mapping parking zone to {'total', 'occupied', 'available'}
+    """
+    now = timezone.now()
+    in_use = Booking.objects.filter(
+        slot=OuterRef('pk'),
+        start_time__lte=now,
+        end_time__gte=now,
+        is_active=True,
+        status__in=ACTIVE_BOOKING_STATUSES,
+    )
+    rows = (
+        ParkingSlot.objects.alias(in_use=Exists(in_use))
+        .values('parking_zone')
+        .annotate(
+            total=Count('id'),
+            occupied=Count('id', filter=Q(is_occupied=True) | Q(in_use=True)),
+        )
+        .order_by()
+    )
+    return {
+        row['parking_zone']: {
+            'total': row['total'],
+            'occupied': row['occupied'],
+            'available': max(0, row['total'] - row['occupied']),
+        }
+        for row in rows
+    }
+
+
+def get_zone_availability():
+    """compute(), cached for LOCATION_AVAILABILITY_TTL seconds"""
+    counts = cache.get(CACHE_KEY)
+    if counts is None:
+        counts = compute()
+        cache.set(CACHE_KEY, counts, getattr(settings, 'LOCATION_AVAILABILITY_TTL', 30))
+    return counts
+
+
+def invalidate():
+    cache.delete(CACHE_KEY)
@@ -0,0 +1,182 @@
+"""
+Parking lot search by name and address.
+
+On PostgreSQL, matching and ranking run in the database against the
+gin_trgm_ops indexes on ParkingLot.name and ParkingLot.address: substring
+(ILIKE), word-prefix (regex) and fuzzy (word similarity, pg_trgm) matches
+are all served by the trigram indexes, so latency stays flat as the
+catalogue grows. Results are ranked by prefix match first, then by trigram
+word similarity.
+
+Other database backends (e.g. SQLite test runs) use an in-memory trigram
+index over all lots that mimics the same matching and ranking. It is
+rebuilt when a ParkingLot changes (see the receivers in api/signals.py) or
+after LOT_SEARCH_INDEX_MAX_AGE seconds.
+"""
+import re
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Greatest
+
+from .models import ParkingLot
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+# Same default as pg_trgm.word_similarity_threshold
+WORD_SIMILARITY_THRESHOLD = 0.6
+VERSION_CACHE_KEY = 'lot_search_version'
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def bump_version():
+    """Invalidate every process's in-memory index after a lot change"""
+    global _index
+    try:
+        cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        cache.add(VERSION_CACHE_KEY, 1, timeout=None)
+    _index = None
+
+
+def normalize(text):
+    return ' '.join(re.findall(r'\w+', (text or '').lower()))
+
+
+def trigrams(text):
+    """pg_trgm-style trigrams: each word padded with two leading and one trailing space"""
+    grams = set()
+    for word in normalize(text).split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _is_prefix_match(query, text):
+    text = normalize(text)
+    return text.startswith(query) or f' {query}' in text
+
+
+def search_lots(query, limit=DEFAULT_LIMIT, typeahead=False):
+    """
+    Ranked lots whose name or address matches the query.
+
+    Args:
+        query: Free text; matched as a substring, a word prefix or fuzzily
+        limit: Maximum number of results (capped at MAX_LIMIT)
+        typeahead: Only return lots with a word in the name or address that
+            starts with the query
+
+    Returns:
+        list of ParkingLot with a search_rank attribute, best first
+    """
+    query = normalize(query)
+    limit = max(1, min(limit, MAX_LIMIT))
+    if not query:
+        return []
+    if connection.vendor == 'postgresql':
+        return _search_postgres(query, limit, typeahead)
+    return _get_index().search(query, limit, typeahead)
+
+
+def _search_postgres(query, limit, typeahead):
+    from django.contrib.postgres.search import TrigramWordSimilarity
+
+    word_prefix = r'\m' + re.escape(query)
+    prefix_match = Q(name__iregex=word_prefix) | Q(address__iregex=word_prefix)
+    if typeahead:
+        match = prefix_match
+    else:
+        match = (
+            prefix_match
+            | Q(name__icontains=query) | Q(address__icontains=query)
+            | Q(name__trigram_word_similar=query) | Q(address__trigram_word_similar=query)
+        )
+
+    lots = (
+        ParkingLot.objects.filter(match)
+        .annotate(
+            is_prefix=Case(When(prefix_match, then=Value(1)), default=Value(0), output_field=IntegerField()),
+            search_rank=Greatest(TrigramWordSimilarity(query, 'name'), TrigramWordSimilarity(query, 'address')),
+        )
+        .order_by('-is_prefix', '-search_rank', 'name')[:limit]
+    )
+    return list(lots)
+
+
+class NgramIndex:
+    """In-memory trigram posting lists over lot names and addresses"""
+
+    def __init__(self, rows, version):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.texts = {}
+        self.postings = {}
+        for pk, name, address in rows:
+            self.texts[pk] = (name, address)
+            for gram in trigrams(name) | trigrams(address):
+                self.postings.setdefault(gram, set()).add(pk)
+
+    @classmethod
+    def build(cls, version=None):
+        return cls(
+            ParkingLot.objects.values_list('pk', 'name', 'address'),
+            cache.get(VERSION_CACHE_KEY, 0) if version is None else version,
+        )
+
+    def _word_similarity(self, query_grams, text):
+        """Share of the query's trigrams found in the text (an upper bound of pg word_similarity)"""
+        return len(query_grams & trigrams(text)) / len(query_grams)
+
+    def search(self, query, limit, typeahead=False):
+        query_grams = trigrams(query)
+        # Lots sharing enough trigrams with the query to reach the threshold
+        shared = Counter()
+        for gram in query_grams:
+            shared.update(self.postings.get(gram, ()))
+        needed = WORD_SIMILARITY_THRESHOLD * len(query_grams)
+
+        scored = []
+        for pk in shared:
+            name, address = self.texts[pk]
+            is_prefix = _is_prefix_match(query, name) or _is_prefix_match(query, address)
+            if typeahead and not is_prefix:
+                continue
+            substring = query in normalize(name) or query in normalize(address)
+            if not (is_prefix or substring or shared[pk] >= needed):
+                continue
+            rank = max(self._word_similarity(query_grams, name), self._word_similarity(query_grams, address))
+            if not (is_prefix or substring) and rank < WORD_SIMILARITY_THRESHOLD:
+                continue
+            scored.append((-int(is_prefix), -rank, name, pk))
+
+        scored.sort()
+        top = scored[:limit]
+        lots = ParkingLot.objects.in_bulk([pk for *_, pk in top])
+        results = []
+        for _, rank, _, pk in top:
+            if pk in lots:
+                lots[pk].search_rank = -rank
+                results.append(lots[pk])
+        return results
+
+
+def _get_index():
+    global _index
+    max_age = getattr(settings, 'LOT_SEARCH_INDEX_MAX_AGE', 60)
+    version = cache.get(VERSION_CACHE_KEY, 0)
+    index = _index
+    if index is not None and index.version == version and time.monotonic() - index.built_at < max_age:
+        return index
+
+    with _index_lock:
+        if _index is None or _index is index:
+            _index = NgramIndex.build(version=version)
+        return _index
@@ -0,0 +1,123 @@
+"""
+Check the in-process availability index against the database and time it.
+Usage: python manage.py benchmark_availability_index [--slots 5000] [--bookings-per-slot 20] [--queries 200]
+
+Synthetic slots and bookings are generated inside a transaction that is rolled
+back at the end, so the command leaves the database untouched.
+"""
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from api.availability_index import HORIZON_DAYS, RESOLUTION_MINUTES, SlotAvailabilityIndex, np
+from api.booking_conflicts import free_slots, is_slot_available
+from api.models import Booking, ParkingSlot, User
+
+
+class Command(BaseCommand):
+    help = 'Verify the availability index against the database and benchmark it'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--slots', type=int, default=5000, help='Number of synthetic slots (default: 5000)')
+        parser.add_argument('--bookings-per-slot', type=int, default=20, help='Bookings per slot in the horizon (default: 20)')
+        parser.add_argument('--queries', type=int, default=200, help='Number of random windows to check (default: 200)')
+        parser.add_argument('--per-slot-queries', type=int, default=5, help='Windows timed with one SQL query per slot (default: 5)')
+
+    def handle(self, *args, **options):
+        if np is None:
+            raise CommandError('NumPy is not installed; the availability index is disabled.')
+
+        with transaction.atomic():
+            slot_ids = self.populate(options['slots'], options['bookings_per_slot'])
+            started = time.perf_counter()
+            index = SlotAvailabilityIndex.build()
+            self.stdout.write(f'  Built index in {(time.perf_counter() - started) * 1000:.1f} ms '
+                              f'({index.bitmap.nbytes / 1024:.0f} KiB)')
+
+            windows = [self.random_window(index) for _ in range(options['queries'])]
+            self.verify(index, slot_ids, windows)
+            self.benchmark(index, slot_ids, windows, options['per_slot_queries'])
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('\n✅ Benchmark complete (synthetic data rolled back)'))
+
+    def populate(self, slot_count, per_slot):
+        self.stdout.write(f'Generating {slot_count} slots with {per_slot} bookings each...')
+        user = User.objects.create(username='benchmark_index', email='benchmark_index@example.invalid')
+        slots = ParkingSlot.objects.bulk_create(
+            ParkingSlot(slot_number=f'IDX-{i}', floor='B', section='Z') for i in range(slot_count)
+        )
+
+        # Disjoint bookings per slot, some off the 5-minute grid
+        now = timezone.now()
+        spacing = timedelta(days=HORIZON_DAYS) / per_slot
+        batch = []
+        for slot in slots:
+            cursor = now
+            for _ in range(per_slot):
+                start = cursor + timedelta(minutes=random.randint(0, int(spacing.total_seconds() // 120)))
+                end = start + timedelta(minutes=random.randint(20, int(spacing.total_seconds() // 120)))
+                batch.append(Booking(user=user, slot=slot, start_time=start, end_time=end, initial_end_time=end))
+                cursor += spacing
+        Booking.objects.bulk_create(batch, batch_size=10000)
+        return {slot.pk for slot in slots}
+
+    def random_window(self, index):
+        step = timedelta(minutes=RESOLUTION_MINUTES)
+        first = random.randrange(1, index.steps - 60)
+        start = index.origin + first * step
+        end = start + random.randint(6, 48) * step
+        return start, end
+
+    def db_free_ids(self, slot_ids, start, end):
+        slots = free_slots(ParkingSlot.objects.filter(pk__in=slot_ids), start, end)
+        return set(slots.values_list('pk', flat=True))
+
+    def verify(self, index, slot_ids, windows):
+        self.stdout.write('Verifying against the database...')
+        mismatches = 0
+        for start, end in windows:
+            if set(index.free_slot_ids(start, end, slot_ids)) != self.db_free_ids(slot_ids, start, end):
+                mismatches += 1
+
+        # Off-grid windows may be reported busy but never free
+        unsafe = 0
+        for start, end in windows[:20]:
+            start += timedelta(seconds=random.randint(1, 299))
+            if not set(index.free_slot_ids(start, end, slot_ids)) <= self.db_free_ids(slot_ids, start, end):
+                unsafe += 1
+
+        if mismatches or unsafe:
+            raise CommandError(f'{mismatches} grid-aligned and {unsafe} off-grid window(s) disagree with the database')
+        self.stdout.write(self.style.SUCCESS(f'  ✅ {len(windows)} windows match the database'))
+
+    def benchmark(self, index, slot_ids, windows, per_slot_queries):
+        ids = sorted(slot_ids)
+        self.report('Index (all slots)', windows, lambda s, e: index.free_slot_ids(s, e, ids))
+        self.report('Single SQL query (free_slots)', windows, lambda s, e: self.db_free_ids(ids, s, e))
+        self.report(
+            'One SQL query per slot',
+            windows[:per_slot_queries],
+            lambda s, e: [slot_id for slot_id in ids if is_slot_available(slot_id, s, e)],
+        )
+
+    def report(self, label, windows, func):
+        timings = []
+        for start, end in windows:
+            started = time.perf_counter()
+            func(start, end)
+            timings.append((time.perf_counter() - started) * 1000)
+        if not timings:
+            self.stdout.write(f'  {label}: no cases')
+            return
+        timings.sort()
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        self.stdout.write(
+            f'  {label}: mean {statistics.mean(timings):.3f} ms, '
+            f'p50 {statistics.median(timings):.3f} ms, p99 {p99:.3f} ms ({len(timings)} queries)'
+        )
@@ -0,0 +1,122 @@
+"""
+Benchmark the booking conflict engine against the legacy overlap scans.
+Usage: python manage.py benchmark_booking_conflicts [--bookings 1000000] [--slots 1000] [--queries 2000]
+
+Synthetic slots and bookings are generated inside a transaction that is rolled
+back at the end, so the command leaves the database untouched.
+"""
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from api.booking_conflicts import get_extension_limit, is_slot_available
+from api.models import Booking, ParkingSlot, User
+
+
+class Command(BaseCommand):
+    help = 'Compare booking conflict engine queries with the legacy overlap scans'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookings', type=int, default=1000000, help='Number of synthetic bookings (default: 1000000)')
+        parser.add_argument('--slots', type=int, default=1000, help='Number of synthetic slots (default: 1000)')
+        parser.add_argument('--queries', type=int, default=2000, help='Number of timed queries per method (default: 2000)')
+        parser.add_argument('--batch-size', type=int, default=10000, help='bulk_create batch size (default: 10000)')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            slots, windows = self.populate(options)
+            self.run(slots, windows, options['queries'])
+            transaction.set_rollback(True)
+        self.stdout.write(self.style.SUCCESS('\n✅ Benchmark complete (synthetic data rolled back)'))
+
+    def populate(self, options):
+        total = options['bookings']
+        slot_count = options['slots']
+        batch_size = options['batch_size']
+
+        self.stdout.write(f'Generating {total} bookings over {slot_count} slots...')
+        user = User.objects.create(username='benchmark_conflicts', email='benchmark_conflicts@example.invalid')
+        slots = ParkingSlot.objects.bulk_create(
+            ParkingSlot(slot_number=f'BENCH-{i}', floor='B', section='Z') for i in range(slot_count)
+        )
+
+        # Back-to-back bookings with random gaps; disjoint per slot as the constraint requires
+        origin = timezone.now() - timedelta(days=365)
+        per_slot = max(1, total // slot_count)
+        windows = []
+        batch = []
+        for slot in slots:
+            cursor = origin
+            for _ in range(per_slot):
+                cursor += timedelta(minutes=random.choice([0, 15, 30, 60]))
+                end = cursor + timedelta(minutes=random.choice([60, 90, 120, 180]))
+                batch.append(Booking(user=user, slot=slot, start_time=cursor, end_time=end, initial_end_time=end))
+                cursor = end
+                if len(batch) >= batch_size:
+                    Booking.objects.bulk_create(batch)
+                    batch = []
+            windows.append((slot, origin, cursor))
+        if batch:
+            Booking.objects.bulk_create(batch)
+
+        self.stdout.write(f'  Inserted {Booking.objects.filter(user=user).count()} bookings')
+        return slots, windows
+
+    def run(self, slots, windows, queries):
+        probes = []
+        for _ in range(queries):
+            slot, first, last = random.choice(windows)
+            start = first + (last - first) * random.random()
+            probes.append((slot, start, start + timedelta(hours=2)))
+
+        targets = []
+        for slot, start, _ in probes:
+            booking = Booking.objects.filter(slot=slot, start_time__lte=start, is_active=True).order_by('-start_time').first()
+            if booking:
+                targets.append(booking)
+
+        self.report('Overlap check (legacy scan)', probes, self.legacy_overlap)
+        self.report('Overlap check (engine)', probes, lambda slot, start, end: is_slot_available(slot, start, end))
+        self.report('Extension limit (legacy scan)', targets, self.legacy_extension_limit)
+        self.report('Extension limit (engine)', targets, get_extension_limit)
+
+    def legacy_overlap(self, slot, start, end):
+        return not Booking.objects.filter(
+            slot=slot,
+            start_time__lt=end,
+            end_time__gt=start,
+            is_active=True
+        ).exists()
+
+    def legacy_extension_limit(self, booking):
+        # The legacy code could only test a fixed window; finding the limit meant walking the slot's bookings
+        later_starts = [
+            other.start_time
+            for other in Booking.objects.filter(slot=booking.slot, is_active=True).exclude(pk=booking.pk)
+            if other.end_time > booking.end_time
+        ]
+        return max(min(later_starts), booking.end_time) if later_starts else None
+
+    def report(self, label, cases, func):
+        timings = []
+        for case in cases:
+            started = time.perf_counter()
+            if isinstance(case, tuple):
+                func(*case)
+            else:
+                func(case)
+            timings.append((time.perf_counter() - started) * 1000)
+        if not timings:
+            self.stdout.write(f'  {label}: no cases')
+            return
+        timings.sort()
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        self.stdout.write(
+            f'  {label}: mean {statistics.mean(timings):.3f} ms, '
+            f'p50 {statistics.median(timings):.3f} ms, p99 {p99:.3f} ms ({len(timings)} queries)'
+        )
@@ -0,0 +1,95 @@
+"""
+Check the nearest-lot search against a brute-force scan and time it.
+Usage: python manage.py benchmark_lot_search [--lots 20000] [--queries 200] [--limit 10]
+
+Synthetic lots are generated inside a transaction that is rolled back at the
+end, so the command leaves the database untouched.
+"""
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.geo_index import haversine_km, nearest_lot_ids, np
+from api.models import ParkingLot
+
+# Synthetic lots are spread over a metro-sized area around this point
+CENTER = (12.9716, 77.5946)
+SPREAD_DEGREES = 0.5
+
+
+class Command(BaseCommand):
+    help = 'Verify the nearest-lot search against a brute-force scan and benchmark it'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lots', type=int, default=20000, help='Number of synthetic lots (default: 20000)')
+        parser.add_argument('--queries', type=int, default=200, help='Number of random points to search (default: 200)')
+        parser.add_argument('--limit', type=int, default=10, help='Lots per k-nearest search (default: 10)')
+        parser.add_argument('--radius', type=float, default=5, help='Radius of the bounded search in km (default: 5)')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.populate(options['lots'])
+            points = [self.random_point() for _ in range(options['queries'])]
+            self.verify(points, options['limit'], options['radius'])
+            self.benchmark(points, options['limit'], options['radius'])
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('\n✅ Benchmark complete (synthetic data rolled back)'))
+
+    def random_point(self):
+        return (
+            CENTER[0] + random.uniform(-SPREAD_DEGREES, SPREAD_DEGREES),
+            CENTER[1] + random.uniform(-SPREAD_DEGREES, SPREAD_DEGREES),
+        )
+
+    def populate(self, count):
+        self.stdout.write(f'Generating {count} lots...')
+        ParkingLot.objects.bulk_create(
+            (ParkingLot(name=f'GEO-{i}', address='Benchmark', latitude=lat, longitude=lon)
+             for i, (lat, lon) in enumerate(self.random_point() for _ in range(count))),
+            batch_size=5000,
+        )
+
+    def brute_force(self, lat, lon, limit, radius_km):
+        rows = np.array(list(ParkingLot.objects.values_list('pk', 'latitude', 'longitude')), dtype=float)
+        distances = haversine_km(lat, lon, rows[:, 1], rows[:, 2])
+        ranked = sorted(zip(distances.tolist(), rows[:, 0].astype(int).tolist()))
+        if radius_km is not None:
+            ranked = [item for item in ranked if item[0] <= radius_km]
+        return [lot_id for _, lot_id in ranked[:limit]]
+
+    def verify(self, points, limit, radius_km):
+        self.stdout.write('Verifying against a brute-force scan...')
+        mismatches = 0
+        for lat, lon in points[:50]:
+            for radius in (None, radius_km):
+                found = [lot_id for lot_id, _ in nearest_lot_ids(lat, lon, limit=limit, radius_km=radius)]
+                if found != self.brute_force(lat, lon, limit, radius):
+                    mismatches += 1
+        if mismatches:
+            raise CommandError(f'{mismatches} search(es) disagree with the brute-force scan')
+        self.stdout.write(self.style.SUCCESS(f'  ✅ {min(len(points), 50) * 2} searches match'))
+
+    def benchmark(self, points, limit, radius_km):
+        self.report(f'k-nearest (k={limit})', points, lambda lat, lon: nearest_lot_ids(lat, lon, limit=limit))
+        self.report(
+            f'Within {radius_km:g} km (k={limit})', points,
+            lambda lat, lon: nearest_lot_ids(lat, lon, limit=limit, radius_km=radius_km),
+        )
+        self.report('Brute-force scan', points[:20], lambda lat, lon: self.brute_force(lat, lon, limit, None))
+
+    def report(self, label, points, func):
+        timings = []
+        for lat, lon in points:
+            started = time.perf_counter()
+            func(lat, lon)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        self.stdout.write(
+            f'  {label}: mean {statistics.mean(timings):.3f} ms, '
+            f'p50 {statistics.median(timings):.3f} ms, p99 {p99:.3f} ms ({len(timings)} queries)'
+        )
@@ -1,5 +1,5 @@
 from django.core.management.base import BaseCommand
-from api.models import User, Notification
+from api.models import User
 from api.views import create_system_notification, create_emergency_alert, create_scheduled_maintenance_alert
 from datetime import datetime
 
@@ -47,12 +47,10 @@ class Command(BaseCommand):
                     create_scheduled_maintenance_alert(maintenance_datetime, duration)
                 else:
                     # Create immediate maintenance notification
-                    users = User.objects.filter(is_active=True)
                     create_system_notification(
                         notification_type='maintenance',
                         title=title,
-                        message=message,
-                        users=users
+                        message=message
                     )
                 
                 self.stdout.write(
@@ -62,23 +60,17 @@ class Command(BaseCommand):
                 )
                 
             elif notification_type == 'alert':
-                # Determine target user groups
-                if target == 'customers':
-                    users = User.objects.filter(role='customer', is_active=True)
-                elif target == 'admins':
-                    users = User.objects.filter(role='admin', is_active=True)
-                elif target == 'security':
-                    users = User.objects.filter(role='security', is_active=True)
-                else:  # 'all'
-                    users = User.objects.filter(is_active=True)
-                
-                create_system_notification(
+                broadcast = create_system_notification(
                     notification_type='system_alert',
                     title=title,
                     message=message,
-                    users=users
+                    audience=target
                 )
                 
+                users = User.objects.filter(is_active=True)
+                if broadcast.audience_role:
+                    users = users.filter(role=broadcast.audience_role)
+                
                 self.stdout.write(
                     self.style.SUCCESS(
                         f'System alert "{title}" created for {users.count()} users in group "{target}".'
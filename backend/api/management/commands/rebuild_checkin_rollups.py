@@ -0,0 +1,34 @@
+"""
+Rebuild the hourly check-in/check-out rollup table from audit logs.
+Usage: python manage.py rebuild_checkin_rollups [--verify] [--show 20]
+"""
+from django.core.management.base import BaseCommand
+
+from api.checkin_rollup import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Verify and rebuild the per-hour, zone and vehicle type check-in/check-out rollups'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Only compare the table with raw audit logs, do not rewrite it',
+        )
+        parser.add_argument('--show', type=int, default=20, help='Number of mismatches to print (default: 20)')
+
+    def handle(self, *args, **options):
+        verify_only = options['verify']
+        result = rebuild(verify_only=verify_only)
+        mismatches = result['mismatches']
+
+        if mismatches:
+            self.stdout.write(self.style.WARNING(f'⚠️  {len(mismatches)} rollup row(s) differ from raw audit logs'))
+            for hour, zone, vehicle_type, stored, expected in mismatches[:options['show']]:
+                self.stdout.write(f'  {hour} {zone or "-"}/{vehicle_type or "-"}: stored {stored}, expected {expected}')
+        else:
+            self.stdout.write(self.style.SUCCESS('✅ Check-in/check-out rollups match raw audit logs'))
+
+        if not verify_only:
+            self.stdout.write(self.style.SUCCESS(f'✅ Rebuilt {result["rows"]} rollup row(s)'))
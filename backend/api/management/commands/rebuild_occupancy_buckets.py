@@ -0,0 +1,35 @@
+"""
+Verify the 15-minute occupancy bucket table against active bookings and
+correct the buckets that differ.
+Usage: python manage.py rebuild_occupancy_buckets [--verify] [--show 20]
+"""
+from django.core.management.base import BaseCommand
+
+from api.occupancy import HORIZON_DAYS, rebuild
+
+
+class Command(BaseCommand):
+    help = f'Verify and rebuild occupancy buckets for the next {HORIZON_DAYS} days'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Only compare the table with raw bookings, do not correct it',
+        )
+        parser.add_argument('--show', type=int, default=20, help='Number of mismatches to print (default: 20)')
+
+    def handle(self, *args, **options):
+        verify_only = options['verify']
+        result = rebuild(verify_only=verify_only)
+        mismatches = result['mismatches']
+
+        if mismatches:
+            self.stdout.write(self.style.WARNING(f'⚠️  {len(mismatches)} bucket(s) differ from raw bookings'))
+            for zone, vehicle_type, bucket, stored, expected in mismatches[:options['show']]:
+                self.stdout.write(f'  {zone}/{vehicle_type} {bucket:%Y-%m-%d %H:%M}: stored {stored}, expected {expected}')
+        else:
+            self.stdout.write(self.style.SUCCESS('✅ Occupancy buckets match raw bookings'))
+
+        if not verify_only:
+            self.stdout.write(self.style.SUCCESS(f'✅ Corrected {len(mismatches)} bucket(s)'))
@@ -0,0 +1,33 @@
+"""
+Recount the per-user unread notification counters and report drift.
+Usage: python manage.py reconcile_notification_counters [--fix] [--show 20]
+"""
+from django.core.management.base import BaseCommand
+
+from api.notification_counter import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Verify the unread notification counters against the notifications table and optionally repair them'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Overwrite drifted counters with the recounted values',
+        )
+        parser.add_argument('--show', type=int, default=20, help='Number of mismatches to print (default: 20)')
+
+    def handle(self, *args, **options):
+        mismatches = reconcile(fix=options['fix'])
+
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS('✅ Unread notification counters match the notifications table'))
+            return
+
+        self.stdout.write(self.style.WARNING(f'⚠️  {len(mismatches)} unread counter(s) differ from the notifications table'))
+        for user_id, stored, expected in mismatches[:options['show']]:
+            self.stdout.write(f'  user {user_id}: stored {stored}, expected {expected}')
+
+        if options['fix']:
+            self.stdout.write(self.style.SUCCESS(f'✅ Repaired {len(mismatches)} counter(s)'))
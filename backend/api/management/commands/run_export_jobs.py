@@ -0,0 +1,140 @@
+"""
+Worker for background export jobs.
+Usage: python manage.py run_export_jobs [--workers 2] [--poll 5] [--once] [--worker-id ID]
+
+Claims pending ExportJob rows and writes them in a pool of worker processes,
+so long extracts never hold a web worker. Run it under a process supervisor
+next to gunicorn.
+
+Jobs are claimed under --worker-id (default: host name and process id). On
+SIGINT or SIGTERM the worker stops its processes and puts the jobs it was
+running back in the queue. Jobs left by a crash are requeued once they have
+run for EXPORT_JOB_TIMEOUT seconds, or at once by a worker started with the
+same explicit --worker-id (e.g. a stable id per supervisor program). A job
+whose process dies mid-run is marked failed and the pool is replaced.
+
+Every CLEANUP_INTERVAL seconds the worker also requeues stale jobs and
+deletes export files older than EXPORT_JOB_MAX_AGE.
+"""
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from api.export_jobs import (
+    claim_jobs, delete_expired_files, fail_job, requeue_stale_jobs, requeue_worker_jobs, run_job,
+)
+
+CLEANUP_INTERVAL = 600
+
+
+def _init_worker():
+    django.setup()
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def _start_pool(workers):
+    # Spawned children set Django up themselves instead of sharing our DB connection
+    context = multiprocessing.get_context('spawn')
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker)
+
+
+def _stop_pool(pool):
+    """Shut the pool down without waiting for the jobs it is running"""
+    # ProcessPoolExecutor has no public way to stop busy workers
+    for process in list((pool._processes or {}).values()):
+        process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+class Command(BaseCommand):
+    help = 'Run queued background export jobs in a process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Number of worker processes (default: 2)')
+        parser.add_argument('--poll', type=float, default=5, help='Seconds between queue polls when idle (default: 5)')
+        parser.add_argument('--once', action='store_true', help='Run the jobs queued now, then exit')
+        parser.add_argument(
+            '--worker-id',
+            default=f'{socket.gethostname()}-{os.getpid()}',
+            help='Id recorded on claimed jobs, unique per running worker (default: host name and process id)',
+        )
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        worker_id = options['worker_id']
+        requeued = requeue_worker_jobs(worker_id)
+        if requeued:
+            self.stdout.write(self.style.WARNING(f'⚠️  Requeued {requeued} job(s) left running by {worker_id}'))
+        # Supervisors stop us with SIGTERM; shut down the same way as on Ctrl+C
+        signal.signal(signal.SIGTERM, _interrupt)
+        self.stdout.write(self.style.SUCCESS(f'📦 Export worker {worker_id} started with {workers} process(es)'))
+        pool = _start_pool(workers)
+        running = {}
+        next_cleanup = 0
+        try:
+            while True:
+                if time.monotonic() >= next_cleanup:
+                    requeued = requeue_stale_jobs()
+                    if requeued:
+                        self.stdout.write(self.style.WARNING(f'⚠️  Requeued {requeued} stale running job(s)'))
+                    removed = delete_expired_files()
+                    if removed:
+                        self.stdout.write(f'  🧹 Removed {removed} expired export file(s)')
+                    next_cleanup = time.monotonic() + CLEANUP_INTERVAL
+
+                if len(running) < workers:
+                    for job_id in claim_jobs(workers - len(running), worker_id):
+                        running[pool.submit(run_job, job_id)] = job_id
+                        self.stdout.write(f'  ▶️  Job {job_id} started')
+
+                if not running:
+                    if options['once']:
+                        break
+                    connections.close_all()
+                    time.sleep(options['poll'])
+                    continue
+
+                done, _ = wait(running, timeout=options['poll'], return_when=FIRST_COMPLETED)
+                broken = False
+                for future in done:
+                    broken |= self.report(running.pop(future), future)
+                if broken:
+                    # Every job still in the broken pool fails with it
+                    for future in wait(running).done:
+                        self.report(running.pop(future), future)
+                    self.stdout.write(self.style.WARNING('⚠️  A worker process died; starting a new pool'))
+                    pool.shutdown(wait=False)
+                    pool = _start_pool(workers)
+        except KeyboardInterrupt:
+            _stop_pool(pool)
+            requeued = requeue_worker_jobs(worker_id)
+            self.stdout.write(self.style.WARNING(f'\n⏹️  Stopped; requeued {requeued} running job(s)'))
+        else:
+            pool.shutdown()
+
+    def report(self, job_id, future):
+        """Print a job's outcome; returns True if its process died and broke the pool"""
+        try:
+            outcome = future.result()
+        except Exception as e:
+            fail_job(job_id, f'Export worker process crashed: {e}')
+            self.stdout.write(self.style.ERROR(f'  ❌ Job {job_id} crashed: {e}'))
+            return isinstance(e, BrokenProcessPool)
+        if outcome == 'completed':
+            self.stdout.write(self.style.SUCCESS(f'  ✅ Job {job_id} completed'))
+        elif outcome == 'superseded':
+            self.stdout.write(self.style.WARNING(f'  ⚠️  Job {job_id} was requeued during the run; result discarded'))
+        else:
+            self.stdout.write(self.style.ERROR(f'  ❌ Job {job_id} failed'))
+        return False
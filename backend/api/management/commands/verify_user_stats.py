@@ -0,0 +1,36 @@
+"""
+Recompute the per-user parking statistics from raw bookings and report drift.
+Usage: python manage.py verify_user_stats [--fix] [--show 20]
+"""
+from django.core.management.base import BaseCommand
+
+from api.user_stats import verify
+
+
+class Command(BaseCommand):
+    help = 'Verify the per-user parking statistics against raw bookings and optionally repair them'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Overwrite drifted rows with the recomputed statistics',
+        )
+        parser.add_argument('--show', type=int, default=20, help='Number of mismatches to print (default: 20)')
+
+    def handle(self, *args, **options):
+        mismatches = verify(fix=options['fix'])
+
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS('✅ User parking stats match raw bookings'))
+            return
+
+        self.stdout.write(self.style.WARNING(f'⚠️  {len(mismatches)} user stats row(s) differ from raw bookings'))
+        for user_id, stored, expected in mismatches[:options['show']]:
+            self.stdout.write(f'  user {user_id}: stored {stored[0]}, expected {expected[0]}')
+            for label, i in (('monthly', 1), ('lots', 2), ('vehicles', 3)):
+                if stored[i] != expected[i]:
+                    self.stdout.write(f'    {label}: stored {stored[i]}, expected {expected[i]}')
+
+        if options['fix']:
+            self.stdout.write(self.style.SUCCESS(f'✅ Repaired {len(mismatches)} row(s)'))
@@ -0,0 +1,67 @@
+# Generated by Django 4.1.13 on 2026-10-16 22:05
+
+import api.models
+import django.contrib.postgres.constraints
+import django.contrib.postgres.fields.ranges
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations, models
+from django.db.models import Exists, F, OuterRef
+
+# How many offending bookings to name in the error
+SHOW_LIMIT = 50
+
+
+def check_active_bookings(apps, schema_editor):
+    """
+    Refuse to add the constraint over data that violates it.
+
+    The overlap checks before this constraint were racy, so a slot can hold
+    active bookings that overlap. Those (and windows that end before they
+    start, which TSTZRANGE rejects) have to be cancelled or corrected by
+    hand; picking which booking keeps the slot is not something a migration
+    should decide.
+    """
+    Booking = apps.get_model('api', 'Booking')
+    active = Booking.objects.using(schema_editor.connection.alias).filter(is_active=True)
+    overlapping = active.filter(Exists(
+        active.filter(
+            slot_id=OuterRef('slot_id'), start_time__lt=OuterRef('end_time'), end_time__gt=OuterRef('start_time'),
+        ).exclude(pk=OuterRef('pk'))
+    ))
+    inverted = active.filter(start_time__gt=F('end_time'))
+
+    problems = []
+    for label, queryset in (('overlapping', overlapping), ('ending before they start', inverted)):
+        rows = list(
+            queryset.order_by('slot_id', 'start_time')
+            .values_list('pk', 'slot_id', 'start_time', 'end_time')[:SHOW_LIMIT]
+        )
+        if rows:
+            problems.append(f'Active bookings {label}:')
+            problems.extend(f'  booking {pk} on slot {slot_id}: {start} - {end}' for pk, slot_id, start, end in rows)
+    if problems:
+        raise RuntimeError(
+            'Cannot add booking_slot_no_overlap. Cancel or fix these bookings (set is_active=False or move '
+            f'them) and run migrate again (at most {SHOW_LIMIT} listed per kind):\n' + '\n'.join(problems)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_add_overstay_payment_fields'),
+    ]
+
+    operations = [
+        # Needed so the exclusion constraint can compare slot_id with "=" inside a GiST index
+        BtreeGistExtension(),
+        migrations.RunPython(check_active_bookings, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['slot', 'start_time'], name='booking_active_slot_start_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='booking',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(condition=models.Q(('is_active', True)), expressions=[(api.models.TsTzRange('start_time', 'end_time', django.contrib.postgres.fields.ranges.RangeBoundary()), '&&'), ('slot', '=')], name='booking_slot_no_overlap'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.1.13 on 2026-10-16 22:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_booking_overlap_constraint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OccupancyBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('parking_zone', models.CharField(choices=[('COLLEGE_PARKING_CENTER', 'College Parking'), ('HOME_PARKING_CENTER', 'Home Parking'), ('METRO_PARKING_CENTER', 'Metro Parking'), ('VIVIVANA_PARKING_CENTER', 'Vivivana Parking')], max_length=30)),
+                ('vehicle_type', models.CharField(choices=[('car', 'Car'), ('suv', 'SUV'), ('bike', 'Bike'), ('truck', 'Truck'), ('any', 'Any Vehicle')], max_length=10)),
+                ('bucket_start', models.DateTimeField()),
+                ('booked_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Occupancy Bucket',
+                'verbose_name_plural': 'Occupancy Buckets',
+                'ordering': ['parking_zone', 'vehicle_type', 'bucket_start'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='occupancybucket',
+            constraint=models.UniqueConstraint(fields=('parking_zone', 'vehicle_type', 'bucket_start'), name='occupancy_bucket_unique'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.1.13 on 2026-10-16 22:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_occupancybucket'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='booking',
+            name='secret_code',
+            field=models.CharField(blank=True, db_index=True, help_text='6-digit code given to user at check-in for check-out verification', max_length=6, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='booking',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['checked_in', 'checkout_requested', 'checkout_verified'])), fields=('secret_code',), name='booking_live_secret_code_unique'),
+        ),
+        # Source of secret codes; see api/secret_code_utils.py
+        migrations.RunSQL(
+            sql='CREATE SEQUENCE api_booking_secret_code_seq MINVALUE 0 MAXVALUE 999999 START 0 CYCLE',
+            reverse_sql='DROP SEQUENCE api_booking_secret_code_seq',
+        ),
+    ]
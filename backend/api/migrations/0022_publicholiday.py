@@ -0,0 +1,26 @@
+# Generated by Django 4.1.13 on 2026-10-16 22:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0021_booking_secret_code_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PublicHoliday',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('name', models.CharField(max_length=100)),
+            ],
+            options={
+                'verbose_name': 'Public Holiday',
+                'verbose_name_plural': 'Public Holidays',
+                'ordering': ['date'],
+            },
+        ),
+    ]
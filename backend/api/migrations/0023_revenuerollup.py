@@ -0,0 +1,35 @@
+# Generated by Django 4.1.13 on 2026-10-16 22:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0022_publicholiday'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevenueRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('parking_zone', models.CharField(blank=True, choices=[('COLLEGE_PARKING_CENTER', 'College Parking'), ('HOME_PARKING_CENTER', 'Home Parking'), ('METRO_PARKING_CENTER', 'Metro Parking'), ('VIVIVANA_PARKING_CENTER', 'Vivivana Parking')], max_length=30)),
+                ('vehicle_type', models.CharField(blank=True, choices=[('car', 'Car'), ('suv', 'SUV'), ('bike', 'Bike'), ('truck', 'Truck')], max_length=10)),
+                ('booking_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('overstay_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('booking_count', models.IntegerField(default=0)),
+                ('overstay_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Revenue Rollup',
+                'verbose_name_plural': 'Revenue Rollups',
+                'ordering': ['day', 'parking_zone', 'vehicle_type'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='revenuerollup',
+            constraint=models.UniqueConstraint(fields=('day', 'parking_zone', 'vehicle_type'), name='revenue_rollup_unique'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.1.13 on 2026-10-16 22:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0023_revenuerollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='parkinglot',
+            index=models.Index(fields=['latitude', 'longitude'], name='parking_lot_lat_lon_idx'),
+        ),
+    ]
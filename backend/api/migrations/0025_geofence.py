@@ -0,0 +1,59 @@
+# Generated by Django 4.1.13 on 2026-10-16 22:22
+
+from django.db import migrations, models
+
+
+# The sites previously hard-coded in api/utils.py (PARKING_LOCATIONS)
+INITIAL_GEOFENCES = [
+    ('College Parking', 'COLLEGE_PARKING_CENTER', 19.2479, 73.1471),
+    ('Home Parking', 'HOME_PARKING_CENTER', 19.2056, 73.1556),
+    ('Metro Parking', 'METRO_PARKING_CENTER', 19.2291, 73.1233),
+    ('Vivivana Parking', 'VIVIVANA_PARKING_CENTER', 19.2088, 72.9716),
+]
+
+
+def create_initial_geofences(apps, schema_editor):
+    Geofence = apps.get_model('api', 'Geofence')
+    for name, parking_zone, latitude, longitude in INITIAL_GEOFENCES:
+        Geofence.objects.get_or_create(
+            name=name,
+            defaults={
+                'parking_zone': parking_zone,
+                'shape': 'circle',
+                'latitude': latitude,
+                'longitude': longitude,
+                'radius_meters': 500,
+            },
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0024_parkinglot_lat_lon_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Geofence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('parking_zone', models.CharField(blank=True, choices=[('COLLEGE_PARKING_CENTER', 'College Parking'), ('HOME_PARKING_CENTER', 'Home Parking'), ('METRO_PARKING_CENTER', 'Metro Parking'), ('VIVIVANA_PARKING_CENTER', 'Vivivana Parking')], max_length=30)),
+                ('shape', models.CharField(choices=[('circle', 'Circle'), ('polygon', 'Polygon')], default='circle', max_length=10)),
+                ('latitude', models.FloatField(blank=True, help_text='Circle center latitude', null=True)),
+                ('longitude', models.FloatField(blank=True, help_text='Circle center longitude', null=True)),
+                ('radius_meters', models.FloatField(blank=True, help_text='Circle radius in meters', null=True)),
+                ('polygon', models.JSONField(blank=True, default=list, help_text='Polygon vertices as [[lat, lon], ...]')),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Geofence',
+                'verbose_name_plural': 'Geofences',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.RunPython(create_initial_geofences, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.1.13 on 2026-10-16 22:25
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0025_geofence'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='parkinglot',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='parking_lot_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='parkinglot',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['address'], name='parking_lot_address_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.1.13 on 2026-10-16 22:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0026_parkinglot_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CheckInOutRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('parking_zone', models.CharField(blank=True, choices=[('COLLEGE_PARKING_CENTER', 'College Parking'), ('HOME_PARKING_CENTER', 'Home Parking'), ('METRO_PARKING_CENTER', 'Metro Parking'), ('VIVIVANA_PARKING_CENTER', 'Vivivana Parking')], max_length=30)),
+                ('vehicle_type', models.CharField(blank=True, choices=[('car', 'Car'), ('suv', 'SUV'), ('bike', 'Bike'), ('truck', 'Truck')], max_length=10)),
+                ('check_ins', models.IntegerField(default=0)),
+                ('failed_check_ins', models.IntegerField(default=0)),
+                ('check_outs', models.IntegerField(default=0)),
+                ('failed_check_outs', models.IntegerField(default=0)),
+                ('completed_sessions', models.IntegerField(default=0)),
+                ('total_duration_seconds', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Check-In/Out Rollup',
+                'verbose_name_plural': 'Check-In/Out Rollups',
+                'ordering': ['hour', 'parking_zone', 'vehicle_type'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='checkinoutrollup',
+            constraint=models.UniqueConstraint(fields=('hour', 'parking_zone', 'vehicle_type'), name='checkin_rollup_unique'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.1.13 on 2026-10-16 22:30
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0027_checkinoutrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserParkingStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='parking_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total_sessions', models.IntegerField(default=0)),
+                ('active_sessions', models.IntegerField(default=0)),
+                ('completed_sessions', models.IntegerField(default=0)),
+                ('total_minutes', models.BigIntegerField(default=0)),
+                ('total_paid', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('monthly', models.JSONField(blank=True, default=dict)),
+                ('lot_counts', models.JSONField(blank=True, default=dict)),
+                ('vehicle_counts', models.JSONField(blank=True, default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'User Parking Stats',
+                'verbose_name_plural': 'User Parking Stats',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.13 on 2026-10-16 22:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0031_notification_counter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportjob',
+            name='worker_id',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.1.13 on 2026-10-16 23:03
+
+from django.db import migrations, models
+
+
+def create_horizon(apps, schema_editor):
+    # covered_until stays empty until the first extension corrects the whole horizon
+    apps.get_model('api', 'OccupancyHorizon').objects.using(schema_editor.connection.alias).create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0032_export_job_worker_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OccupancyHorizon',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('covered_until', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(create_horizon, migrations.RunPython.noop),
+    ]
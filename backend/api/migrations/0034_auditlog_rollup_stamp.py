@@ -0,0 +1,49 @@
+# Generated by Django 4.1.13 on 2026-10-17 09:12
+
+from django.db import migrations
+
+# Kept in step with api.checkin_rollup
+COUNTERS = ('check_in_success', 'check_in_failed', 'check_out_success', 'check_out_failed')
+ROLLUP_KEY = 'rollup'
+
+
+def stamp_audit_logs(apps, schema_editor):
+    """Store the rollup values of existing check-in/check-out logs, as stamp() does for new ones"""
+    AuditLog = apps.get_model('api', 'AuditLog')
+    db_alias = schema_editor.connection.alias
+    logs = (
+        AuditLog.objects.using(db_alias)
+        .filter(action__in=COUNTERS)
+        .exclude(additional_data__has_key=ROLLUP_KEY)
+        .select_related('booking__slot', 'booking__vehicle')
+    )
+    batch = []
+    for log in logs.iterator(chunk_size=2000):
+        booking = log.booking
+        seconds = None
+        if log.action == 'check_out_success' and booking.checked_in_at and booking.checked_out_at:
+            seconds = int((booking.checked_out_at - booking.checked_in_at).total_seconds())
+        log.additional_data = {
+            **(log.additional_data or {}),
+            ROLLUP_KEY: {
+                'parking_zone': booking.slot.parking_zone or '',
+                'vehicle_type': booking.vehicle.vehicle_type if booking.vehicle else '',
+                'duration_seconds': seconds,
+            },
+        }
+        batch.append(log)
+        if len(batch) == 2000:
+            AuditLog.objects.using(db_alias).bulk_update(batch, ['additional_data'])
+            batch = []
+    AuditLog.objects.using(db_alias).bulk_update(batch, ['additional_data'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0033_occupancy_horizon'),
+    ]
+
+    operations = [
+        migrations.RunPython(stamp_audit_logs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.1.13 on 2026-10-17 10:05
+
+from django.db import migrations
+from django.db.models import Count
+
+
+def key_lot_counts_by_id(apps, schema_editor):
+    """Recount lot_counts per parking lot id; they were keyed by lot name"""
+    db_alias = schema_editor.connection.alias
+    UserParkingStats = apps.get_model('api', 'UserParkingStats')
+    Booking = apps.get_model('api', 'Booking')
+    counts = {}
+    rows = (
+        Booking.objects.using(db_alias)
+        .filter(user__parking_stats__isnull=False, slot__parking_lot__isnull=False)
+        .values_list('user_id', 'slot__parking_lot_id')
+        .annotate(bookings=Count('id'))
+        .order_by()
+    )
+    for user_id, lot_id, bookings in rows.iterator():
+        counts.setdefault(user_id, {})[str(lot_id)] = bookings
+
+    stats = list(UserParkingStats.objects.using(db_alias).all())
+    for row in stats:
+        row.lot_counts = counts.get(row.user_id, {})
+    UserParkingStats.objects.using(db_alias).bulk_update(stats, ['lot_counts'], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0034_auditlog_rollup_stamp'),
+    ]
+
+    operations = [
+        migrations.RunPython(key_lot_counts_by_id, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,25 @@
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import DateTimeRangeField, RangeBoundary, RangeOperators
+from django.contrib.postgres.indexes import GinIndex
 from django.utils import timezone
 
+
+class TsTzRange(models.Func):
+    function = 'TSTZRANGE'
+    output_field = DateTimeRangeField()
+
+
+# Name of the exclusion constraint that keeps active bookings on a slot disjoint
+BOOKING_OVERLAP_CONSTRAINT = 'booking_slot_no_overlap'
+
+# Booking statuses in which the holder still needs their secret code
+LIVE_SECRET_CODE_STATUSES = ['checked_in', 'checkout_requested', 'checkout_verified']
+LIVE_SECRET_CODE_CONSTRAINT = 'booking_live_secret_code_unique'
+
+
 class User(AbstractUser):
     ROLE_CHOICES = (
         ('customer', 'Customer'),
@@ -32,6 +50,15 @@ class ParkingLot(models.Model):
     daily_rate = models.DecimalField(max_digits=6, decimal_places=2, default=50.00)
     monthly_rate = models.DecimalField(max_digits=8, decimal_places=2, default=300.00)
 
+    class Meta:
+        indexes = [
+            # Bounding-box prefilter for the nearest-lot search (see geo_index)
+            models.Index(fields=['latitude', 'longitude'], name='parking_lot_lat_lon_idx'),
+            # Trigram indexes for fuzzy, substring and prefix search (see lot_search)
+            GinIndex(fields=['name'], name='parking_lot_name_trgm_idx', opclasses=['gin_trgm_ops']),
+            GinIndex(fields=['address'], name='parking_lot_address_trgm_idx', opclasses=['gin_trgm_ops']),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -160,7 +187,7 @@ class Booking(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='confirmed')
 
     # Secret code for check-in/check-out verification
-    secret_code = models.CharField(max_length=6, null=True, blank=True, unique=True, db_index=True, 
+    secret_code = models.CharField(max_length=6, null=True, blank=True, db_index=True, 
                                    help_text="6-digit code given to user at check-in for check-out verification")
 
     # Fields for handling extensions
@@ -208,6 +235,32 @@ class Booking(models.Model):
     overstay_payment_method = models.CharField(max_length=20, null=True, blank=True,
                                               help_text="Payment method used for overstay (card, cash, etc)")
 
+    class Meta:
+        indexes = [
+            # Serves the conflict engine's single-row probes (see booking_conflicts.py)
+            models.Index(
+                fields=['slot', 'start_time'],
+                name='booking_active_slot_start_idx',
+                condition=Q(is_active=True),
+            ),
+        ]
+        constraints = [
+            ExclusionConstraint(
+                name=BOOKING_OVERLAP_CONSTRAINT,
+                expressions=[
+                    (TsTzRange('start_time', 'end_time', RangeBoundary()), RangeOperators.OVERLAPS),
+                    ('slot', RangeOperators.EQUAL),
+                ],
+                condition=Q(is_active=True),
+            ),
+            # Codes are recycled (see secret_code_utils), so only codes in use must be unique
+            models.UniqueConstraint(
+                fields=['secret_code'],
+                name=LIVE_SECRET_CODE_CONSTRAINT,
+                condition=Q(status__in=LIVE_SECRET_CODE_STATUSES),
+            ),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.initial_end_time:
             self.initial_end_time = self.end_time
@@ -216,24 +269,11 @@ class Booking(models.Model):
     @staticmethod
     def generate_secret_code():
         """
-        Generate a unique 6-digit alphanumeric secret code.
+        Generate a unique 6-digit secret code.
         Returns: str - 6-digit code
         """
-        import random
-        import string
-        
-        max_attempts = 50
-        for _ in range(max_attempts):
-            # Generate random 6-digit code (numbers only for simplicity)
-            code = ''.join(random.choices(string.digits, k=6))
-            
-            # Check if code already exists
-            if not Booking.objects.filter(secret_code=code).exists():
-                return code
-        
-        # Fallback: add letters if too many collisions
-        code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-        return code
+        from .secret_code_utils import generate_unique_secret_code
+        return generate_unique_secret_code()
     
     def assign_secret_code(self):
         """
@@ -241,8 +281,8 @@ class Booking(models.Model):
         Returns: str - The assigned secret code
         """
         if not self.secret_code:
-            self.secret_code = self.generate_secret_code()
-            self.save()
+            from .secret_code_utils import save_with_secret_code
+            save_with_secret_code(self)
         return self.secret_code
     
     def can_check_in(self, user):
@@ -691,14 +731,79 @@ class Notification(models.Model):
     additional_data = models.JSONField(default=dict, blank=True)  # Store additional structured data for rich display
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
-    
+
     class Meta:
         ordering = ['-created_at']
-    
+        indexes = [
+            models.Index(fields=['user', 'is_read'], name='notification_user_read_idx'),
+        ]
+
     def __str__(self):
         return f"{self.notification_type}: {self.title}"
 
 
+class NotificationCounter(models.Model):
+    """
+    Per-user unread notification count kept in step with the notifications
+    table (see api/notification_counter.py). version changes on every change
+    to the user's notifications and backs the unread-count ETag.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='notification_counter')
+    unread_count = models.IntegerField(default=0)
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.unread_count} unread"
+
+
+class BroadcastNotification(models.Model):
+    """
+    A system-wide alert stored once and merged into every targeted user's
+    notification feed at read time (see api/broadcasts.py). audience_role
+    limits it to one user role; blank targets everyone.
+    """
+    notification_type = models.CharField(max_length=50, choices=Notification.NOTIFICATION_TYPES)
+    title = models.CharField(max_length=255)
+    message = models.TextField()
+    audience_role = models.CharField(max_length=10, choices=User.ROLE_CHOICES, blank=True)
+    additional_data = models.JSONField(default=dict, blank=True)
+    created_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='created_broadcasts'
+    )
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.notification_type}: {self.title} ({self.audience_role or 'all'})"
+
+
+class BroadcastCursor(models.Model):
+    """Per-user read cursor: broadcasts created up to read_through are read"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='broadcast_cursor')
+    read_through = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.user_id}: read through {self.read_through}"
+
+
+class BroadcastReceipt(models.Model):
+    """A user's own read or delete of one broadcast newer than their cursor"""
+    broadcast = models.ForeignKey(BroadcastNotification, on_delete=models.CASCADE, related_name='receipts')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='broadcast_receipts')
+    is_read = models.BooleanField(default=False)
+    is_deleted = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'broadcast'], name='broadcast_receipt_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} / {self.broadcast_id}"
+
+
 # Access Log model for tracking user login/logout activity
 class AccessLog(models.Model):
     STATUS_CHOICES = (
@@ -872,4 +977,247 @@ class ZonePricingRate(models.Model):
             return False
         if self.effective_to and self.effective_to < now:
             return False
-        return True
\ No newline at end of file
+        return True
+
+class OccupancyBucket(models.Model):
+    """
+    Number of booked slots per zone and slot vehicle type in a 15-minute bucket.
+
+    Maintained incrementally from Booking saves (see api/occupancy.py) up to
+    OccupancyHorizon.covered_until, and verified or corrected by
+    `manage.py rebuild_occupancy_buckets`.
+    """
+    parking_zone = models.CharField(max_length=30, choices=ParkingSlot.PARKING_ZONE_CHOICES)
+    vehicle_type = models.CharField(max_length=10, choices=ParkingSlot.VEHICLE_TYPE_CHOICES)
+    bucket_start = models.DateTimeField()
+    booked_count = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['parking_zone', 'vehicle_type', 'bucket_start']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['parking_zone', 'vehicle_type', 'bucket_start'],
+                name='occupancy_bucket_unique',
+            ),
+        ]
+        verbose_name = 'Occupancy Bucket'
+        verbose_name_plural = 'Occupancy Buckets'
+
+    def __str__(self):
+        return f"{self.parking_zone}/{self.vehicle_type} @ {self.bucket_start:%Y-%m-%d %H:%M}: {self.booked_count}"
+
+
+class OccupancyHorizon(models.Model):
+    """
+    Single row holding the end of the range OccupancyBucket counts are
+    maintained for. Incremental writers stop at covered_until; the hourly
+    extension moves it forward and fills in the buckets it adds.
+    """
+    covered_until = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Occupancy buckets maintained until {self.covered_until}"
+
+
+class PublicHoliday(models.Model):
+    """
+    Calendar of public holidays; bookings on these dates are charged the
+    PricingRate.holiday_rate where one is set.
+    """
+    date = models.DateField(unique=True)
+    name = models.CharField(max_length=100)
+
+    class Meta:
+        ordering = ['date']
+        verbose_name = 'Public Holiday'
+        verbose_name_plural = 'Public Holidays'
+
+    def __str__(self):
+        return f"{self.name} ({self.date})"
+
+
+class RevenueRollup(models.Model):
+    """
+    Checked-out booking revenue per day, zone and vehicle type.
+
+    Maintained incrementally from Booking saves (see api/revenue_rollup.py)
+    and rebuilt by `manage.py backfill_revenue_rollups`. Zone and vehicle
+    type are '' for bookings without a slot or vehicle.
+    """
+    day = models.DateField()
+    parking_zone = models.CharField(max_length=30, blank=True, choices=ParkingSlot.PARKING_ZONE_CHOICES)
+    vehicle_type = models.CharField(max_length=10, blank=True, choices=Vehicle.VEHICLE_TYPE_CHOICES)
+    booking_revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    overstay_revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    booking_count = models.IntegerField(default=0)
+    overstay_count = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['day', 'parking_zone', 'vehicle_type']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'parking_zone', 'vehicle_type'],
+                name='revenue_rollup_unique',
+            ),
+        ]
+        verbose_name = 'Revenue Rollup'
+        verbose_name_plural = 'Revenue Rollups'
+
+    def __str__(self):
+        return f"{self.day} {self.parking_zone}/{self.vehicle_type}: {self.booking_revenue} + {self.overstay_revenue}"
+
+
+class CheckInOutRollup(models.Model):
+    """
+    Check-in and check-out outcomes per hour, zone and vehicle type.
+
+    Maintained incrementally as AuditLog rows are written (see
+    api/checkin_rollup.py) and rebuilt by `manage.py rebuild_checkin_rollups`.
+    Durations are summed over successful check-outs of bookings with both
+    check-in and check-out times. Zone and vehicle type are '' for bookings
+    without a slot or vehicle.
+    """
+    hour = models.DateTimeField()
+    parking_zone = models.CharField(max_length=30, blank=True, choices=ParkingSlot.PARKING_ZONE_CHOICES)
+    vehicle_type = models.CharField(max_length=10, blank=True, choices=Vehicle.VEHICLE_TYPE_CHOICES)
+    check_ins = models.IntegerField(default=0)
+    failed_check_ins = models.IntegerField(default=0)
+    check_outs = models.IntegerField(default=0)
+    failed_check_outs = models.IntegerField(default=0)
+    completed_sessions = models.IntegerField(default=0)
+    total_duration_seconds = models.BigIntegerField(default=0)
+
+    class Meta:
+        ordering = ['hour', 'parking_zone', 'vehicle_type']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['hour', 'parking_zone', 'vehicle_type'],
+                name='checkin_rollup_unique',
+            ),
+        ]
+        verbose_name = 'Check-In/Out Rollup'
+        verbose_name_plural = 'Check-In/Out Rollups'
+
+    def __str__(self):
+        return f"{self.hour} {self.parking_zone}/{self.vehicle_type}: {self.check_ins} in, {self.check_outs} out"
+
+
+class UserParkingStats(models.Model):
+    """
+    Running parking statistics for one user.
+
+    Maintained incrementally from Booking saves (see api/user_stats.py) and
+    verified by `manage.py verify_user_stats`. monthly maps 'YYYY-MM' (of
+    start_time) to {'sessions', 'amount'}; lot_counts maps parking lot id
+    to bookings; vehicle_counts maps vehicle id to {'type', 'plate', 'count'}.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='parking_stats')
+    total_sessions = models.IntegerField(default=0)
+    active_sessions = models.IntegerField(default=0)
+    completed_sessions = models.IntegerField(default=0)
+    total_minutes = models.BigIntegerField(default=0)
+    total_paid = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    monthly = models.JSONField(default=dict, blank=True)
+    lot_counts = models.JSONField(default=dict, blank=True)
+    vehicle_counts = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'User Parking Stats'
+        verbose_name_plural = 'User Parking Stats'
+
+    def __str__(self):
+        return f"{self.user_id}: {self.total_sessions} sessions, {self.total_paid} paid"
+
+
+class ExportJob(models.Model):
+    """
+    A background data extract, run by `manage.py run_export_jobs` (see
+    api/export_jobs.py). Jobs with the same dataset, format and filters share
+    a filter_hash so a repeat request can reuse a recent file.
+    """
+    DATASET_CHOICES = [
+        ('audit_logs', 'Check-In/Check-Out Audit Logs'),
+        ('bookings', 'Bookings'),
+        ('revenue', 'Daily Revenue'),
+    ]
+    FORMAT_CHOICES = [
+        ('csv_gz', 'Gzipped CSV'),
+        ('parquet', 'Parquet'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    dataset = models.CharField(max_length=20, choices=DATASET_CHOICES)
+    file_format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default='csv_gz')
+    filters = models.JSONField(default=dict, blank=True)
+    filter_hash = models.CharField(max_length=64, db_index=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='export_jobs')
+    # run_export_jobs worker that claimed the job
+    worker_id = models.CharField(max_length=100, blank=True)
+
+    file_path = models.CharField(max_length=500, blank=True)
+    row_count = models.IntegerField(default=0)
+    file_size = models.BigIntegerField(default=0)
+    error_message = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+        verbose_name = 'Export Job'
+        verbose_name_plural = 'Export Jobs'
+
+    def __str__(self):
+        return f"{self.dataset} ({self.file_format}) - {self.status}"
+
+
+class Geofence(models.Model):
+    """
+    Area a user must be inside to check in or out: a circle (center and
+    radius) or a polygon of [latitude, longitude] vertices.
+
+    Loaded into an in-process grid index by api/geofences.py.
+    """
+    SHAPE_CHOICES = [
+        ('circle', 'Circle'),
+        ('polygon', 'Polygon'),
+    ]
+
+    name = models.CharField(max_length=100, unique=True)
+    parking_zone = models.CharField(max_length=30, blank=True, choices=ParkingSlot.PARKING_ZONE_CHOICES)
+    shape = models.CharField(max_length=10, choices=SHAPE_CHOICES, default='circle')
+    latitude = models.FloatField(null=True, blank=True, help_text="Circle center latitude")
+    longitude = models.FloatField(null=True, blank=True, help_text="Circle center longitude")
+    radius_meters = models.FloatField(null=True, blank=True, help_text="Circle radius in meters")
+    polygon = models.JSONField(default=list, blank=True, help_text="Polygon vertices as [[lat, lon], ...]")
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['name']
+        verbose_name = 'Geofence'
+        verbose_name_plural = 'Geofences'
+
+    def clean(self):
+        from django.core.exceptions import ValidationError
+
+        if self.shape == 'circle':
+            if self.latitude is None or self.longitude is None or not self.radius_meters:
+                raise ValidationError("A circle geofence needs a latitude, longitude and radius.")
+        elif len(self.polygon or []) < 3:
+            raise ValidationError("A polygon geofence needs at least three [lat, lon] vertices.")
+
+    def __str__(self):
+        return f"{self.name} ({self.shape})"
@@ -0,0 +1,123 @@
+"""
+Denormalised per-user unread notification counters.
+
+NotificationCounter.unread_count is the number of the user's unread
+Notification rows, moved by signal receivers on create, read-state change
+and delete, and explicitly by the paths that skip signals (bulk_create in
+create_system_notification, mark-all-as-read). Every change also bumps the
+row's version, as do broadcast reads and deletes (api/broadcasts.py).
+
+The unread-count endpoints send an ETag built from that version and the
+current broadcast state, so a poll whose count cannot have changed is
+answered 304 after one primary-key lookup and one aggregate over the
+broadcasts table, without touching the notifications table. Rows are built lazily on first read; the
+reconcile_notification_counters command recounts them and repairs drift.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, Max
+
+from .models import BroadcastNotification, Notification, NotificationCounter
+
+def stored_state(pk):
+    """(user_id, is_unread) of a saved notification, or None"""
+    row = Notification.objects.filter(pk=pk).values_list('user_id', 'is_read').first()
+    return None if row is None else (row[0], not row[1])
+
+
+def _apply(deltas):
+    """Add {user_id: delta} to existing counters; users without a row are counted when it is built"""
+    for user_id, delta in deltas.items():
+        NotificationCounter.objects.filter(user_id=user_id).update(
+            unread_count=F('unread_count') + delta, version=F('version') + 1
+        )
+
+
+def move(before, after):
+    """Move a notification's (user_id, is_unread) state from before to after"""
+    if before == after:
+        return
+    deltas = Counter()
+    if before is not None and before[1]:
+        deltas[before[0]] -= 1
+    if after is not None and after[1]:
+        deltas[after[0]] += 1
+    if deltas:
+        _apply(deltas)
+    else:
+        touch(after[0] if after is not None else before[0])
+
+
+def add_notifications(notifications):
+    """Count notifications created without signals (bulk_create) in their users' counters"""
+    _apply(Counter(n.user_id for n in notifications if not n.is_read))
+
+
+def touch(user_id):
+    """Bump the user's version after a change the counter itself does not hold (broadcast read state)"""
+    NotificationCounter.objects.filter(user_id=user_id).update(version=F('version') + 1)
+
+
+def mark_all_read(user):
+    """Mark every notification of the user as read and zero their counter"""
+    with transaction.atomic():
+        get_counter(user)
+        counter = NotificationCounter.objects.select_for_update().get(user=user)
+        Notification.objects.filter(user=user, is_read=False).update(is_read=True)
+        counter.unread_count = 0
+        counter.version = F('version') + 1
+        counter.save(update_fields=['unread_count', 'version'])
+
+
+def get_counter(user):
+    """The user's counter row, counted from their notifications if it does not exist yet"""
+    counter = NotificationCounter.objects.filter(user=user).first()
+    if counter is None:
+        with transaction.atomic():
+            unread = Notification.objects.filter(user=user, is_read=False).count()
+            counter, _ = NotificationCounter.objects.get_or_create(user=user, defaults={'unread_count': unread})
+    return counter
+
+
+def broadcast_state():
+    """
+    A short token that changes whenever a broadcast is created or removed,
+    read from the database on every call so all workers agree on it
+    """
+    aggregate = BroadcastNotification.objects.aggregate(last=Max('id'), total=Count('id'))
+    return f"{aggregate['last'] or 0}.{aggregate['total']}"
+
+
+def etag(counter):
+    return f'"{counter.user_id}-{counter.version}-{broadcast_state()}"'
+
+
+def if_none_match(request, tag):
+    """Whether the request's If-None-Match already names this ETag"""
+    header = request.headers.get('If-None-Match', '')
+    return tag in (value.strip().removeprefix('W/') for value in header.split(','))
+
+
+def reconcile(fix=False):
+    """
+    Recount every stored counter from the notifications table.
+
+    Returns:
+        list of (user_id, stored, expected) for the counters that drifted
+    """
+    mismatches = []
+    for counter in NotificationCounter.objects.order_by('pk').iterator():
+        with transaction.atomic():
+            stored = NotificationCounter.objects.select_for_update().filter(pk=counter.pk).first()
+            if stored is None:
+                continue
+            expected = Notification.objects.filter(user_id=stored.user_id, is_read=False).count()
+            if stored.unread_count == expected:
+                continue
+            mismatches.append((stored.user_id, stored.unread_count, expected))
+            if fix:
+                stored.unread_count = expected
+                stored.version = F('version') + 1
+                stored.save(update_fields=['unread_count', 'version'])
+    return mismatches
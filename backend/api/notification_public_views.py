@@ -4,7 +4,7 @@ from rest_framework.response import Response
 from rest_framework import status
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
-from .models import Notification
+from . import broadcasts, notification_counter
 
 class PublicNotificationUnreadCountView(APIView):
     """
@@ -27,16 +27,27 @@ class PublicNotificationUnreadCountView(APIView):
             # No user authenticated, return 0 count
             return self.create_response(0)
         
-        # User is authenticated, return their unread count
-        count = Notification.objects.filter(user=request.user, is_read=False).count()
-        return self.create_response(count)
+        # User is authenticated; unchanged polls (same ETag) get 304
+        counter = notification_counter.get_counter(request.user)
+        tag = notification_counter.etag(counter)
+        if notification_counter.if_none_match(request, tag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            response["ETag"] = tag
+            response["Cache-Control"] = "private, no-cache"
+            return response
+
+        count = max(counter.unread_count, 0) + broadcasts.unread_count(request.user)
+        return self.create_response(count, tag)
     
-    def create_response(self, count):
+    def create_response(self, count, tag=None):
         """Create a response that works with any content type"""
         response = Response(
             {"unread_count": count}, 
             status=status.HTTP_200_OK
         )
+        if tag:
+            response["ETag"] = tag
+            response["Cache-Control"] = "private, no-cache"
         # Set multiple content type headers to ensure compatibility
         response["Content-Type"] = "application/json; charset=utf-8"
         response["Accept"] = "*/*"
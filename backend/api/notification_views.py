@@ -5,6 +5,7 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from . import notification_counter
 from .models import Notification
 from .serializers import NotificationSerializer
 from .decorators import accept_any_content_type, public_endpoint
@@ -37,8 +38,7 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['post'])
     def mark_all_as_read(self, request):
         """Mark all of the user's notifications as read"""
-        notifications = self.get_queryset()
-        notifications.update(is_read=True)
+        notification_counter.mark_all_read(request.user)
         return Response({'status': 'all notifications marked as read'})
     
     @action(detail=False, methods=['get'])
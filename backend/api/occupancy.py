@@ -0,0 +1,374 @@
+"""
+Pre-computed occupancy buckets.
+
+OccupancyBucket holds the number of active bookings per (zone, slot vehicle
+type, 15-minute bucket) over a rolling horizon, so forward-looking occupancy
+reads are one range scan of the (zone, vehicle_type, bucket_start) index
+instead of a count over ParkingSlot and Booking.
+
+The table is kept up to date incrementally: the Booking pre_save/post_save/
+post_delete receivers in api/signals.py compare the booking's window before
+and after the write and move its count between buckets in the same
+transaction. Deltas stop at OccupancyHorizon.covered_until, so a booking
+changed after the horizon has moved on never subtracts from buckets that
+were not maintained when it was counted in.
+
+`extend()` runs hourly from the scheduler: it moves covered_until to the end
+of the current horizon, counts raw bookings into the buckets that adds and
+drops buckets that have passed. Writers hold a share lock on the horizon row
+while they apply deltas and the extension takes it exclusively only to move
+covered_until, so booking saves never wait on the recount. `rebuild()`
+(`manage.py rebuild_occupancy_buckets`) compares the whole horizon with raw
+bookings. Both read bookings and buckets from one snapshot and apply the
+differences as increments, which leaves deltas committed meanwhile intact.
+
+Readers: the zone list and zone dashboard and the nearest-location search
+report the peak booked count for a requested start_time/end_time window
+(`zone_peaks`), and dynamic pricing takes the occupancy of a future booking
+window from here rather than from the live counters (`forecast_percent`).
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Booking, OccupancyBucket, OccupancyHorizon
+
+BUCKET_MINUTES = 15
+HORIZON_DAYS = 14
+BUCKET = timedelta(minutes=BUCKET_MINUTES)
+
+
+def bucket_floor(dt):
+    """Start of the bucket containing dt"""
+    return dt.replace(minute=dt.minute - dt.minute % BUCKET_MINUTES, second=0, microsecond=0)
+
+
+def get_horizon(now=None):
+    """Return (first bucket, end of horizon) for the maintained window"""
+    start = bucket_floor(now or timezone.now())
+    return start, start + timedelta(days=HORIZON_DAYS)
+
+
+def bucket_starts(start_time, end_time, horizon=None):
+    """Yield the start of every bucket in the horizon that [start_time, end_time) touches"""
+    horizon_start, horizon_end = horizon or get_horizon()
+    cursor = max(bucket_floor(start_time), horizon_start)
+    stop = min(end_time, horizon_end)
+    while cursor < stop:
+        yield cursor
+        cursor += BUCKET
+
+
+def covered_until():
+    """End of the range the buckets are maintained for, or None before the first extension"""
+    return OccupancyHorizon.objects.values_list('covered_until', flat=True).first()
+
+
+def _maintained_range():
+    """
+    (first bucket, covered_until) for an incremental write, holding a share
+    lock on the horizon row until the surrounding transaction ends so that
+    extend() waits for the write before recounting
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT covered_until FROM {OccupancyHorizon._meta.db_table} WHERE id = 1 FOR SHARE')
+        row = cursor.fetchone()
+    end = row[0] if row else None
+    start = get_horizon()[0]
+    return start, end or start
+
+
+def apply_delta(parking_zone, vehicle_type, start_time, end_time, delta):
+    """Add delta to every maintained bucket the window touches"""
+    if not delta:
+        return
+    with transaction.atomic():
+        buckets = list(bucket_starts(start_time, end_time, _maintained_range()))
+        if not buckets:
+            return
+        OccupancyBucket.objects.bulk_create(
+            [OccupancyBucket(parking_zone=parking_zone, vehicle_type=vehicle_type, bucket_start=b) for b in buckets],
+            ignore_conflicts=True,
+        )
+        OccupancyBucket.objects.filter(
+            parking_zone=parking_zone,
+            vehicle_type=vehicle_type,
+            bucket_start__gte=buckets[0],
+            bucket_start__lte=buckets[-1],
+        ).update(booked_count=F('booked_count') + delta)
+
+
+def booking_window(booking):
+    """
+    The (zone, vehicle_type, start, end) a booking occupies, or None if it
+    does not hold its slot.
+    """
+    if not booking.is_active or booking.slot_id is None:
+        return None
+    slot = booking.slot
+    return (slot.parking_zone, slot.vehicle_type, booking.start_time, booking.end_time)
+
+
+def stored_booking_window(pk):
+    """booking_window() for the row currently stored in the database"""
+    row = (
+        Booking.objects.filter(pk=pk)
+        .values_list('is_active', 'slot__parking_zone', 'slot__vehicle_type', 'start_time', 'end_time')
+        .first()
+    )
+    if row is None or not row[0]:
+        return None
+    return row[1:]
+
+
+def move_booking(before, after):
+    """Move a booking's count from its old window to its new one"""
+    if before == after:
+        return
+    if before is not None:
+        apply_delta(*before, -1)
+    if after is not None:
+        apply_delta(*after, 1)
+
+
+def add_bookings(bookings):
+    """
+    Count bookings created without signals (bulk_create) into their buckets.
+
+    Deltas are summed per bucket first, so the cost depends on the number of
+    distinct (zone, vehicle_type, delta) groups rather than on the number of
+    bookings.
+    """
+    with transaction.atomic():
+        horizon = _maintained_range()
+        deltas = Counter()
+        for booking in bookings:
+            window = booking_window(booking)
+            if window is None:
+                continue
+            parking_zone, vehicle_type, start_time, end_time = window
+            for bucket in bucket_starts(start_time, end_time, horizon):
+                deltas[(parking_zone, vehicle_type, bucket)] += 1
+        _add_counts(deltas)
+
+
+def _add_counts(deltas):
+    """Add {(zone, vehicle_type, bucket_start): delta} to the stored counts"""
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    groups = {}
+    for (parking_zone, vehicle_type, bucket), delta in deltas.items():
+        groups.setdefault((parking_zone, vehicle_type, delta), []).append(bucket)
+
+    with transaction.atomic():
+        OccupancyBucket.objects.bulk_create(
+            [OccupancyBucket(parking_zone=zone, vehicle_type=vt, bucket_start=b) for zone, vt, b in deltas],
+            ignore_conflicts=True,
+        )
+        for (parking_zone, vehicle_type, delta), buckets in groups.items():
+            OccupancyBucket.objects.filter(
+                parking_zone=parking_zone,
+                vehicle_type=vehicle_type,
+                bucket_start__in=buckets,
+            ).update(booked_count=F('booked_count') + delta)
+
+
+def booked_counts(parking_zone, vehicle_type, start_time, end_time):
+    """
+    Booked slot count per bucket for [start_time, end_time).
+
+    Returns:
+        dict mapping bucket start to count; buckets with no bookings are
+        omitted
+    """
+    return dict(
+        OccupancyBucket.objects.filter(
+            parking_zone=parking_zone,
+            vehicle_type=vehicle_type,
+            bucket_start__gte=bucket_floor(start_time),
+            bucket_start__lt=end_time,
+            booked_count__gt=0,
+        ).values_list('bucket_start', 'booked_count')
+    )
+
+
+def peak_booked_count(parking_zone, vehicle_type, start_time, end_time):
+    """Highest booked slot count in any bucket of [start_time, end_time)"""
+    return max(booked_counts(parking_zone, vehicle_type, start_time, end_time).values(), default=0)
+
+
+def zone_peaks(start_time, end_time, parking_zone=None):
+    """
+    Highest booked slot count per zone in any bucket of [start_time, end_time),
+    with the vehicle types of each bucket summed.
+
+    Returns:
+        dict mapping zone code to peak count; zones with no bookings are omitted
+    """
+    buckets = OccupancyBucket.objects.filter(
+        bucket_start__gte=bucket_floor(start_time),
+        bucket_start__lt=end_time,
+        booked_count__gt=0,
+    )
+    if parking_zone is not None:
+        buckets = buckets.filter(parking_zone=parking_zone)
+    peaks = {}
+    for zone, booked in buckets.values('parking_zone', 'bucket_start').annotate(
+        booked=Sum('booked_count')
+    ).values_list('parking_zone', 'booked'):
+        peaks[zone] = max(peaks.get(zone, 0), booked)
+    return peaks
+
+
+def forecast_percent(parking_zone, total_slots, start_time, end_time):
+    """Peak booked share of a zone's slots over a window, as a percentage"""
+    if not total_slots:
+        return 0.0
+    peak = zone_peaks(start_time, end_time, parking_zone).get(parking_zone, 0)
+    return round(min(peak, total_slots) * 100 / total_slots, 1)
+
+
+def in_horizon(start_time, end_time, now=None):
+    """Whether the buckets cover [start_time, end_time) and it starts after the current bucket"""
+    horizon_start, horizon_end = get_horizon(now)
+    return horizon_start + BUCKET <= start_time and end_time <= horizon_end
+
+
+def parse_window(query_params):
+    """
+    Read an optional forecast window from start_time/end_time query parameters.
+
+    Returns:
+        (start_time, end_time), or None when neither parameter is given
+
+    Raises:
+        ValueError: Only one bound given, unparseable datetime, empty window,
+            or a window outside the maintained horizon
+    """
+    raw_start, raw_end = query_params.get('start_time'), query_params.get('end_time')
+    if not raw_start and not raw_end:
+        return None
+    if not raw_start or not raw_end:
+        raise ValueError('Both start_time and end_time are required for a forecast')
+    start_time, end_time = parse_datetime(raw_start), parse_datetime(raw_end)
+    if start_time is None or end_time is None:
+        raise ValueError('start_time and end_time must be ISO 8601 datetimes')
+    if not settings.USE_TZ:
+        start_time, end_time = (timezone.make_naive(dt) if timezone.is_aware(dt) else dt for dt in (start_time, end_time))
+    if end_time <= start_time:
+        raise ValueError('end_time must be after start_time')
+    horizon_start, horizon_end = get_horizon()
+    if start_time < horizon_start or end_time > horizon_end:
+        raise ValueError(f'Forecasts cover the next {HORIZON_DAYS} days')
+    return start_time, end_time
+
+
+def forecast(total_slots, peak, window):
+    return {
+        'start_time': window[0],
+        'end_time': window[1],
+        'peak_booked_slots': peak,
+        'available_slots_at_peak': max(total_slots - peak, 0),
+    }
+
+
+def expected_counts(horizon):
+    """Recompute bucket counts for the horizon from active bookings"""
+    horizon_start, horizon_end = horizon
+    counts = Counter()
+    bookings = Booking.objects.filter(
+        is_active=True,
+        start_time__lt=horizon_end,
+        end_time__gt=horizon_start,
+    ).values_list('slot__parking_zone', 'slot__vehicle_type', 'start_time', 'end_time')
+    for parking_zone, vehicle_type, start_time, end_time in bookings.iterator():
+        for bucket in bucket_starts(start_time, end_time, horizon):
+            counts[(parking_zone, vehicle_type, bucket)] += 1
+    return counts
+
+
+def _snapshot(start, end):
+    """
+    (expected, stored) counts per (zone, vehicle_type, bucket) in [start, end),
+    read from one snapshot so they describe the same set of bookings
+    """
+    outer = connection.in_atomic_block
+    with transaction.atomic():
+        if not outer:
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+        expected = expected_counts((start, end))
+        stored = {
+            (zone, vehicle_type, bucket): count
+            for zone, vehicle_type, bucket, count in OccupancyBucket.objects.filter(
+                bucket_start__gte=start,
+                bucket_start__lt=end,
+            ).exclude(booked_count=0).values_list('parking_zone', 'vehicle_type', 'bucket_start', 'booked_count')
+        }
+    return expected, stored
+
+
+def _reconcile(start, end, fix):
+    """
+    Compare [start, end) with raw bookings and, if fix, add the differences.
+
+    Returns:
+        dict with the number of non-empty buckets and a list of mismatches
+        as (zone, vehicle_type, bucket_start, stored, expected) tuples
+    """
+    expected, stored = _snapshot(start, end)
+    mismatches = sorted(
+        key + (stored.get(key, 0), expected.get(key, 0))
+        for key in stored.keys() | expected.keys()
+        if stored.get(key, 0) != expected.get(key, 0)
+    )
+    if fix:
+        # Increments rather than overwrites: deltas committed after the snapshot stay counted
+        _add_counts({(zone, vt, bucket): want - have for zone, vt, bucket, have, want in mismatches})
+    return {'buckets': len(expected), 'mismatches': mismatches}
+
+
+def extend(now=None):
+    """
+    Move the maintained range to the current horizon, count bookings into the
+    buckets that enter it and drop the buckets that have passed.
+
+    Returns:
+        _reconcile() result for the added range
+    """
+    horizon_start, horizon_end = get_horizon(now)
+    with transaction.atomic():
+        horizon = OccupancyHorizon.objects.select_for_update().get(pk=1)
+        previous_end = horizon.covered_until
+        if previous_end is None or previous_end < horizon_end:
+            horizon.covered_until = horizon_end
+            horizon.save(update_fields=['covered_until'])
+
+    OccupancyBucket.objects.filter(bucket_start__lt=horizon_start).delete()
+    # First run, or the scheduler was down for longer than the horizon: recount everything
+    start = horizon_start if previous_end is None else max(previous_end, horizon_start)
+    if start >= horizon_end:
+        return {'buckets': 0, 'mismatches': []}
+    return _reconcile(start, horizon_end, fix=True)
+
+
+def rebuild(verify_only=False):
+    """
+    Compare the whole maintained range with raw bookings and, unless
+    verify_only, correct it (extending it to the current horizon first).
+
+    Returns:
+        dict with the number of non-empty buckets and a list of mismatches as
+        (zone, vehicle_type, bucket_start, stored, expected) tuples
+    """
+    if verify_only:
+        return _reconcile(get_horizon()[0], covered_until() or get_horizon()[0], fix=False)
+    extend()
+    return _reconcile(get_horizon()[0], covered_until(), fix=True)
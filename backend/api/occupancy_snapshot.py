@@ -0,0 +1,138 @@
+"""
+Zone occupancy snapshot shared by the slot and zone dashboards.
+
+The snapshot is the full parking_zone x floor x section x vehicle_type cube
+of total and occupied slot counts, from a single GROUP BY over ParkingSlot,
+plus active booking counts per (zone, vehicle type) from one GROUP BY over
+Booking. Dashboards slice it in Python instead of counting slots themselves.
+
+Snapshots are stored in the default cache under a version stamp. ParkingSlot
+and Booking writes bump the version on commit (see the receivers in
+api/signals.py, and the queryset.update() paths that skip signals), so the
+next reader rebuilds it. Each process keeps the last snapshot it read, so a
+dashboard load with an unchanged version costs one cache read and no
+queries. Snapshots older than OCCUPANCY_SNAPSHOT_TIMEOUT seconds are rebuilt
+whatever the version, which bounds drift from writes nobody bumped for.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .models import Booking, ParkingSlot
+
+VERSION_CACHE_KEY = 'occupancy_snapshot_version'
+DIMENSIONS = ('parking_zone', 'floor', 'section', 'vehicle_type')
+IN_PROGRESS_STATUSES = ['confirmed', 'checked_in']
+
+_local = None
+
+
+def bump_version():
+    """Invalidate the cached snapshot after a slot or booking change"""
+    try:
+        cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        cache.add(VERSION_CACHE_KEY, 1, timeout=None)
+
+
+def _snapshot_key(version):
+    return f'occupancy_snapshot:{version}'
+
+
+def _counts(total, occupied):
+    return {'total': total, 'available': total - occupied, 'occupied': occupied}
+
+
+class OccupancySnapshot:
+    """Slot and booking count cube"""
+
+    def __init__(self, cells, bookings, version=0, built_at=None):
+        # (zone, floor, section, vehicle_type, total, occupied)
+        self.cells = tuple(cells)
+        # (zone, vehicle_type, active, in_progress)
+        self.bookings = tuple(bookings)
+        self.version = version
+        # Wall clock, so copies shared through the cache age correctly in every process
+        self.built_at = time.time() if built_at is None else built_at
+
+    def is_fresh(self, version, timeout):
+        return self.version == version and time.time() - self.built_at < timeout
+
+    @classmethod
+    def build(cls, version=0):
+        cells = (
+            ParkingSlot.objects.values_list(*DIMENSIONS)
+            .annotate(total=Count('id'), occupied=Count('id', filter=Q(is_occupied=True)))
+            .order_by()
+        )
+        bookings = (
+            Booking.objects.filter(Q(is_active=True) | Q(status__in=IN_PROGRESS_STATUSES))
+            .values_list('slot__parking_zone', 'vehicle__vehicle_type')
+            .annotate(
+                active=Count('id', filter=Q(is_active=True)),
+                in_progress=Count('id', filter=Q(status__in=IN_PROGRESS_STATUSES)),
+            )
+            .order_by()
+        )
+        return cls(list(cells), list(bookings), version)
+
+    def _matching(self, filters):
+        positions = [(DIMENSIONS.index(name), value) for name, value in filters.items()]
+        for cell in self.cells:
+            if all(cell[i] == value for i, value in positions):
+                yield cell
+
+    def counts(self, **filters):
+        """
+        {'total', 'available', 'occupied'} for the slots matching the filters
+        (any of parking_zone, floor, section, vehicle_type)
+        """
+        total = occupied = 0
+        for cell in self._matching(filters):
+            total += cell[4]
+            occupied += cell[5]
+        return _counts(total, occupied)
+
+    def breakdown(self, dimension, **filters):
+        """counts() per value of one dimension, for the values that have slots"""
+        i = DIMENSIONS.index(dimension)
+        totals = {}
+        for cell in self._matching(filters):
+            total, occupied = totals.get(cell[i], (0, 0))
+            totals[cell[i]] = (total + cell[4], occupied + cell[5])
+        return {value: _counts(total, occupied) for value, (total, occupied) in totals.items()}
+
+    def active_bookings(self, parking_zone=None, in_progress=False):
+        """
+        Bookings with is_active set (or, with in_progress, with status
+        confirmed/checked_in), optionally in one zone
+        """
+        column = 3 if in_progress else 2
+        return sum(row[column] for row in self.bookings if parking_zone is None or row[0] == parking_zone)
+
+    def active_bookings_by_vehicle_type(self):
+        """{vehicle_type: bookings with is_active set}, by the booked vehicle's type"""
+        totals = {}
+        for _, vehicle_type, active, _ in self.bookings:
+            if active:
+                totals[vehicle_type] = totals.get(vehicle_type, 0) + active
+        return totals
+
+
+def get_snapshot():
+    """Return the current snapshot, building and caching it on a miss"""
+    global _local
+    timeout = getattr(settings, 'OCCUPANCY_SNAPSHOT_TIMEOUT', 30)
+    version = cache.get(VERSION_CACHE_KEY, 0)
+    snapshot = _local
+    if snapshot is not None and snapshot.is_fresh(version, timeout):
+        return snapshot
+
+    snapshot = cache.get(_snapshot_key(version))
+    if snapshot is None or not snapshot.is_fresh(version, timeout):
+        snapshot = OccupancySnapshot.build(version)
+        cache.set(_snapshot_key(version), snapshot, timeout)
+    _local = snapshot
+    return snapshot
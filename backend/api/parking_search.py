@@ -4,35 +4,9 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from django.db.models import F, ExpressionWrapper, FloatField
 from django.db.models.functions import Cos, Sin, Radians, ACos
-import math
-
-# Make sure geopy is installed
-try:
-    from geopy.distance import geodesic
-except ImportError:
-    # Fallback simple distance calculation if geopy is not available
-    def geodesic(point1, point2):
-        class Distance:
-            def __init__(self, km):
-                self.kilometers = km
-        
-        # Simple Haversine formula for distance calculation
-        lat1, lon1 = point1
-        lat2, lon2 = point2
-        R = 6371  # Radius of the Earth in km
-        
-        dLat = math.radians(lat2 - lat1)
-        dLon = math.radians(lon2 - lon1)
-        
-        a = (math.sin(dLat/2) * math.sin(dLat/2) +
-             math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) *
-             math.sin(dLon/2) * math.sin(dLon/2))
-        
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-        distance = R * c
-        
-        return Distance(distance)
 
+from .geo_index import nearest_lots
+from .lot_search import DEFAULT_LIMIT, search_lots
 from .models import ParkingLot
 from .serializers import ParkingLotSerializer
 
@@ -55,43 +29,18 @@ class NearestParkingLotsView(generics.ListAPIView):
         except (ValueError, TypeError):
             return ParkingLot.objects.none()
             
-        # Calculate distance using geopy's geodesic
-        user_location = (lat_float, lon_float)
-        
-        # Get all parking lots
-        parking_lots = ParkingLot.objects.all()
-        
-        # Calculate distances and filter by radius
-        lots_with_distances = []
-        for lot in parking_lots:
-            lot_location = (lot.latitude, lot.longitude)
-            distance = geodesic(user_location, lot_location).kilometers
-            
-            if distance <= radius:
-                # Add distance to the lot object
-                lot.distance_km = distance
-                lots_with_distances.append(lot)
-        
-        # Sort by distance and limit results
-        sorted_lots = sorted(lots_with_distances, key=lambda x: x.distance_km)[:limit]
-        
-        return sorted_lots
+        # k nearest lots within the radius, from a bounding-box range scan
+        return nearest_lots(lat_float, lon_float, limit=limit, radius_km=radius)
         
     def list(self, request, *args, **kwargs):
         queryset = self.get_queryset()
         serializer = self.get_serializer(queryset, many=True)
         
-        # Add distance to each parking lot in the response
-        lat = float(request.query_params.get('lat'))
-        lon = float(request.query_params.get('lon'))
-        user_location = (lat, lon)
-        
+        # Add the distance computed by the search to each parking lot
         response_data = []
-        for lot_data in serializer.data:
-            lot_location = (float(lot_data['latitude']), float(lot_data['longitude']))
-            distance = geodesic(user_location, lot_location).kilometers
-            lot_data['distance'] = f"{distance:.2f} km"
-            lot_data['distance_value'] = distance  # Add numeric value for sorting
+        for lot, lot_data in zip(queryset, serializer.data):
+            lot_data['distance'] = f"{lot.distance_km:.2f} km"
+            lot_data['distance_value'] = lot.distance_km  # Add numeric value for sorting
             response_data.append(lot_data)
         
         return Response(response_data)
@@ -100,26 +49,36 @@ class NearestParkingLotsView(generics.ListAPIView):
 @permission_classes([AllowAny])
 def search_parking_by_address(request):
     """
-    Search for parking lots by address
+    Search for parking lots by name or address
+    
+    Query parameters:
+    - address (or q): search text; matched as a substring, a word prefix or
+      fuzzily (typos), best matches first
+    - limit: maximum number of results (default 20, max 100)
+    - typeahead: 'true' to only match words starting with the text
     """
-    address = request.query_params.get('address', '')
+    address = request.query_params.get('address') or request.query_params.get('q', '')
     
     if not address:
         return Response(
             {"error": "Address parameter is required"}, 
             status=status.HTTP_400_BAD_REQUEST
         )
-        
-    # Simple partial address matching
-    # In a production environment, this should be replaced with a more advanced
-    # geo-search solution like geopy's geocoding or Google's Geocoding API
-    parking_lots = ParkingLot.objects.filter(address__icontains=address)
     
-    if not parking_lots.exists():
+    try:
+        limit = int(request.query_params.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        limit = DEFAULT_LIMIT
+    typeahead = request.query_params.get('typeahead', '').lower() == 'true'
+        
+    # Trigram-indexed search (see lot_search)
+    parking_lots = search_lots(address, limit=limit, typeahead=typeahead)
+    
+    if not parking_lots:
         return Response(
             {"message": "No parking lots found matching this address"}, 
             status=status.HTTP_404_NOT_FOUND
         )
         
     serializer = ParkingLotSerializer(parking_lots, many=True)
-    return Response(serializer.data)
\ No newline at end of file
+    return Response(serializer.data)
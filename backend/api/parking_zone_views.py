@@ -7,10 +7,12 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Count, Q
-from .models import ParkingSlot, Booking
+from django.db.models import Q
+from . import occupancy
+from .models import ParkingSlot
+from .occupancy_snapshot import get_snapshot
 from .serializers import ParkingSlotSerializer
-from .utils import PARKING_LOCATIONS
+from .utils import get_parking_locations
 
 
 class ParkingZoneListView(APIView):
@@ -20,23 +22,38 @@ class ParkingZoneListView(APIView):
     permission_classes = []  # Public endpoint
     
     def get(self, request):
-        """Return list of all parking zones with metadata"""
+        """
+        Return list of all parking zones with metadata
+        Query params:
+        - start_time, end_time: Optional booking window; each zone then gets a
+          forecast with its peak booked slots over the window
+        """
+        try:
+            window = occupancy.parse_window(request.query_params)
+        except ValueError as e:
+            return Response({
+                'success': False,
+                'error': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
         zones = []
+        locations = get_parking_locations()
+        snapshot = get_snapshot()
+        peaks = occupancy.zone_peaks(*window) if window else None
         
         for zone_key, choice_name in ParkingSlot.PARKING_ZONE_CHOICES:
-            # Find matching location from PARKING_LOCATIONS
+            # Find the geofence for this zone
             location_data = next(
-                (loc for loc in PARKING_LOCATIONS if choice_name in loc.get('name', '')),
+                (loc for loc in locations
+                 if loc.get('parking_zone') == zone_key or choice_name in loc.get('name', '')),
                 None
             )
             
             # Get slot counts for this zone
-            total_slots = ParkingSlot.objects.filter(parking_zone=zone_key).count()
-            available_slots = ParkingSlot.objects.filter(
-                parking_zone=zone_key,
-                is_occupied=False
-            ).count()
-            occupied_slots = total_slots - available_slots
+            counts = snapshot.counts(parking_zone=zone_key)
+            total_slots = counts['total']
+            available_slots = counts['available']
+            occupied_slots = counts['occupied']
             
             zone_info = {
                 'code': zone_key,
@@ -46,6 +63,8 @@ class ParkingZoneListView(APIView):
                 'occupied_slots': occupied_slots,
                 'occupancy_rate': round((occupied_slots / total_slots * 100), 2) if total_slots > 0 else 0,
             }
+            if peaks is not None:
+                zone_info['forecast'] = occupancy.forecast(total_slots, peaks.get(zone_key, 0), window)
             
             # Add location data if available
             if location_data:
@@ -140,53 +159,29 @@ class ZoneStatisticsView(APIView):
                 'error': 'Invalid zone code'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Get all slots for this zone
-        slots = ParkingSlot.objects.filter(parking_zone=zone_code)
+        # All counts come from one occupancy snapshot
+        snapshot = get_snapshot()
         
         # Calculate statistics
-        total_slots = slots.count()
-        available_slots = slots.filter(is_occupied=False).count()
-        occupied_slots = total_slots - available_slots
+        counts = snapshot.counts(parking_zone=zone_code)
+        total_slots = counts['total']
+        available_slots = counts['available']
+        occupied_slots = counts['occupied']
         
         # Vehicle type breakdown
+        by_vehicle_type = snapshot.breakdown('vehicle_type', parking_zone=zone_code)
         vehicle_breakdown = {}
         for vehicle_type, _ in ParkingSlot.VEHICLE_TYPE_CHOICES:
-            type_slots = slots.filter(vehicle_type=vehicle_type)
-            vehicle_breakdown[vehicle_type] = {
-                'total': type_slots.count(),
-                'available': type_slots.filter(is_occupied=False).count(),
-                'occupied': type_slots.filter(is_occupied=True).count()
-            }
-        
-        # Floor breakdown
-        floors = slots.values('floor').distinct()
-        floor_breakdown = {}
-        for floor_data in floors:
-            floor = floor_data['floor']
-            floor_slots = slots.filter(floor=floor)
-            floor_breakdown[floor] = {
-                'total': floor_slots.count(),
-                'available': floor_slots.filter(is_occupied=False).count(),
-                'occupied': floor_slots.filter(is_occupied=True).count()
-            }
+            vehicle_breakdown[vehicle_type] = by_vehicle_type.get(
+                vehicle_type, {'total': 0, 'available': 0, 'occupied': 0}
+            )
         
-        # Section breakdown
-        sections = slots.values('section').distinct()
-        section_breakdown = {}
-        for section_data in sections:
-            section = section_data['section']
-            section_slots = slots.filter(section=section)
-            section_breakdown[section] = {
-                'total': section_slots.count(),
-                'available': section_slots.filter(is_occupied=False).count(),
-                'occupied': section_slots.filter(is_occupied=True).count()
-            }
+        # Floor and section breakdowns
+        floor_breakdown = snapshot.breakdown('floor', parking_zone=zone_code)
+        section_breakdown = snapshot.breakdown('section', parking_zone=zone_code)
         
         # Active bookings for this zone
-        active_bookings = Booking.objects.filter(
-            slot__parking_zone=zone_code,
-            status__in=['confirmed', 'checked_in']
-        ).count()
+        active_bookings = snapshot.active_bookings(parking_zone=zone_code, in_progress=True)
         
         zone_name = dict(ParkingSlot.PARKING_ZONE_CHOICES).get(zone_code, zone_code)
         
@@ -294,36 +289,52 @@ class ZoneDashboardView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        """Get dashboard data for all zones"""
+        """
+        Get dashboard data for all zones
+        Query params:
+        - start_time, end_time: Optional window; each zone then gets a forecast
+          with its peak booked slots over the window
+        """
         if request.user.role not in ['admin', 'security']:
             return Response({
                 'success': False,
                 'error': 'Admin or security access required'
             }, status=status.HTTP_403_FORBIDDEN)
         
+        try:
+            window = occupancy.parse_window(request.query_params)
+        except ValueError as e:
+            return Response({
+                'success': False,
+                'error': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        peaks = occupancy.zone_peaks(*window) if window else None
+        
         zones_data = []
         overall_total = 0
         overall_available = 0
         overall_occupied = 0
+        snapshot = get_snapshot()
         
         for zone_code, zone_name in ParkingSlot.PARKING_ZONE_CHOICES:
-            slots = ParkingSlot.objects.filter(parking_zone=zone_code)
-            total = slots.count()
-            available = slots.filter(is_occupied=False).count()
-            occupied = total - available
+            counts = snapshot.counts(parking_zone=zone_code)
+            total = counts['total']
+            available = counts['available']
+            occupied = counts['occupied']
             
             overall_total += total
             overall_available += available
             overall_occupied += occupied
             
             # Get vehicle type distribution
+            by_vehicle_type = snapshot.breakdown('vehicle_type', parking_zone=zone_code)
             vehicle_distribution = {}
             for vtype, vname in ParkingSlot.VEHICLE_TYPE_CHOICES:
-                count = slots.filter(vehicle_type=vtype).count()
+                count = by_vehicle_type.get(vtype, {}).get('total', 0)
                 if count > 0:
                     vehicle_distribution[vtype] = count
             
-            zones_data.append({
+            zone_data = {
                 'zone_code': zone_code,
                 'zone_name': zone_name,
                 'total_slots': total,
@@ -331,7 +342,10 @@ class ZoneDashboardView(APIView):
                 'occupied_slots': occupied,
                 'occupancy_rate': round((occupied / total * 100), 2) if total > 0 else 0,
                 'vehicle_distribution': vehicle_distribution
-            })
+            }
+            if peaks is not None:
+                zone_data['forecast'] = occupancy.forecast(total, peaks.get(zone_code, 0), window)
+            zones_data.append(zone_data)
         
         return Response({
             'success': True,
@@ -1,71 +1,111 @@
 from decimal import Decimal
-from datetime import timedelta
 from django.utils import timezone
-from .models import PricingRate, Booking
+from . import live_occupancy, occupancy
+from .fee_calculator import calculate_fee, calculate_fees
+from .pricing_engine import get_pricing_table
+from .quote_cache import cached_fees
 
-def get_applicable_rate(vehicle_type, booking_time):
+def get_applicable_rate(vehicle_type, booking_time, parking_zone=None):
     """
     Finds the most specific pricing rate for a given vehicle type and time.
+    Resolved from the in-process pricing table; no database queries.
     """
-    # Try to find a rate for the specific vehicle type
-    rate = PricingRate.objects.filter(
-        vehicle_type=vehicle_type,
-        effective_from__lte=booking_time,
-        effective_to__gte=booking_time
-    ).order_by('-is_default').first()
+    return get_pricing_table().resolve_rate(vehicle_type, booking_time, parking_zone)
 
-    # If no specific rate, try to find a rate for 'all' vehicle types
-    if not rate:
-        rate = PricingRate.objects.filter(
-            vehicle_type='all',
-            effective_from__lte=booking_time,
-            effective_to__gte=booking_time
-        ).order_by('-is_default').first()
+def quote_booking_prices(windows, cached=True):
+    """
+    Price many bookings and report how each price was reached.
+
+    The base fee comes from fee_calculator, memoised by the quote cache
+    unless cached is False. If the slot's parking lot has
+    DynamicPricingRule rows, the occupancy is read and the first matching
+    rule's price_multiplier is applied. For a window that starts after the
+    current 15-minute bucket, that is the slot zone's peak booked share over
+    the window from the occupancy buckets (see occupancy); otherwise it is
+    the lot's live occupancy from the cached counters (see live_occupancy).
+
+    Args:
+        windows: Iterable of (start_time, end_time, vehicle_type) tuples,
+            optionally followed by parking_zone and parking_lot_id
+        cached: Read and fill the quote cache; price previews only. Prices
+            that are charged pass False so they always use the current rules.
+
+    Returns:
+        list of dicts with price, base_price, multiplier, occupancy_percent
+        and dynamic_rule (rule name or None), in the same order as windows
+    """
+    windows = [tuple(w) + (None,) * (5 - len(w)) for w in windows]
+    fees = cached_fees if cached else calculate_fees
+    base_prices = fees((start, end, vt, zone) for start, end, vt, zone, _ in windows)
+    table = get_pricing_table()
 
-    # If still no rate, get the default rate
-    if not rate:
-        rate = PricingRate.objects.filter(is_default=True).first()
-        
-    return rate
+    quotes = []
+    occupancy_by_lot = {}
+    forecasts = {}
+    now = timezone.now()
+    for (start, end, vehicle_type, zone, lot_id), base_price in zip(windows, base_prices):
+        quote = {
+            'price': base_price,
+            'base_price': base_price,
+            'multiplier': Decimal('1.00'),
+            'occupancy_percent': None,
+            'dynamic_rule': None,
+        }
+        if end > start and table.rules_for_lot(lot_id):
+            if zone and occupancy.in_horizon(start, end, now):
+                if (zone, start, end) not in forecasts:
+                    total = live_occupancy.get_occupancy('zone', zone)[1]
+                    forecasts[(zone, start, end)] = occupancy.forecast_percent(zone, total, start, end)
+                percent = forecasts[(zone, start, end)]
+            else:
+                if lot_id not in occupancy_by_lot:
+                    occupancy_by_lot[lot_id] = live_occupancy.get_occupancy('lot', lot_id)[2]
+                percent = occupancy_by_lot[lot_id]
+            quote['occupancy_percent'] = percent
+            rule = table.match_dynamic_rule(lot_id, percent, start)
+            if rule is not None:
+                quote['multiplier'] = rule.price_multiplier
+                quote['dynamic_rule'] = rule.name
+                quote['price'] = (base_price * rule.price_multiplier).quantize(Decimal('0.01'))
+        quotes.append(quote)
+    return quotes
 
-def calculate_booking_price(start_time, end_time, vehicle_type):
+def calculate_booking_price(start_time, end_time, vehicle_type, parking_zone=None, parking_lot_id=None):
     """
     Calculates the total price for a booking based on duration and pricing rates.
+    Weekend, time-slot, holiday and daily rates are applied segment by segment
+    (see fee_calculator); occupancy-based DynamicPricingRule multipliers are
+    applied when parking_lot_id is given. Never served from the quote cache.
     """
     if end_time <= start_time:
         return Decimal('0.00')
 
-    duration = end_time - start_time
-    duration_hours = duration.total_seconds() / 3600
-    
-    rate = get_applicable_rate(vehicle_type, start_time)
-    
-    if not rate:
-        # Fallback to a hardcoded rate if no pricing is configured
-        return Decimal(duration_hours) * Decimal('10.00')
+    return quote_booking_prices(
+        [(start_time, end_time, vehicle_type, parking_zone, parking_lot_id)], cached=False
+    )[0]['price']
 
-    # Simple hourly calculation for now
-    # In a real-world scenario, this would handle daily rates, partial hours, etc.
-    total_price = Decimal(duration_hours) * rate.hourly_rate
-    
-    return round(total_price, 2)
+def calculate_booking_prices(windows):
+    """
+    Price many bookings in one batch, bypassing the quote cache.
+
+    Args:
+        windows: Iterable of (start_time, end_time, vehicle_type) tuples,
+            optionally followed by parking_zone and parking_lot_id
+
+    Returns:
+        list of Decimal prices, in the same order as windows
+    """
+    return [quote['price'] for quote in quote_booking_prices(windows, cached=False)]
 
 def calculate_extension_price(booking, new_end_time):
     """
     Calculates the additional cost for extending a booking.
+    The whole extension is charged as overtime (extension_rate_multiplier).
     """
     if new_end_time <= booking.end_time:
         return Decimal('0.00')
 
-    extension_duration = new_end_time - booking.end_time
-    extension_hours = extension_duration.total_seconds() / 3600
-    
-    rate = get_applicable_rate(booking.vehicle.vehicle_type, booking.end_time)
-    
-    if not rate:
-        return Decimal(extension_hours) * Decimal('10.00')
-
-    # Apply extension multiplier
-    extension_price = (Decimal(extension_hours) * rate.hourly_rate) * rate.extension_rate_multiplier
-    
-    return round(extension_price, 2)
+    return calculate_fee(
+        booking.end_time, new_end_time, booking.vehicle.vehicle_type,
+        overtime_from=booking.end_time
+    )
@@ -0,0 +1,184 @@
+"""
+In-process pricing rule table.
+
+All PricingRate rows, the active ZonePricingRate and DynamicPricingRule rows
+and the PublicHoliday calendar are loaded into an immutable PricingTable
+with the candidate rates for every (vehicle_type, zone) precomputed, so
+resolving a rate runs no queries. Booking prices consider every PricingRate
+in its validity window, active or not, as get_applicable_rate() always has;
+only the fee calculator's rate card is limited to active rates.
+
+Any save or delete of those models bumps a version key in the shared cache
+(see the receivers in api/signals.py and CACHES in settings). Each process
+compares its table's version with the cache on access and, when they
+differ, builds a new table and swaps it in with a single assignment, so
+readers never see a half-built table. PRICING_TABLE_MAX_AGE only bounds how
+long a table can outlive a version key lost by the cache.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import DynamicPricingRule, PricingRate, PublicHoliday, ZonePricingRate
+
+VERSION_CACHE_KEY = 'pricing_rules_version'
+
+_table = None
+_table_lock = threading.Lock()
+
+
+def bump_version():
+    """Invalidate every process's pricing table after a rule change"""
+    global _table
+    try:
+        cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        cache.add(VERSION_CACHE_KEY, 1, timeout=None)
+    _table = None
+
+
+def current_version():
+    return cache.get(VERSION_CACHE_KEY, 0)
+
+
+def _in_effect(rate, when):
+    """Whether a PricingRate's validity window contains `when`"""
+    return (
+        rate.effective_from is not None and rate.effective_from <= when
+        and rate.effective_to is not None and rate.effective_to >= when
+    )
+
+
+def _zone_rate_in_effect(rate, when):
+    return rate.effective_from <= when and (rate.effective_to is None or rate.effective_to >= when)
+
+
+class PricingTable:
+    """Immutable snapshot of the pricing rules"""
+
+    def __init__(self, pricing_rates, zone_rates, dynamic_rules, version, holidays=()):
+        self.version = version
+        self.built_at = time.monotonic()
+
+        # Same order as get_applicable_rate(): default rates first, then by pk
+        by_type = {}
+        for rate in sorted(pricing_rates, key=lambda r: (not r.is_default, r.pk)):
+            by_type.setdefault(rate.vehicle_type, []).append(rate)
+        self.rates_by_type = {vt: tuple(rates) for vt, rates in by_type.items()}
+
+        # In pk order, as used by the .first() fallbacks
+        self.default_rates = tuple(r for r in pricing_rates if r.is_default)
+        # Rate card candidates: active only, default rates first
+        self.active_rates = tuple(
+            sorted((r for r in pricing_rates if r.is_active), key=lambda r: (not r.is_default, r.pk))
+        )
+
+        by_zone = {}
+        for rate in sorted(zone_rates, key=lambda r: r.created_at, reverse=True):
+            by_zone.setdefault((rate.parking_zone, rate.vehicle_type), []).append(rate)
+        self.zone_rates = {key: tuple(rates) for key, rates in by_zone.items()}
+
+        by_lot = {}
+        for rule in dynamic_rules:
+            by_lot.setdefault(rule.parking_lot_id, []).append(rule)
+        self.dynamic_rules = {lot_id: tuple(rules) for lot_id, rules in by_lot.items()}
+
+        self.holidays = frozenset(holidays)
+
+        self._candidates = {}
+        # Data derived from the rules by other modules (e.g. fee_calculator's
+        # rate profiles); discarded together with the table
+        self.memo = {}
+
+    @classmethod
+    def build(cls, version=None):
+        return cls(
+            list(PricingRate.objects.order_by('pk')),
+            list(ZonePricingRate.objects.filter(is_active=True)),
+            list(DynamicPricingRule.objects.filter(is_active=True)),
+            current_version() if version is None else version,
+            PublicHoliday.objects.values_list('date', flat=True),
+        )
+
+    def candidates(self, vehicle_type, parking_zone=None):
+        """
+        Ordered (rate, needs_zone_check) candidates for a vehicle type and zone,
+        computed once per key.
+        """
+        key = (vehicle_type, parking_zone)
+        if key not in self._candidates:
+            chain = []
+            if parking_zone:
+                chain += [(rate, True) for rate in self.zone_rates.get((parking_zone, vehicle_type), ())]
+            chain += [(rate, False) for rate in self.rates_by_type.get(vehicle_type, ())]
+            chain += [(rate, False) for rate in self.rates_by_type.get('all', ())]
+            self._candidates[key] = tuple(chain)
+        return self._candidates[key]
+
+    def resolve_rate(self, vehicle_type, booking_time, parking_zone=None):
+        """
+        Most specific rate for a vehicle type (and optionally zone) at a time.
+
+        Precedence: a zone rate in effect for (zone, vehicle_type); a
+        PricingRate for the vehicle type in effect; a PricingRate for 'all'
+        in effect; any default PricingRate. Returns None if nothing matches.
+        """
+        for rate, is_zone_rate in self.candidates(vehicle_type, parking_zone):
+            if is_zone_rate:
+                if _zone_rate_in_effect(rate, booking_time):
+                    return rate
+            elif _in_effect(rate, booking_time):
+                return rate
+        return self.default_rates[0] if self.default_rates else None
+
+    def rate_card(self, vehicle_type):
+        """
+        Rate shown by the fee calculator: the active default rate for the
+        vehicle type, any active rate for it, then the active default rate
+        for 'all'.
+        """
+        for rate in self.active_rates:
+            if rate.vehicle_type == vehicle_type:
+                return rate
+        return next((r for r in self.active_rates if r.vehicle_type == 'all' and r.is_default), None)
+
+    def rules_for_lot(self, parking_lot_id):
+        """Active DynamicPricingRule rows for a lot, highest priority first"""
+        return self.dynamic_rules.get(parking_lot_id, ())
+
+    def match_dynamic_rule(self, parking_lot_id, occupancy_percent, when):
+        """
+        Highest-priority rule for the lot whose occupancy band, day type and
+        hour window contain the given occupancy and time, or None.
+        """
+        is_weekend = when.weekday() >= 5
+        for rule in self.rules_for_lot(parking_lot_id):
+            if not rule.min_occupancy <= occupancy_percent <= rule.max_occupancy:
+                continue
+            if not (rule.applies_weekends if is_weekend else rule.applies_weekdays):
+                continue
+            if rule.start_hour <= rule.end_hour:
+                in_hours = rule.start_hour <= when.hour <= rule.end_hour
+            else:
+                # Hour window crosses midnight
+                in_hours = when.hour >= rule.start_hour or when.hour <= rule.end_hour
+            if in_hours:
+                return rule
+        return None
+
+
+def get_pricing_table():
+    """Return the process-wide pricing table, rebuilding it if stale"""
+    global _table
+    max_age = getattr(settings, 'PRICING_TABLE_MAX_AGE', 60)
+    version = current_version()
+    table = _table
+    if table is not None and table.version == version and time.monotonic() - table.built_at < max_age:
+        return table
+
+    with _table_lock:
+        if _table is None or _table is table:
+            _table = PricingTable.build(version=version)
+        return _table
@@ -0,0 +1,182 @@
+"""
+Memoised price quotes.
+
+The booking UI asks for a price preview on every date-picker change, and
+the same (vehicle type, zone, window) is quoted over and over. Quotes are
+memoised in a per-process LRU (QUOTE_CACHE_SIZE entries) and, when
+QUOTE_CACHE_ALIAS names a cache in CACHES, in that shared cache as well.
+Entries in both tiers expire after QUOTE_CACHE_TIMEOUT seconds. Only
+previews are served from here; prices that are charged are computed fresh
+(see calculate_booking_price in api/pricing.py).
+
+Every key includes the pricing table version, so any change to PricingRate,
+ZonePricingRate, DynamicPricingRule or PublicHoliday (which bumps the
+version, see pricing_engine) makes old entries unreachable. The timeout
+bounds how long a quote can outlive a rule change that did not bump the
+version (a queryset update() outside the admin actions, say).
+
+Fees are exact to the minute, so windows are keyed on start minute and
+duration in minutes, and windows with seconds are not cached.
+
+Hit and miss counters are kept per process; see QuoteCache.stats().
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .fee_calculator import calculate_fees
+from .pricing_engine import get_pricing_table
+
+_MISSING = object()
+
+
+class QuoteCache:
+    """Thread-safe LRU with an optional shared second tier"""
+
+    def __init__(self, max_size=10000, shared_alias=None, timeout=300):
+        self.max_size = max_size
+        self.shared_alias = shared_alias
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            max_size=getattr(settings, 'QUOTE_CACHE_SIZE', 10000),
+            shared_alias=getattr(settings, 'QUOTE_CACHE_ALIAS', None),
+            timeout=getattr(settings, 'QUOTE_CACHE_TIMEOUT', 300),
+        )
+
+    def _shared(self):
+        return caches[self.shared_alias] if self.shared_alias else None
+
+    @staticmethod
+    def _shared_key(key):
+        return 'quote:' + ':'.join(str(part) for part in key)
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.timeout, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get_many(self, keys):
+        """Return {key: value} for the keys found in either tier"""
+        found = {}
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key, _MISSING)
+                if entry is _MISSING:
+                    continue
+                expires_at, value = entry
+                if expires_at <= now:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = value
+            self.local_hits += len(found)
+
+        remaining = [key for key in keys if key not in found]
+        shared = self._shared()
+        if remaining and shared is not None:
+            shared_keys = {self._shared_key(key): key for key in remaining}
+            for shared_key, value in shared.get_many(list(shared_keys)).items():
+                key = shared_keys[shared_key]
+                found[key] = value
+                self._remember(key, value)
+                with self._lock:
+                    self.shared_hits += 1
+
+        with self._lock:
+            self.misses += sum(1 for key in keys if key not in found)
+        return found
+
+    def set_many(self, values):
+        for key, value in values.items():
+            self._remember(key, value)
+        shared = self._shared()
+        if values and shared is not None:
+            shared.set_many({self._shared_key(key): value for key, value in values.items()}, self.timeout)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.local_hits = self.shared_hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.local_hits + self.shared_hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'shared_tier': self.shared_alias,
+                'local_hits': self.local_hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.local_hits + self.shared_hits) / lookups, 4) if lookups else None,
+            }
+
+
+quote_cache = QuoteCache.from_settings()
+
+
+def _cacheable(dt):
+    return dt.second == 0 and dt.microsecond == 0
+
+
+def _window_key(version, start_time, end_time, vehicle_type, parking_zone):
+    duration = int((end_time - start_time).total_seconds() // 60)
+    return ('fee', version, vehicle_type, parking_zone or '', start_time.strftime('%Y%m%d%H%M'), duration)
+
+
+def cached_fees(bookings):
+    """
+    calculate_fees() through the quote cache.
+
+    Args:
+        bookings: Iterable of (start_time, end_time, vehicle_type, parking_zone)
+
+    Returns:
+        list of Decimal fees, in input order
+    """
+    bookings = list(bookings)
+    version = get_pricing_table().version
+    keys = [
+        _window_key(version, start, end, vehicle_type, zone)
+        if _cacheable(start) and _cacheable(end) else None
+        for start, end, vehicle_type, zone in bookings
+    ]
+    found = quote_cache.get_many([key for key in keys if key is not None])
+
+    missing = [i for i, key in enumerate(keys) if key not in found]
+    fees = [found.get(key) for key in keys]
+    if missing:
+        computed = calculate_fees(bookings[i] for i in missing)
+        for i, fee in zip(missing, computed):
+            fees[i] = fee
+        quote_cache.set_many({keys[i]: fees[i] for i in missing if keys[i] is not None})
+    return fees
+
+
+def cached_quote(namespace, parts, compute):
+    """
+    Memoise compute() under (namespace, pricing version, *parts).
+
+    For whole responses that depend only on the pricing rules and `parts`.
+    """
+    key = (namespace, get_pricing_table().version) + tuple(parts)
+    found = quote_cache.get_many([key])
+    if key in found:
+        return found[key]
+    value = compute()
+    quote_cache.set_many({key: value})
+    return value
@@ -11,6 +11,8 @@ from django.utils import timezone
 from decimal import Decimal
 
 from .models import PricingRate
+from .pricing_engine import get_pricing_table
+from .quote_cache import cached_quote, quote_cache
 from .serializers import (
     PricingRateSerializer,
     PricingRateListSerializer,
@@ -211,44 +213,33 @@ class CalculateParkingFeeView(APIView):
         vehicle_type = input_serializer.validated_data['vehicle_type']
         hours = float(input_serializer.validated_data.get('hours', 0))
         days = input_serializer.validated_data.get('days', 0)
-        booking_datetime = input_serializer.validated_data.get('booking_datetime') or timezone.now()
+        # Default to the current minute so repeated previews share a quote
+        booking_datetime = (
+            input_serializer.validated_data.get('booking_datetime')
+            or timezone.now().replace(second=0, microsecond=0)
+        )
         
-        # Find appropriate rate for vehicle type
-        try:
-            # First, try to get default rate for the vehicle type
-            rate = PricingRate.objects.filter(
-                vehicle_type=vehicle_type,
-                is_active=True,
-                is_default=True
-            ).first()
-            
-            # If no default, get any active rate for the vehicle type
-            if not rate:
-                rate = PricingRate.objects.filter(
-                    vehicle_type=vehicle_type,
-                    is_active=True
-                ).first()
-            
-            # If still no rate, try 'all' vehicle type
-            if not rate:
-                rate = PricingRate.objects.filter(
-                    vehicle_type='all',
-                    is_active=True,
-                    is_default=True
-                ).first()
-            
-            if not rate:
-                return Response(
-                    {'error': f'No active rate found for vehicle type: {vehicle_type}'},
-                    status=status.HTTP_404_NOT_FOUND
-                )
-            
-        except Exception as e:
+        # Find appropriate rate for vehicle type (from the in-process pricing table)
+        rate = get_pricing_table().rate_card(vehicle_type)
+        if not rate:
             return Response(
-                {'error': f'Error finding rate: {str(e)}'},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                {'error': f'No active rate found for vehicle type: {vehicle_type}'},
+                status=status.HTTP_404_NOT_FOUND
             )
         
+        response_data = cached_quote(
+            'fee_card',
+            (vehicle_type, hours, days, booking_datetime.isoformat()),
+            lambda: self.build_fee_data(rate, hours, days, booking_datetime),
+        )
+        
+        return Response({
+            'message': 'Fee calculated successfully',
+            'data': response_data
+        })
+
+    def build_fee_data(self, rate, hours, days, booking_datetime):
+        """Fee and breakdown for a rate; memoised by the quote cache"""
         # Calculate fee
         total_fee = rate.calculate_fee(hours=hours, days=days, booking_datetime=booking_datetime)
         applicable_rate = rate.get_applicable_rate(booking_datetime)
@@ -289,7 +280,7 @@ class CalculateParkingFeeView(APIView):
             breakdown['hourly_charge'] = f'₹{float(applicable_rate * Decimal(str(hours)))}'
         
         # Prepare response
-        response_data = {
+        return {
             'vehicle_type': rate.get_vehicle_type_display(),
             'rate_name': rate.rate_name,
             'hourly_rate': float(rate.hourly_rate),
@@ -302,10 +293,18 @@ class CalculateParkingFeeView(APIView):
             'is_weekend': is_weekend,
             'is_special_time': is_special_time
         }
-        
+
+
+class QuoteCacheStatsView(APIView):
+    """
+    GET: Hit rate of this worker's price quote cache (admin only)
+    """
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    
+    def get(self, request):
         return Response({
-            'message': 'Fee calculated successfully',
-            'data': response_data
+            'message': 'Quote cache statistics retrieved successfully',
+            'data': quote_cache.stats()
         })
 
 
@@ -0,0 +1,162 @@
+"""
+Pre-aggregated revenue per (day, zone, vehicle type).
+
+RevenueRollup holds the booking revenue, overstay revenue and counts of
+checked-out bookings, bucketed by the day of checked_out_at, so the revenue
+dashboard reads a few pre-aggregated rows instead of summing over the full
+booking history.
+
+The table is kept up to date incrementally: the Booking pre_save/post_save/
+post_delete receivers in api/signals.py compare what the booking contributed
+before and after the write (it only contributes once checked out, and its
+overstay_amount can change afterwards when an overstay payment is recorded)
+and move the difference in the same transaction. `rebuild()` recomputes the
+table from raw bookings; run it with `manage.py backfill_revenue_rollups`.
+"""
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+
+from .models import Booking, RevenueRollup
+
+ZERO = Decimal('0.00')
+
+
+def booking_contribution(booking):
+    """
+    The (day, zone, vehicle_type, booking revenue, overstay revenue) a booking
+    adds to the rollups, or None if it is not checked out.
+    """
+    if booking.status != 'checked_out' or booking.checked_out_at is None:
+        return None
+    parking_zone = booking.slot.parking_zone if booking.slot_id else ''
+    vehicle_type = booking.vehicle.vehicle_type if booking.vehicle_id else ''
+    return (
+        booking.checked_out_at.date(),
+        parking_zone,
+        vehicle_type,
+        Decimal(booking.total_price or 0),
+        Decimal(booking.overstay_amount or 0),
+    )
+
+
+def stored_contribution(pk):
+    """booking_contribution() for the row currently stored in the database"""
+    row = (
+        Booking.objects.filter(pk=pk, status='checked_out', checked_out_at__isnull=False)
+        .values_list('checked_out_at', 'slot__parking_zone', 'vehicle__vehicle_type', 'total_price', 'overstay_amount')
+        .first()
+    )
+    if row is None:
+        return None
+    checked_out_at, parking_zone, vehicle_type, total_price, overstay_amount = row
+    return (
+        checked_out_at.date(),
+        parking_zone or '',
+        vehicle_type or '',
+        Decimal(total_price or 0),
+        Decimal(overstay_amount or 0),
+    )
+
+
+def apply_contribution(contribution, sign):
+    """Add (sign=1) or remove (sign=-1) one booking's contribution"""
+    day, parking_zone, vehicle_type, booking_revenue, overstay_revenue = contribution
+    with transaction.atomic():
+        RevenueRollup.objects.bulk_create(
+            [RevenueRollup(day=day, parking_zone=parking_zone, vehicle_type=vehicle_type)],
+            ignore_conflicts=True,
+        )
+        RevenueRollup.objects.filter(day=day, parking_zone=parking_zone, vehicle_type=vehicle_type).update(
+            booking_revenue=F('booking_revenue') + sign * booking_revenue,
+            overstay_revenue=F('overstay_revenue') + sign * overstay_revenue,
+            booking_count=F('booking_count') + sign,
+            overstay_count=F('overstay_count') + (sign if overstay_revenue > 0 else 0),
+        )
+
+
+def move_booking(before, after):
+    """Move a booking's revenue from its old contribution to its new one"""
+    if before == after:
+        return
+    if before is not None:
+        apply_contribution(before, -1)
+    if after is not None:
+        apply_contribution(after, 1)
+
+
+def expected_rows():
+    """Recompute the rollups from checked-out bookings with one grouped query"""
+    rows = (
+        Booking.objects.filter(status='checked_out', checked_out_at__isnull=False)
+        .annotate(day=TruncDate('checked_out_at'))
+        .values('day', 'slot__parking_zone', 'vehicle__vehicle_type')
+        .annotate(
+            booking_revenue=Sum('total_price'),
+            overstay_revenue=Sum('overstay_amount'),
+            booking_count=Count('id'),
+            overstay_count=Count('id', filter=Q(overstay_amount__gt=0)),
+        )
+        .order_by()
+    )
+    expected = {}
+    for row in rows.iterator():
+        key = (row['day'], row['slot__parking_zone'] or '', row['vehicle__vehicle_type'] or '')
+        totals = expected.setdefault(key, [ZERO, ZERO, 0, 0])
+        totals[0] += row['booking_revenue'] or ZERO
+        totals[1] += row['overstay_revenue'] or ZERO
+        totals[2] += row['booking_count']
+        totals[3] += row['overstay_count']
+    return {key: tuple(totals) for key, totals in expected.items()}
+
+
+def rebuild(verify_only=False):
+    """
+    Compare the table against raw bookings and, unless verify_only, replace it.
+
+    The table is locked against the incremental writers while it is rebuilt,
+    so bookings checked out during the rebuild are counted exactly once.
+
+    Returns:
+        dict with the number of rows written and a list of mismatches as
+        (day, zone, vehicle_type, stored, expected) tuples, where stored and
+        expected are (booking revenue, overstay revenue, bookings, overstays)
+    """
+    with transaction.atomic():
+        if not verify_only:
+            with connection.cursor() as cursor:
+                cursor.execute(f'LOCK TABLE {RevenueRollup._meta.db_table} IN EXCLUSIVE MODE')
+
+        expected = expected_rows()
+        stored = {
+            (day, zone, vehicle_type): (booking_revenue, overstay_revenue, booking_count, overstay_count)
+            for day, zone, vehicle_type, booking_revenue, overstay_revenue, booking_count, overstay_count
+            in RevenueRollup.objects.exclude(booking_count=0).values_list(
+                'day', 'parking_zone', 'vehicle_type',
+                'booking_revenue', 'overstay_revenue', 'booking_count', 'overstay_count',
+            )
+        }
+        empty = (ZERO, ZERO, 0, 0)
+        mismatches = sorted(
+            key + (stored.get(key, empty), expected.get(key, empty))
+            for key in stored.keys() | expected.keys()
+            if stored.get(key, empty) != expected.get(key, empty)
+        )
+
+        if not verify_only:
+            RevenueRollup.objects.all().delete()
+            RevenueRollup.objects.bulk_create(
+                [
+                    RevenueRollup(
+                        day=day, parking_zone=zone, vehicle_type=vehicle_type,
+                        booking_revenue=totals[0], overstay_revenue=totals[1],
+                        booking_count=totals[2], overstay_count=totals[3],
+                    )
+                    for (day, zone, vehicle_type), totals in expected.items()
+                ],
+                batch_size=5000,
+            )
+
+    return {'rows': len(expected), 'mismatches': mismatches}
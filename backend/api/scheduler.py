@@ -53,6 +53,16 @@ def start_scheduler():
         replace_existing=True
     )
     
+    # Extend occupancy buckets hourly so new days roll into the horizon
+    from .occupancy import extend as extend_occupancy_buckets
+    scheduler.add_job(
+        extend_occupancy_buckets,
+        trigger=IntervalTrigger(hours=1),
+        id='occupancy_bucket_rebuild',
+        name='Extend Occupancy Buckets',
+        replace_existing=True
+    )
+    
     # Optional: Schedule booking reminders if tasks.py exists
     try:
         from .tasks import send_booking_reminders
@@ -1,9 +1,52 @@
 """
 Utility functions for generating and validating secret codes for check-in/check-out workflow.
+
+Codes are allocated from a database sequence that cycles through 0..999999
+and are passed through a keyed Feistel permutation of that keyspace, so
+consecutive check-ins get unrelated-looking codes. The sequence hands every
+value out once per cycle, so issuing a code needs no existence check and two
+concurrent check-ins can never receive the same code. After a full cycle
+codes are reused; by then the bookings that held them are long checked out,
+and the partial unique constraint on live codes (see Booking.Meta) guards
+the rare booking that is still parked a million check-ins later:
+save_with_secret_code() moves on to the next sequence value when it hits it.
 """
-import random
-import string
-from .models import Booking
+import hashlib
+import hmac
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+
+from .models import Booking, LIVE_SECRET_CODE_CONSTRAINT
+
+SECRET_CODE_SEQUENCE = 'api_booking_secret_code_seq'
+SECRET_CODE_DIGITS = 6
+_HALF_MODULUS = 10 ** (SECRET_CODE_DIGITS // 2)
+_FEISTEL_ROUNDS = 4
+# Live codes are a tiny share of the keyspace, so a few tries always find a free one
+MAX_SECRET_CODE_ATTEMPTS = 10
+
+
+def _round_value(round_number, half):
+    digest = hmac.new(
+        settings.SECRET_KEY.encode(),
+        f'secret-code:{round_number}:{half}'.encode(),
+        hashlib.sha256,
+    ).digest()
+    return int.from_bytes(digest[:8], 'big') % _HALF_MODULUS
+
+
+def permute_secret_code(value):
+    """
+    Map a sequence value in 0..999999 to a 6-digit code.
+
+    A balanced Feistel network over two 3-digit halves is a bijection on the
+    keyspace, so distinct sequence values always give distinct codes.
+    """
+    left, right = divmod(value, _HALF_MODULUS)
+    for round_number in range(_FEISTEL_ROUNDS):
+        left, right = right, (left + _round_value(round_number, right)) % _HALF_MODULUS
+    return f'{left * _HALF_MODULUS + right:0{SECRET_CODE_DIGITS}d}'
 
 
 def generate_unique_secret_code():
@@ -13,23 +56,36 @@ def generate_unique_secret_code():
     Returns:
         str: A unique 6-digit code
     """
-    max_attempts = 100
-    
-    for _ in range(max_attempts):
-        # Generate 6-digit numeric code
-        code = ''.join(random.choices(string.digits, k=6))
-        
-        # Ensure uniqueness
-        if not Booking.objects.filter(secret_code=code).exists():
-            return code
-    
-    # Fallback: use alphanumeric if too many collisions
-    for _ in range(max_attempts):
-        code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-        if not Booking.objects.filter(secret_code=code).exists():
-            return code
-    
-    raise ValueError("Unable to generate unique secret code after multiple attempts")
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT nextval(%s)', [SECRET_CODE_SEQUENCE])
+        value = cursor.fetchone()[0]
+    return permute_secret_code(value)
+
+
+def save_with_secret_code(booking, **save_kwargs):
+    """
+    Give the booking a new secret code and save it.
+
+    A recycled code still held by a live booking violates the partial
+    unique constraint; the save is then retried, inside a savepoint, with
+    the next code from the sequence.
+
+    Args:
+        booking: Booking to save; its other changes are saved with the code
+        **save_kwargs: Passed to booking.save()
+
+    Returns:
+        str: The code the booking was saved with
+    """
+    for attempt in range(MAX_SECRET_CODE_ATTEMPTS):
+        booking.secret_code = generate_unique_secret_code()
+        try:
+            with transaction.atomic():
+                booking.save(**save_kwargs)
+            return booking.secret_code
+        except IntegrityError as e:
+            if LIVE_SECRET_CODE_CONSTRAINT not in str(e) or attempt == MAX_SECRET_CODE_ATTEMPTS - 1:
+                raise
 
 
 def validate_secret_code(booking_id, secret_code):
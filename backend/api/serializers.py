@@ -1,6 +1,10 @@
 from rest_framework import serializers
-from .models import User, ParkingSlot, Booking, ParkingLot, Vehicle, Notification, AuditLog, AccessLog, PricingRate, ZonePricingRate
+from .models import (
+    User, ParkingSlot, Booking, ParkingLot, Vehicle, Notification, AuditLog, AccessLog, PricingRate, ZonePricingRate,
+    ExportJob,
+)
 from datetime import timedelta
+from django.urls import reverse
 from django.utils import timezone
 
 
@@ -89,6 +93,14 @@ from .models import User, ParkingSlot, Booking, ParkingLot, Vehicle, Notificatio
 from datetime import timedelta
 from django.utils import timezone
 from .pricing import calculate_booking_price, calculate_extension_price
+from .booking_conflicts import (
+    BookingConflictError,
+    ensure_slot_available,
+    find_alternative_slots,
+    get_extension_limit,
+    is_slot_available,
+    slot_write_lock,
+)
 
 class PricingRateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -151,63 +163,38 @@ class BookingSerializer(serializers.ModelSerializer):
 
         # Check if the slot is already occupied
         if slot.is_occupied:
-            # Import here to avoid circular imports
-            from .utils import find_alternative_slots
-            
-            # Find alternative time slots
-            alternatives = find_alternative_slots(slot, start_time, end_time)
-            
-            # Format alternatives for better display
-            formatted_alternatives = []
-            for alt in alternatives:
-                formatted_alternatives.append({
-                    'start_time': alt['start_time'].strftime('%Y-%m-%d %H:%M'),
-                    'end_time': alt['end_time'].strftime('%Y-%m-%d %H:%M'),
-                    'message': alt.get('message', 'Available slot')
-                })
-            
-            # Custom error with suggestions
-            error_msg = {
-                'error': "This parking slot is already occupied.",
-                'alternative_slots': formatted_alternatives
-            }
-            
-            raise serializers.ValidationError(error_msg)
+            self.raise_conflict("This parking slot is already occupied.", slot, start_time, end_time)
 
         # Check for booking conflicts
-        conflicting_bookings = Booking.objects.filter(
-            slot=slot,
-            start_time__lt=end_time,
-            end_time__gt=start_time,
-            is_active=True
-        ).exclude(pk=self.instance.pk if self.instance else None)
-
-        if conflicting_bookings.exists():
-            # Import here to avoid circular imports
-            from .utils import find_alternative_slots
-            
-            # Find alternative time slots
-            alternatives = find_alternative_slots(slot, start_time, end_time)
-            
-            # Format alternatives for better display
-            formatted_alternatives = []
-            for alt in alternatives:
-                formatted_alternatives.append({
-                    'start_time': alt['start_time'].strftime('%Y-%m-%d %H:%M'),
-                    'end_time': alt['end_time'].strftime('%Y-%m-%d %H:%M'),
-                    'message': alt.get('message', 'Available slot')
-                })
-            
-            # Custom error with suggestions
-            error_msg = {
-                'error': "This time slot is already booked.",
-                'alternative_slots': formatted_alternatives
-            }
-            
-            raise serializers.ValidationError(error_msg)
+        if not is_slot_available(slot, start_time, end_time, exclude=self.instance):
+            self.raise_conflict("This time slot is already booked.", slot, start_time, end_time)
 
         return data
 
+    def raise_conflict(self, message, slot, start_time, end_time):
+        """Raise a validation error carrying alternative time suggestions"""
+        # Find alternative time slots on this slot and its siblings
+        alternatives = find_alternative_slots(slot, start_time, end_time)
+        
+        # Format alternatives for better display
+        formatted_alternatives = []
+        for alt in alternatives:
+            formatted_alternatives.append({
+                'slot_id': str(alt['slot_id']),
+                'slot_number': alt['slot_number'],
+                'start_time': alt['start_time'].strftime('%Y-%m-%d %H:%M'),
+                'end_time': alt['end_time'].strftime('%Y-%m-%d %H:%M'),
+                'message': alt.get('message', 'Available slot')
+            })
+        
+        # Custom error with suggestions
+        error_msg = {
+            'error': message,
+            'alternative_slots': formatted_alternatives
+        }
+        
+        raise serializers.ValidationError(error_msg)
+
     def create(self, validated_data):
         user = self.context['request'].user
         vehicle_data = validated_data.pop('vehicle', None)
@@ -236,20 +223,30 @@ class BookingSerializer(serializers.ModelSerializer):
         start_time = validated_data.get('start_time')
         end_time = validated_data.get('end_time')
         
-        # Calculate price
-        total_price = calculate_booking_price(start_time, end_time, vehicle.vehicle_type)
-        
-        booking = Booking.objects.create(
-            user=user,
-            vehicle=vehicle,
-            total_price=total_price,
-            **validated_data
+        slot = validated_data.get('slot')
+
+        # Calculate price (zone rates and occupancy-based dynamic pricing apply)
+        total_price = calculate_booking_price(
+            start_time, end_time, vehicle.vehicle_type,
+            parking_zone=slot.parking_zone, parking_lot_id=slot.parking_lot_id
         )
         
-        # Mark the slot as occupied
-        slot = validated_data.get('slot')
-        slot.is_occupied = True
-        slot.save()
+        try:
+            # Re-check under the slot lock so concurrent requests cannot both pass
+            with slot_write_lock(slot):
+                ensure_slot_available(slot, start_time, end_time)
+                booking = Booking.objects.create(
+                    user=user,
+                    vehicle=vehicle,
+                    total_price=total_price,
+                    **validated_data
+                )
+                
+                # Mark the slot as occupied
+                slot.is_occupied = True
+                slot.save()
+        except BookingConflictError as e:
+            self.raise_conflict(str(e), slot, start_time, end_time)
         
         return booking
 
@@ -261,16 +258,14 @@ class ExtendBookingSerializer(serializers.Serializer):
         if value <= booking.end_time:
             raise serializers.ValidationError("New end time must be after the current end time.")
         
-        # Check for conflicts
-        conflicting = Booking.objects.filter(
-            slot=booking.slot,
-            start_time__lt=value,
-            end_time__gt=booking.end_time,
-            is_active=True
-        ).exclude(pk=booking.pk).exists()
+        # Check for conflicts: the booking can grow up to the next booking's start
+        latest_end_time = get_extension_limit(booking)
         
-        if conflicting:
-            raise serializers.ValidationError("Cannot extend, slot is booked by another user.")
+        if latest_end_time is not None and value > latest_end_time:
+            raise serializers.ValidationError(
+                f"Cannot extend, slot is booked by another user. "
+                f"Latest available end time is {latest_end_time.strftime('%Y-%m-%d %H:%M')}."
+            )
             
         return value
 
@@ -278,6 +273,11 @@ class PricePreviewSerializer(serializers.Serializer):
     start_time = serializers.DateTimeField()
     end_time = serializers.DateTimeField()
     vehicle_type = serializers.CharField()
+    # Optional: price for a specific slot, including its zone rate and the
+    # occupancy-based multiplier of its parking lot
+    slot_id = serializers.PrimaryKeyRelatedField(
+        queryset=ParkingSlot.objects.all(), source='slot', required=False
+    )
 
     def validate(self, data):
         if data['start_time'] >= data['end_time']:
@@ -285,6 +285,36 @@ class PricePreviewSerializer(serializers.Serializer):
         return data
 
 
+class SlotAvailabilitySearchSerializer(serializers.Serializer):
+    """
+    Query parameters for the time-window availability search
+    """
+    zone = serializers.ChoiceField(choices=ParkingSlot.PARKING_ZONE_CHOICES, required=False)
+    vehicle_type = serializers.ChoiceField(choices=ParkingSlot.VEHICLE_TYPE_CHOICES, required=False)
+    start = serializers.DateTimeField()
+    end = serializers.DateTimeField()
+    page = serializers.IntegerField(min_value=1, default=1)
+    page_size = serializers.IntegerField(min_value=1, max_value=100, default=20)
+
+    def validate(self, data):
+        if data['start'] >= data['end']:
+            raise serializers.ValidationError("End time must be after start time.")
+        return data
+
+
+class AvailableSlotSerializer(serializers.ModelSerializer):
+    """
+    Flat slot representation for availability search results
+    """
+    id = serializers.CharField(read_only=True)
+    parking_lot_name = serializers.CharField(source='parking_lot.name', read_only=True, default=None)
+    parking_zone_display = serializers.CharField(source='get_parking_zone_display', read_only=True)
+
+    class Meta:
+        model = ParkingSlot
+        fields = ['id', 'slot_number', 'floor', 'section', 'vehicle_type', 'parking_lot_name', 'parking_zone', 'parking_zone_display']
+
+
 class NotificationSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     
@@ -1133,3 +1163,25 @@ class ZonePricingRateBulkUpdateSerializer(serializers.Serializer):
         if not value:
             raise serializers.ValidationError("At least one rate must be provided")
         return value
+
+
+class ExportJobSerializer(serializers.ModelSerializer):
+    """Serializer for background export jobs"""
+    download_url = serializers.SerializerMethodField()
+    requested_by = serializers.CharField(source='requested_by.username', read_only=True, default=None)
+
+    class Meta:
+        model = ExportJob
+        fields = [
+            'id', 'dataset', 'file_format', 'filters', 'status', 'requested_by',
+            'row_count', 'file_size', 'error_message', 'download_url',
+            'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
+
+    def get_download_url(self, obj):
+        if obj.status != 'completed':
+            return None
+        request = self.context.get('request')
+        url = reverse('export-job-download', args=[obj.pk])
+        return request.build_absolute_uri(url) if request else url
@@ -1,9 +1,19 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 from django.contrib.auth.tokens import default_token_generator
+from django.db import transaction
 from django.utils.crypto import get_random_string
 
+from . import (
+    availability_index, checkin_rollup, event_bus, geofences, live_occupancy, location_availability, lot_search,
+    notification_counter, occupancy, occupancy_snapshot, pricing_engine, revenue_rollup, slot_locator, user_stats,
+)
+from .models import (
+    AuditLog, Booking, BroadcastNotification, DynamicPricingRule, Geofence, Notification, ParkingLot, ParkingSlot,
+    PricingRate, PublicHoliday, ZonePricingRate,
+)
+
 User = get_user_model()
 
 @receiver(post_save, sender=User)
@@ -15,3 +25,300 @@ def create_email_verification_token(sender, instance=None, created=False, **kwar
         # Generate a random token for email verification
         instance.email_verification_token = default_token_generator.make_token(instance)
         instance.save(update_fields=['email_verification_token'])
+
+
+@receiver(pre_save, sender=Booking)
+def remember_booking_window(sender, instance, raw=False, **kwargs):
+    """
+    Capture the window a booking occupied before this save so post_save can
+    update the occupancy buckets incrementally
+    """
+    if raw:
+        return
+    instance._occupancy_before = occupancy.stored_booking_window(instance.pk) if instance.pk else None
+
+
+@receiver(post_save, sender=Booking)
+def update_occupancy_on_save(sender, instance, raw=False, **kwargs):
+    """
+    Move the booking between occupancy buckets when it is created, cancelled,
+    extended or checked out
+    """
+    if raw:
+        return
+    occupancy.move_booking(getattr(instance, '_occupancy_before', None), occupancy.booking_window(instance))
+
+
+@receiver(post_delete, sender=Booking)
+def update_occupancy_on_delete(sender, instance, **kwargs):
+    """Release the buckets of a deleted booking"""
+    occupancy.move_booking(occupancy.booking_window(instance), None)
+
+
+@receiver(pre_save, sender=Booking)
+def remember_booking_revenue(sender, instance, raw=False, **kwargs):
+    """
+    Capture what a booking contributed to the revenue rollups before this
+    save so post_save can apply the difference
+    """
+    if raw:
+        return
+    instance._revenue_before = revenue_rollup.stored_contribution(instance.pk) if instance.pk else None
+
+
+@receiver(post_save, sender=Booking)
+def update_revenue_on_save(sender, instance, raw=False, **kwargs):
+    """
+    Roll a booking's revenue up when it is checked out, and adjust it when an
+    overstay payment or price change is recorded afterwards
+    """
+    if raw:
+        return
+    revenue_rollup.move_booking(
+        getattr(instance, '_revenue_before', None), revenue_rollup.booking_contribution(instance)
+    )
+
+
+@receiver(post_delete, sender=Booking)
+def update_revenue_on_delete(sender, instance, **kwargs):
+    """Remove a deleted booking's revenue from the rollups"""
+    revenue_rollup.move_booking(revenue_rollup.booking_contribution(instance), None)
+
+
+@receiver(pre_save, sender=Booking)
+@receiver(pre_delete, sender=Booking)
+def remember_booking_user_stats(sender, instance, raw=False, **kwargs):
+    """
+    Capture what a booking contributed to its user's stats before this save
+    or delete so the post_ receivers can apply the difference
+    """
+    if raw:
+        return
+    instance._user_stats_before = user_stats.stored_contribution(instance.pk) if instance.pk else None
+
+
+@receiver(post_save, sender=Booking)
+def update_user_stats_on_save(sender, instance, raw=False, **kwargs):
+    """Move a booking's contribution to its user's stats in the same transaction"""
+    if raw:
+        return
+    user_stats.move_booking(
+        getattr(instance, '_user_stats_before', None), user_stats.stored_contribution(instance.pk)
+    )
+
+
+@receiver(post_delete, sender=Booking)
+def update_user_stats_on_delete(sender, instance, **kwargs):
+    """Remove a deleted booking from its user's stats"""
+    user_stats.move_booking(getattr(instance, '_user_stats_before', None), None)
+
+
+@receiver(pre_save, sender=Notification)
+@receiver(pre_delete, sender=Notification)
+def remember_notification_state(sender, instance, raw=False, **kwargs):
+    """Capture the notification's owner and unread state before this save or delete"""
+    if raw:
+        return
+    instance._unread_before = notification_counter.stored_state(instance.pk) if instance.pk else None
+
+
+@receiver(post_save, sender=Notification)
+def update_notification_counter_on_save(sender, instance, raw=False, **kwargs):
+    """Keep the owner's unread counter in step with the save, in the same transaction"""
+    if raw:
+        return
+    notification_counter.move(
+        getattr(instance, '_unread_before', None), (instance.user_id, not instance.is_read)
+    )
+
+
+@receiver(post_delete, sender=Notification)
+def update_notification_counter_on_delete(sender, instance, **kwargs):
+    notification_counter.move(getattr(instance, '_unread_before', None), None)
+
+
+@receiver(post_save, sender=Notification)
+def publish_notification(sender, instance, created=False, raw=False, **kwargs):
+    """Push new notifications to the owner's open event streams"""
+    if raw or not created:
+        return
+    event_bus.notification_created(instance)
+
+
+@receiver(post_save, sender=BroadcastNotification)
+def publish_broadcast(sender, instance, created=False, raw=False, **kwargs):
+    if raw or not created:
+        return
+    event_bus.broadcast_created(instance)
+
+
+@receiver(pre_save, sender=AuditLog)
+def stamp_checkin_rollup(sender, instance, raw=False, **kwargs):
+    """
+    Store what a new check-in/check-out audit log is rolled up under, so
+    later changes to its booking do not move it between rollups
+    """
+    if raw or instance.pk is not None:
+        return
+    checkin_rollup.stamp(instance)
+
+
+@receiver(post_save, sender=AuditLog)
+def update_checkin_rollup_on_save(sender, instance, created=False, raw=False, **kwargs):
+    """Count a new check-in/check-out audit log in the hourly rollups"""
+    if raw or not created:
+        return
+    contribution = checkin_rollup.log_contribution(instance)
+    if contribution is not None:
+        checkin_rollup.apply_contribution(contribution, 1)
+
+
+@receiver(post_delete, sender=AuditLog)
+def update_checkin_rollup_on_delete(sender, instance, **kwargs):
+    """Remove a deleted audit log from the hourly rollups"""
+    contribution = checkin_rollup.log_contribution(instance)
+    if contribution is not None:
+        checkin_rollup.apply_contribution(contribution, -1)
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+@receiver(post_save, sender=ParkingSlot)
+@receiver(post_delete, sender=ParkingSlot)
+def invalidate_availability_index(sender, instance, **kwargs):
+    """
+    Tell in-process availability indexes which slot's bookings changed (or
+    make them rebuild after a slot write) and drop the cached per-zone
+    availability counts and occupancy snapshot
+    """
+    if sender is Booking:
+        slot_ids = [instance.slot_id]
+        transaction.on_commit(lambda: availability_index.bump_version(slot_ids))
+    else:
+        transaction.on_commit(availability_index.bump_version)
+    transaction.on_commit(location_availability.invalidate)
+    transaction.on_commit(occupancy_snapshot.bump_version)
+
+
+@receiver(post_save, sender=PricingRate)
+@receiver(post_delete, sender=PricingRate)
+@receiver(post_save, sender=ZonePricingRate)
+@receiver(post_delete, sender=ZonePricingRate)
+@receiver(post_save, sender=DynamicPricingRule)
+@receiver(post_delete, sender=DynamicPricingRule)
+@receiver(post_save, sender=PublicHoliday)
+@receiver(post_delete, sender=PublicHoliday)
+def invalidate_pricing_table(sender, **kwargs):
+    """
+    Rebuild pricing tables once the rule change is committed, so no process
+    can cache the old rules under the new version
+    """
+    transaction.on_commit(pricing_engine.bump_version)
+
+
+@receiver(post_save, sender=Geofence)
+@receiver(post_delete, sender=Geofence)
+def invalidate_geofence_registry(sender, **kwargs):
+    """Rebuild geofence registries once the change is committed"""
+    transaction.on_commit(geofences.bump_version)
+
+
+@receiver(post_save, sender=ParkingLot)
+@receiver(post_delete, sender=ParkingLot)
+def invalidate_lot_search_index(sender, **kwargs):
+    """Rebuild in-memory lot search indexes once the change is committed"""
+    transaction.on_commit(lot_search.bump_version)
+
+
+@receiver(post_init, sender=ParkingSlot)
+def remember_slot_state(sender, instance, **kwargs):
+    """Remember what a loaded slot contributes to the live occupancy counters"""
+    if {'parking_lot_id', 'parking_zone', 'is_occupied'} & instance.get_deferred_fields():
+        instance._live_occupancy_before = None
+    elif instance.pk is None:
+        instance._live_occupancy_before = None
+    else:
+        instance._live_occupancy_before = live_occupancy.slot_state(instance)
+
+
+@receiver(post_save, sender=ParkingSlot)
+def update_live_occupancy_on_save(sender, instance, created=False, raw=False, **kwargs):
+    """Keep the cached lot and zone occupancy counters in step with slot saves"""
+    if raw:
+        return
+    before = None if created else getattr(instance, '_live_occupancy_before', None)
+    if before is None and not created:
+        # State before the save is unknown (deferred fields); let the next read recount
+        return
+    after = live_occupancy.slot_state(instance)
+    transaction.on_commit(lambda: live_occupancy.move_slot(before, after))
+    instance._live_occupancy_before = after
+
+
+@receiver(post_delete, sender=ParkingSlot)
+def update_live_occupancy_on_delete(sender, instance, **kwargs):
+    before = live_occupancy.slot_state(instance)
+    transaction.on_commit(lambda: live_occupancy.move_slot(before, None))
+
+
+@receiver(post_save, sender=ParkingSlot)
+def update_slot_locator_on_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Log the slot's new free/occupied state for the k-nearest free slot index"""
+    if raw:
+        return
+    if update_fields is not None and not set(update_fields) & {
+        'is_occupied', 'vehicle_type', 'parking_zone', 'floor', 'pos_x', 'pos_y'
+    }:
+        return
+    changes = {instance.pk: slot_locator.slot_state(instance)}
+    transaction.on_commit(lambda: slot_locator.record_changes(changes))
+
+
+@receiver(post_delete, sender=ParkingSlot)
+def update_slot_locator_on_delete(sender, instance, **kwargs):
+    changes = {instance.pk: None}
+    transaction.on_commit(lambda: slot_locator.record_changes(changes))
+
+
+@receiver(post_save, sender=ParkingSlot)
+def publish_slot_change(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Push slot occupancy and placement changes to open event streams"""
+    if raw:
+        return
+    if update_fields is not None and not set(update_fields) & {
+        'is_occupied', 'vehicle_type', 'parking_zone', 'parking_lot'
+    }:
+        return
+    event_bus.slot_changed(instance)
+
+
+@receiver(post_save, sender=Booking)
+def publish_booking_change(sender, instance, raw=False, **kwargs):
+    """Push booking status changes, which change the slot dashboards, to open event streams"""
+    if raw:
+        return
+    event_bus.booking_changed(instance)
+
+
+@receiver(post_delete, sender=Booking)
+def publish_booking_delete(sender, instance, **kwargs):
+    event_bus.booking_changed(instance, deleted=True)
+
+
+def on_bookings_created(bookings, occupied_slot_ids=()):
+    """
+    Side effects of the Booking and ParkingSlot receivers above for bookings
+    written with bulk_create() and slots marked occupied with update(), which
+    send no signals. Call it inside the transaction that wrote them; anything
+    kept in step with booking or slot saves must be updated here too.
+    """
+    slot_ids = sorted({booking.slot_id for booking in bookings} | set(occupied_slot_ids))
+    occupancy.add_bookings(bookings)
+    user_stats.add_bookings(bookings)
+    if occupied_slot_ids:
+        event_bus.slots_occupied(occupied_slot_ids, True)
+    transaction.on_commit(lambda: availability_index.bump_version(slot_ids))
+    transaction.on_commit(location_availability.invalidate)
+    transaction.on_commit(occupancy_snapshot.bump_version)
+    transaction.on_commit(live_occupancy.invalidate)
+    transaction.on_commit(lambda: slot_locator.record_changes(dict.fromkeys(slot_ids)))
@@ -0,0 +1,228 @@
+"""
+k-nearest free slot index.
+
+Free slots are kept per (vehicle_type, parking_zone, floor) partition in a
+uniform grid over (pos_x, pos_y) with SLOT_LOCATOR_CELL_SIZE cells. A query
+walks square rings of cells outwards from the query point, clipped to the
+cells that hold slots, and stops as soon as k slots are found that no
+unvisited cell can beat, so it touches a handful of cells instead of every
+free slot.
+
+The index is kept current incrementally, also across processes: every
+ParkingSlot write appends (slot_id, state) to a short change log in the
+default cache under an increasing sequence number (see the receivers in
+api/signals.py). Before answering, a process replays the entries it has not
+seen yet; only if it is too far behind, or an entry has expired, does it
+rebuild from one query. The partitions are also rebuilt every
+SLOT_LOCATOR_MAX_AGE seconds, which drops anything a queryset.update()
+changed without a log entry.
+"""
+import heapq
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import ParkingSlot
+
+SEQUENCE_CACHE_KEY = 'slot_locator_seq'
+CHANGE_TIMEOUT = 3600
+MAX_REPLAY = 1000
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def _change_key(seq):
+    return f'slot_locator_change:{seq}'
+
+
+def _cell_size():
+    return getattr(settings, 'SLOT_LOCATOR_CELL_SIZE', 10)
+
+
+def slot_state(slot):
+    """
+    The (vehicle_type, parking_zone, floor, pos_x, pos_y) a free slot is
+    indexed under, or None if it is occupied
+    """
+    if slot.is_occupied:
+        return None
+    return (slot.vehicle_type, slot.parking_zone, slot.floor, slot.pos_x, slot.pos_y)
+
+
+def record_changes(changes):
+    """
+    Append slot states to the change log.
+
+    Args:
+        changes: dict mapping slot id to slot_state() (None when the slot is
+            occupied or deleted)
+    """
+    if not changes:
+        return
+    try:
+        last = cache.incr(SEQUENCE_CACHE_KEY, len(changes))
+    except ValueError:
+        cache.add(SEQUENCE_CACHE_KEY, 0, timeout=None)
+        last = cache.incr(SEQUENCE_CACHE_KEY, len(changes))
+    first = last - len(changes) + 1
+    cache.set_many(
+        {_change_key(seq): change for seq, change in zip(range(first, last + 1), changes.items())},
+        CHANGE_TIMEOUT,
+    )
+
+
+class Partition:
+    """Grid of the free slots that share a vehicle type, zone and floor"""
+
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.bounds = None  # (min_col, max_col, min_row, max_row) of any cell ever used
+
+    def cell(self, x, y):
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    def add(self, slot_id, x, y):
+        col, row = self.cell(x, y)
+        self.cells.setdefault((col, row), {})[slot_id] = (x, y)
+        if self.bounds is None:
+            self.bounds = (col, col, row, row)
+        else:
+            min_col, max_col, min_row, max_row = self.bounds
+            self.bounds = (min(min_col, col), max(max_col, col), min(min_row, row), max(max_row, row))
+
+    def remove(self, slot_id, x, y):
+        key = self.cell(x, y)
+        members = self.cells.get(key)
+        if members is not None:
+            members.pop(slot_id, None)
+            if not members:
+                del self.cells[key]
+
+    def _ring(self, col, row, radius):
+        """Cells at Chebyshev distance `radius` from (col, row), clipped to bounds"""
+        min_col, max_col, min_row, max_row = self.bounds
+        for r in range(max(row - radius, min_row), min(row + radius, max_row) + 1):
+            if abs(r - row) == radius:
+                for c in range(max(col - radius, min_col), min(col + radius, max_col) + 1):
+                    yield (c, r)
+            else:
+                for c in (col - radius, col + radius):
+                    if min_col <= c <= max_col:
+                        yield (c, r)
+
+    def nearest(self, x, y, k):
+        """Up to k (distance, slot_id) pairs, nearest first"""
+        if not self.cells or k <= 0:
+            return []
+        col, row = self.cell(x, y)
+        min_col, max_col, min_row, max_row = self.bounds
+        # Rings closer than the bounding box are empty; the farthest ring that
+        # can hold a slot touches the far corner of the box
+        first = max(min_col - col, col - max_col, min_row - row, row - max_row, 0)
+        last = max(abs(col - min_col), abs(col - max_col), abs(row - min_row), abs(row - max_row))
+
+        best = []  # max-heap of (-distance, slot_id)
+        for radius in range(first, last + 1):
+            for key in self._ring(col, row, radius):
+                for slot_id, (sx, sy) in self.cells.get(key, {}).items():
+                    item = (-math.hypot(sx - x, sy - y), slot_id)
+                    if len(best) < k:
+                        heapq.heappush(best, item)
+                    elif item > best[0]:
+                        heapq.heapreplace(best, item)
+            # Every slot in a later ring is at least radius cells away
+            if len(best) == k and -best[0][0] <= radius * self.cell_size:
+                break
+        return sorted((-d, slot_id) for d, slot_id in best)
+
+
+class FreeSlotIndex:
+    """Free slots by partition, with the change log position it reflects"""
+
+    def __init__(self, seq, cell_size):
+        self.seq = seq
+        self.cell_size = cell_size
+        self.built_at = time.monotonic()
+        self.partitions = {}
+        self.states = {}
+
+    @classmethod
+    def build(cls):
+        # Read the sequence first: changes committed during the query are
+        # replayed on top, and replaying a state is idempotent
+        index = cls(cache.get(SEQUENCE_CACHE_KEY, 0), _cell_size())
+        rows = ParkingSlot.objects.filter(is_occupied=False).values_list(
+            'pk', 'vehicle_type', 'parking_zone', 'floor', 'pos_x', 'pos_y'
+        )
+        for slot_id, *state in rows.iterator():
+            index.apply(slot_id, tuple(state))
+        return index
+
+    def apply(self, slot_id, state):
+        old = self.states.pop(slot_id, None)
+        if old is not None:
+            self.partitions[old[:3]].remove(slot_id, old[3], old[4])
+        if state is not None:
+            partition = self.partitions.get(state[:3])
+            if partition is None:
+                partition = self.partitions[state[:3]] = Partition(self.cell_size)
+            partition.add(slot_id, state[3], state[4])
+            self.states[slot_id] = state
+
+    def catch_up(self):
+        """
+        Replay the change log up to its current end.
+
+        Returns:
+            False if entries are missing and the index must be rebuilt
+        """
+        latest = cache.get(SEQUENCE_CACHE_KEY, 0)
+        if latest == self.seq:
+            return True
+        if latest < self.seq or latest - self.seq > MAX_REPLAY:
+            return False
+        keys = [_change_key(seq) for seq in range(self.seq + 1, latest + 1)]
+        changes = cache.get_many(keys)
+        if len(changes) != len(keys):
+            return False
+        for key in keys:
+            self.apply(*changes[key])
+        self.seq = latest
+        return True
+
+    def nearest(self, x, y, k=1, vehicle_types=None, parking_zone=None, floor=None):
+        """
+        The k free slots nearest to (x, y) by Euclidean distance.
+
+        Args:
+            vehicle_types: Slot vehicle types to consider, or None for all
+            parking_zone, floor: Optional filters
+
+        Returns:
+            list of (distance, slot_id), nearest first
+        """
+        results = []
+        for (vehicle_type, zone, slot_floor), partition in self.partitions.items():
+            if vehicle_types is not None and vehicle_type not in vehicle_types:
+                continue
+            if parking_zone is not None and zone != parking_zone:
+                continue
+            if floor is not None and slot_floor != floor:
+                continue
+            results.extend(partition.nearest(x, y, k))
+        return heapq.nsmallest(k, results)
+
+
+def nearest_free_slots(x, y, k=1, vehicle_types=None, parking_zone=None, floor=None):
+    """FreeSlotIndex.nearest() on the process-wide index, brought up to date first"""
+    global _index
+    max_age = getattr(settings, 'SLOT_LOCATOR_MAX_AGE', 60)
+    with _index_lock:
+        if _index is None or time.monotonic() - _index.built_at >= max_age or not _index.catch_up():
+            _index = FreeSlotIndex.build()
+        return _index.nearest(x, y, k, vehicle_types, parking_zone, floor)
@@ -2,6 +2,7 @@ from django.db.models import Count, Q
 from rest_framework import views, status, permissions
 from rest_framework.response import Response
 from .models import ParkingSlot, Booking
+from .occupancy_snapshot import get_snapshot
 from .serializers import ParkingSlotSerializer
 from datetime import datetime
 
@@ -13,9 +14,10 @@ class SlotStatisticsView(views.APIView):
 
     def get(self, request):
         # Get counts of total, occupied and free slots
-        total_slots = ParkingSlot.objects.count()
-        occupied_slots = ParkingSlot.objects.filter(is_occupied=True).count()
-        free_slots = total_slots - occupied_slots
+        counts = get_snapshot().counts()
+        total_slots = counts['total']
+        occupied_slots = counts['occupied']
+        free_slots = counts['available']
         
         # Calculate occupancy rate as a percentage
         occupancy_rate = 0
@@ -52,12 +54,12 @@ class DetailedSlotStatusView(views.APIView):
         active_bookings = Booking.objects.filter(
             status__in=['active', 'confirmed', 'checked_in'],
             slot__in=slots.filter(is_occupied=True)
-        )
+        ).select_related('user', 'vehicle')
         
         # Create a mapping of slot IDs to their bookings
         booking_map = {}
         for booking in active_bookings:
-            booking_map[booking.slot.id] = {
+            booking_map[booking.slot_id] = {
                 'user_id': booking.user.id,
                 'user_name': f"{booking.user.first_name} {booking.user.last_name}",
                 'vehicle_no': booking.vehicle.number_plate if booking.vehicle else None,
@@ -2,6 +2,7 @@ from django.utils import timezone
 from datetime import timedelta
 from .models import Booking, Notification
 from .pricing import calculate_extension_price
+from .booking_conflicts import BookingConflictError, ensure_slot_available, get_extension_limit, slot_write_lock
 
 # Temporarily commented out due to compatibility issues
 # from background_task import background
@@ -136,12 +137,31 @@ def process_overstayed_bookings():
         new_end_time = booking.end_time + timedelta(minutes=30)
         
         # Check for conflicts before extending
-        conflicting = Booking.objects.filter(
-            slot=booking.slot,
-            start_time__lt=new_end_time,
-            end_time__gt=booking.end_time,
-            is_active=True
-        ).exclude(pk=booking.pk).exists()
+        limit = get_extension_limit(booking)
+        conflicting = limit is not None and limit < new_end_time
+        
+        if not conflicting:
+            # Calculate extension price
+            extension_price = calculate_extension_price(booking, new_end_time)
+            
+            try:
+                # Re-check under the slot lock; a customer booking may land concurrently
+                with slot_write_lock(booking.slot):
+                    ensure_slot_available(booking.slot, booking.end_time, new_end_time, exclude=booking)
+                    
+                    # Update booking
+                    booking.end_time = new_end_time
+                    booking.total_price += extension_price
+                    booking.extension_count += 1
+                    booking.extension_history.append({
+                        'extended_at': timezone.now().isoformat(),
+                        'new_end_time': new_end_time.isoformat(),
+                        'additional_cost': str(extension_price),
+                        'type': 'auto'
+                    })
+                    booking.save()
+            except BookingConflictError:
+                conflicting = True
         
         if conflicting:
             # Cannot extend, notify user and admin
@@ -155,21 +175,6 @@ def process_overstayed_bookings():
             # (Implementation for admin notification can be added here)
             print(f"Could not extend booking {booking.id} due to conflict.")
             continue
-
-        # Calculate extension price
-        extension_price = calculate_extension_price(booking, new_end_time)
-        
-        # Update booking
-        booking.end_time = new_end_time
-        booking.total_price += extension_price
-        booking.extension_count += 1
-        booking.extension_history.append({
-            'extended_at': timezone.now().isoformat(),
-            'new_end_time': new_end_time.isoformat(),
-            'additional_cost': str(extension_price),
-            'type': 'auto'
-        })
-        booking.save()
         
         # Notify user with enhanced notification
         from .notification_utils import create_booking_extension_notification
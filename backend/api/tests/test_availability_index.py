@@ -0,0 +1,107 @@
+"""
+The in-process availability index must agree with the database-backed
+free_slots() filter.
+"""
+from datetime import timedelta
+from unittest import mock, skipIf
+
+from django.test import TestCase
+from django.utils import timezone
+
+from api import availability_index
+from api.availability_index import RESOLUTION, SlotAvailabilityIndex, free_slots_from_index, np
+from api.booking_conflicts import free_slots
+from api.models import Booking, ParkingSlot, User
+
+
+@skipIf(np is None, 'NumPy is not installed')
+class AvailabilityIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.origin = now.replace(minute=now.minute - now.minute % 5, second=0, microsecond=0)
+        cls.user = User.objects.create_user(username='index', email='index@example.com', password='x')
+        cls.slots = [
+            ParkingSlot.objects.create(slot_number=f'I{i}', floor='1', section='A') for i in range(6)
+        ]
+        t = cls.origin
+        # (slot, start offset, end offset, is_active), with unaligned edges and touching windows
+        for slot, start, end, active in (
+            (0, timedelta(hours=1), timedelta(hours=2), True),
+            (0, timedelta(hours=2), timedelta(hours=3, minutes=7), True),
+            (1, timedelta(minutes=32), timedelta(hours=1, minutes=3), True),
+            (2, timedelta(hours=4), timedelta(hours=30), True),
+            (3, timedelta(hours=1), timedelta(hours=5), False),
+            (4, -timedelta(hours=3), timedelta(minutes=11), True),
+        ):
+            Booking.objects.create(
+                user=cls.user, slot=cls.slots[slot], start_time=t + start, end_time=t + end, is_active=active,
+            )
+
+    def windows(self, step):
+        for first in range(0, 8 * 60, step):
+            for length in (5, 15, 30, 60, 90, 240):
+                start = self.origin + timedelta(minutes=first + 5)
+                yield start, start + timedelta(minutes=length)
+
+    def db_free_ids(self, start, end):
+        slots = ParkingSlot.objects.filter(pk__in=[s.pk for s in self.slots])
+        return sorted(free_slots(slots, start, end).values_list('pk', flat=True))
+
+    def test_matches_database_on_step_boundaries(self):
+        index = SlotAvailabilityIndex.build(now=self.origin)
+        ids = [s.pk for s in self.slots]
+        for start, end in self.windows(step=5):
+            self.assertTrue(index.answers_exactly(start, end))
+            self.assertEqual(
+                sorted(index.free_slot_ids(start, end, ids)), self.db_free_ids(start, end), (start, end),
+            )
+
+    def test_never_reports_a_booked_slot_free(self):
+        index = SlotAvailabilityIndex.build(now=self.origin)
+        ids = [s.pk for s in self.slots]
+        offset = timedelta(minutes=2, seconds=30)
+        for start, end in self.windows(step=7):
+            start, end = start + offset, end + offset
+            self.assertFalse(index.answers_exactly(start, end))
+            self.assertLessEqual(set(index.free_slot_ids(start, end, ids)), set(self.db_free_ids(start, end)))
+
+    def test_queryset_helper_matches_free_slots(self):
+        availability_index._index = None
+        slots = ParkingSlot.objects.filter(pk__in=[s.pk for s in self.slots])
+        for start, end in ((self.origin + RESOLUTION, self.origin + 13 * RESOLUTION),
+                           (self.origin + timedelta(minutes=31), self.origin + timedelta(minutes=64))):
+            self.assertEqual(
+                sorted(free_slots_from_index(slots, start, end).values_list('pk', flat=True)),
+                self.db_free_ids(start, end),
+            )
+
+    def test_stale_index_never_shows_a_booked_slot_free(self):
+        availability_index._index = SlotAvailabilityIndex.build(version=availability_index.current_version())
+        start, end = self.origin + timedelta(hours=6), self.origin + timedelta(hours=7)
+        Booking.objects.create(user=self.user, slot=self.slots[5], start_time=start, end_time=end)
+        slots = ParkingSlot.objects.filter(pk__in=[s.pk for s in self.slots])
+        self.assertIn(self.slots[5].pk, availability_index._index.free_slot_ids(start, end))
+        self.assertNotIn(self.slots[5].pk, free_slots_from_index(slots, start, end).values_list('pk', flat=True))
+
+    def test_booking_changes_are_replayed_without_a_rebuild(self):
+        availability_index._index = None
+        index = availability_index.get_index()
+        start, end = self.origin + timedelta(hours=6), self.origin + timedelta(hours=7)
+        Booking.objects.create(user=self.user, slot=self.slots[5], start_time=start, end_time=end)
+        availability_index.bump_version([self.slots[5].pk])
+
+        replayed = availability_index.get_index()
+        self.assertIsNot(replayed, index)
+        self.assertEqual(replayed.built_at, index.built_at)
+        self.assertEqual(replayed.version, availability_index.current_version())
+        self.assertNotIn(self.slots[5].pk, replayed.free_slot_ids(start, end))
+        self.assertIn(self.slots[5].pk, index.free_slot_ids(start, end))
+
+    def test_slot_changes_rebuild(self):
+        availability_index._index = None
+        availability_index.get_index()
+        availability_index.bump_version()
+        with mock.patch.object(SlotAvailabilityIndex, 'build', wraps=SlotAvailabilityIndex.build) as build:
+            availability_index.get_index()
+        build.assert_called_once()
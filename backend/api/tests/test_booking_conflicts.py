@@ -0,0 +1,97 @@
+"""
+The booking conflict engine: availability checks, extension limits, batch
+checks and the exclusion constraint backing slot_write_lock().
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError
+from django.test import TestCase
+from django.utils import timezone
+
+from api.booking_conflicts import (
+    BookingConflictError, ensure_slot_available, find_batch_conflicts, get_extension_limit, is_slot_available,
+    slot_write_lock, slots_write_lock,
+)
+from api.models import Booking, ParkingSlot, User
+
+
+class BookingConflictTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.t = timezone.now().replace(microsecond=0) + timedelta(days=1)
+        cls.user = User.objects.create_user(username='conflicts', email='conflicts@example.com', password='x')
+        cls.slot = ParkingSlot.objects.create(slot_number='C1', floor='1', section='A')
+        cls.other_slot = ParkingSlot.objects.create(slot_number='C2', floor='1', section='A')
+        cls.booking = cls.book(cls.slot, 1, 2)
+        cls.later = cls.book(cls.slot, 4, 5)
+        cls.cancelled = cls.book(cls.slot, 2, 4, is_active=False)
+
+    @classmethod
+    def book(cls, slot, start_hours, end_hours, is_active=True):
+        return Booking.objects.create(
+            user=cls.user, slot=slot, is_active=is_active,
+            start_time=cls.t + timedelta(hours=start_hours), end_time=cls.t + timedelta(hours=end_hours),
+        )
+
+    def hours(self, start, end):
+        return self.t + timedelta(hours=start), self.t + timedelta(hours=end)
+
+    def test_is_slot_available(self):
+        for window, expected in (
+            ((0, 1), True),         # ends as the booking starts
+            ((2, 4), True),         # fills the gap exactly; the cancelled booking is ignored
+            ((0, 1.5), False),
+            ((1.5, 3), False),
+            ((1.25, 1.75), False),  # inside a booking
+            ((0, 6), False),        # covers both bookings
+            ((3, 4.5), False),
+            ((5, 6), True),
+        ):
+            self.assertEqual(is_slot_available(self.slot, *self.hours(*window)), expected, window)
+        self.assertTrue(is_slot_available(self.other_slot, *self.hours(0, 6)))
+
+    def test_is_slot_available_excluding_the_booking_being_changed(self):
+        self.assertFalse(is_slot_available(self.slot, *self.hours(1, 3)))
+        self.assertTrue(is_slot_available(self.slot, *self.hours(1, 3), exclude=self.booking))
+        self.assertTrue(is_slot_available(self.slot.pk, *self.hours(1, 3), exclude=self.booking.pk))
+        self.assertFalse(is_slot_available(self.slot, *self.hours(1, 4.5), exclude=self.booking))
+
+    def test_ensure_slot_available(self):
+        ensure_slot_available(self.slot, *self.hours(2, 4))
+        with self.assertRaises(BookingConflictError):
+            ensure_slot_available(self.slot, *self.hours(1, 3))
+
+    def test_get_extension_limit(self):
+        self.assertEqual(get_extension_limit(self.booking), self.later.start_time)
+        self.assertIsNone(get_extension_limit(self.later))
+
+    def test_constraint_violation_inside_lock_is_a_conflict(self):
+        with self.assertRaises(BookingConflictError):
+            with slot_write_lock(self.slot):
+                self.book(self.slot, 1.5, 3)
+        self.assertFalse(Booking.objects.filter(slot=self.slot, start_time=self.hours(1.5, 3)[0]).exists())
+
+    def test_touching_and_inactive_bookings_are_allowed_by_the_constraint(self):
+        with slot_write_lock(self.slot):
+            self.book(self.slot, 2, 3)
+            self.book(self.slot, 2.5, 4, is_active=False)
+        with slots_write_lock([self.other_slot, self.slot]):
+            self.book(self.other_slot, 1, 2)
+
+    def test_other_integrity_errors_pass_through(self):
+        with self.assertRaises(IntegrityError):
+            with slot_write_lock(self.slot):
+                User.objects.create_user(username='conflicts', email='dupe@example.com', password='x')
+
+    def test_find_batch_conflicts(self):
+        conflicts = find_batch_conflicts([
+            (self.slot, *self.hours(2, 3)),        # free
+            (self.slot, *self.hours(1.5, 2.5)),    # overlaps an existing booking
+            (self.slot, *self.hours(2.5, 4)),      # overlaps window 0
+            (self.other_slot, *self.hours(1, 2)),  # free
+            (self.other_slot, *self.hours(2, 3)),  # touches window 3
+        ])
+        self.assertEqual(set(conflicts), {1, 2})
+        self.assertEqual(conflicts[1], 'This time slot is already booked.')
+        self.assertEqual(conflicts[2], 'Overlaps another booking in this request.')
+        self.assertEqual(find_batch_conflicts([]), {})
@@ -0,0 +1,145 @@
+"""
+Incrementally maintained counters agree with their recompute/verify
+functions after booking creates, updates, deletes and bulk creates: user
+stats, unread notification counters, check-in rollups, revenue rollups and
+occupancy buckets.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.test import TestCase
+from django.utils import timezone
+
+from api import checkin_rollup, notification_counter, occupancy, revenue_rollup, user_stats
+from api.models import AuditLog, Booking, Notification, ParkingLot, ParkingSlot, User, Vehicle
+from api.signals import on_bookings_created
+
+
+class CounterConsistencyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='counters', email='counters@example.com', password='x')
+        cls.vehicle = Vehicle.objects.create(user=cls.user, vehicle_type='car', number_plate='KA01AB1234', model='Swift')
+        cls.lot = ParkingLot.objects.create(name='Central', address='1 Main St', latitude=12.97, longitude=77.59)
+        cls.other_lot = ParkingLot.objects.create(name='Annex', address='2 Main St', latitude=12.98, longitude=77.60)
+        cls.slot = ParkingSlot.objects.create(
+            parking_lot=cls.lot, slot_number='K1', floor='1', parking_zone='COLLEGE_PARKING_CENTER', vehicle_type='car',
+        )
+        cls.other_slot = ParkingSlot.objects.create(
+            parking_lot=cls.other_lot, slot_number='K2', floor='1', parking_zone='METRO_PARKING_CENTER', vehicle_type='any',
+        )
+
+    def setUp(self):
+        self.start = timezone.now().replace(microsecond=0) + timedelta(hours=1)
+        occupancy.extend()
+        # Rows that exist are maintained incrementally from here on
+        user_stats.get_stats(self.user)
+        notification_counter.get_counter(self.user)
+
+    def book(self, slot=None, hours=2, **fields):
+        return Booking.objects.create(
+            user=self.user, vehicle=self.vehicle, slot=slot or self.slot,
+            start_time=self.start, end_time=self.start + timedelta(hours=hours), total_price=Decimal('20.00'),
+            **fields
+        )
+
+    def log(self, booking, action):
+        return AuditLog.objects.create(booking=booking, user=self.user, action=action)
+
+    def assertCountersMatch(self):
+        self.assertEqual(user_stats.verify(), [])
+        self.assertEqual(notification_counter.reconcile(), [])
+        self.assertEqual(checkin_rollup.rebuild(verify_only=True)['mismatches'], [])
+        self.assertEqual(revenue_rollup.rebuild(verify_only=True)['mismatches'], [])
+        self.assertEqual(occupancy.rebuild(verify_only=True)['mismatches'], [])
+
+    def test_booking_lifecycle(self):
+        booking = self.book()
+        self.assertCountersMatch()
+
+        booking.end_time += timedelta(hours=1)
+        booking.save()
+        self.assertCountersMatch()
+
+        booking.status = 'checked_in'
+        booking.checked_in_at = self.start
+        booking.save()
+        self.log(booking, 'check_in_success')
+        self.log(booking, 'check_out_failed')
+        self.assertCountersMatch()
+
+        booking.status = 'checked_out'
+        booking.checked_out_at = self.start + timedelta(hours=2, minutes=30)
+        booking.is_active = False
+        booking.save()
+        self.log(booking, 'check_out_success')
+        self.assertCountersMatch()
+
+        # Later edits move revenue and stats but not the audit logs' rollups
+        booking.overstay_amount = Decimal('5.00')
+        booking.slot = self.other_slot
+        booking.checked_in_at = self.start + timedelta(minutes=10)
+        booking.save()
+        self.assertCountersMatch()
+
+        booking.audit_logs.filter(action='check_out_failed').delete()
+        self.assertCountersMatch()
+
+        booking.delete()
+        self.assertCountersMatch()
+        self.assertEqual(user_stats.get_stats(self.user).total_sessions, 0)
+
+    def test_cancelled_booking(self):
+        booking = self.book(slot=self.other_slot)
+        booking.status = 'cancelled'
+        booking.is_active = False
+        booking.save()
+        self.assertCountersMatch()
+
+    def test_bulk_created_bookings(self):
+        with transaction.atomic():
+            bookings = Booking.objects.bulk_create([
+                Booking(
+                    user=self.user, vehicle=self.vehicle, slot=slot, total_price=Decimal('10.00'),
+                    start_time=self.start + timedelta(hours=offset), end_time=self.start + timedelta(hours=offset + 1),
+                )
+                for offset, slot in enumerate([self.slot, self.other_slot, self.slot])
+            ])
+            ParkingSlot.objects.filter(pk__in={b.slot_id for b in bookings}).update(is_occupied=True)
+            on_bookings_created(bookings, occupied_slot_ids={b.slot_id for b in bookings})
+        self.assertCountersMatch()
+        self.assertEqual(user_stats.get_stats(self.user).lot_counts, {str(self.lot.pk): 2, str(self.other_lot.pk): 1})
+
+    def test_notifications(self):
+        notification = Notification.objects.create(
+            user=self.user, notification_type='system_alert', title='Hello', message='Hello',
+        )
+        self.assertCountersMatch()
+        notification.is_read = True
+        notification.save()
+        self.assertCountersMatch()
+
+        notifications = Notification.objects.bulk_create([
+            Notification(user=self.user, notification_type='system_alert', title='Bulk', message='Bulk')
+            for _ in range(3)
+        ])
+        notification_counter.add_notifications(notifications)
+        self.assertEqual(notification_counter.get_counter(self.user).unread_count, 3)
+
+        notification.delete()
+        notifications[0].delete()
+        self.assertCountersMatch()
+
+        notification_counter.mark_all_read(self.user)
+        self.assertCountersMatch()
+
+    def test_stats_row_built_after_bookings(self):
+        user = User.objects.create_user(username='late', email='late@example.com', password='x')
+        Booking.objects.create(
+            user=user, slot=self.slot, start_time=self.start, end_time=self.start + timedelta(hours=1),
+        )
+        stats = user_stats.get_stats(user)
+        self.assertEqual((stats.total_sessions, stats.lot_counts), (1, {str(self.lot.pk): 1}))
+        self.assertEqual(user_stats.as_response(stats, timezone.now())['favorite_location'], {'name': 'Central', 'count': 1})
+        self.assertCountersMatch()
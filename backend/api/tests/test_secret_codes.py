@@ -0,0 +1,61 @@
+"""
+Secret codes: the permutation is a bijection and recycled codes still held by
+a live booking are skipped.
+"""
+from datetime import timedelta
+from unittest import mock
+
+from django.db import IntegrityError
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from api import secret_code_utils
+from api.models import Booking, ParkingSlot, User
+from api.secret_code_utils import permute_secret_code, save_with_secret_code
+
+
+class PermutationTests(SimpleTestCase):
+    def test_distinct_values_give_distinct_codes(self):
+        codes = {permute_secret_code(value) for value in range(0, 10 ** 6, 37)}
+        self.assertEqual(len(codes), len(range(0, 10 ** 6, 37)))
+        self.assertTrue(all(len(code) == 6 and code.isdigit() for code in codes))
+
+
+class SaveWithSecretCodeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='codes', email='codes@example.com', password='x')
+        start = timezone.now()
+        cls.bookings = [
+            Booking.objects.create(
+                user=user, slot=ParkingSlot.objects.create(slot_number=f'S{i}', floor='1', section='A'),
+                start_time=start, end_time=start + timedelta(hours=1),
+            )
+            for i in range(2)
+        ]
+        cls.parked, cls.arriving = cls.bookings
+        cls.parked.status = 'checked_in'
+        cls.parked.secret_code = '123456'
+        cls.parked.save()
+
+    def test_skips_a_code_held_by_a_live_booking(self):
+        self.arriving.status = 'checked_in'
+        with mock.patch.object(secret_code_utils, 'generate_unique_secret_code', side_effect=['123456', '654321']):
+            code = save_with_secret_code(self.arriving)
+        self.assertEqual(code, '654321')
+        self.arriving.refresh_from_db()
+        self.assertEqual((self.arriving.status, self.arriving.secret_code), ('checked_in', '654321'))
+
+    def test_codes_of_finished_bookings_are_reused(self):
+        self.parked.status = 'checked_out'
+        self.parked.save()
+        self.arriving.status = 'checked_in'
+        with mock.patch.object(secret_code_utils, 'generate_unique_secret_code', return_value='123456'):
+            self.assertEqual(save_with_secret_code(self.arriving), '123456')
+
+    def test_gives_up_after_max_attempts(self):
+        self.arriving.status = 'checked_in'
+        with mock.patch.object(secret_code_utils, 'generate_unique_secret_code', return_value='123456') as generate:
+            with self.assertRaises(IntegrityError):
+                save_with_secret_code(self.arriving)
+        self.assertEqual(generate.call_count, secret_code_utils.MAX_SECRET_CODE_ATTEMPTS)
@@ -8,7 +8,7 @@ from .views import (
     AvailableParkingSlotsView, BookingCreateView, UserBookingListView, CancelBookingView,
     find_nearest_slot,VehicleListCreateView, VehicleRetrieveUpdateDestroyView,UserVehiclesView, BookingReportView,
     NotificationListView, NotificationMarkAsReadView, NotificationDeleteView, NotificationUnreadCountView,
-    MarkAllNotificationsAsReadView, SystemAlertCreateView, MaintenanceAlertCreateView, SystemNotificationStatusView,
+    MarkAllNotificationsAsReadView, BroadcastMarkAsReadView, BroadcastDeleteView, SystemAlertCreateView, MaintenanceAlertCreateView, SystemNotificationStatusView,
     APIRootView, SlotManagementView, BulkSlotUpdateView,
     CheckInView, CheckOutView, ActiveBookingView,
     NearestParkingView,  # NEW: Import the new view
@@ -17,10 +17,13 @@ from .views import (
 from .notification_public_views import PublicNotificationUnreadCountView
 from .receipt_views import GenerateReceiptView
 from .upcoming_views import UpcomingBookingsView
+from .availability_views import SlotAvailabilityView
 from .early_checkin import EarlyCheckInView
+from .bulk_booking import BulkBookingCreateView
 from . import access_log_views
 from . import checkin_checkout_log_views
 from . import user_history_views
+from . import export_job_views
 from .slot_tracking_views import SlotStatisticsView, DetailedSlotStatusView, SlotUpdatesView
 from .active_bookings_view import ActiveBookingsWithDetailsView
 
@@ -41,7 +44,8 @@ from .rate_views import (
     ActiveRatesView,
     SetDefaultRateView,
     CalculateParkingFeeView,
-    DefaultRatesByVehicleView
+    DefaultRatesByVehicleView,
+    QuoteCacheStatsView
 )
 
 # Long-Stay Vehicle Detection Views
@@ -81,10 +85,12 @@ urlpatterns = [
     path('auth/reset-password/<str:uidb64>/<str:token>/', PasswordResetConfirmView.as_view(), name='reset-password-confirm'),
 
     path('slots/available/', AvailableParkingSlotsView.as_view(), name='available-slots'),
+    path('slots/availability/', SlotAvailabilityView.as_view(), name='slot-availability'),
     path('slots/', ParkingSlotListCreateView.as_view(), name='slot-list-create'),
     path('slots/<int:pk>/', ParkingSlotRetrieveUpdateDestroyView.as_view(), name='slot-detail'),
 
     path('bookings/', BookingCreateView.as_view(), name='booking-create'),
+    path('bookings/bulk/', BulkBookingCreateView.as_view(), name='booking-bulk-create'),
     path('bookings/my/', UserBookingListView.as_view(), name='my-bookings'),
     path('bookings/active/', views.ActiveBookingView.as_view(), name='active-booking'),
     path('bookings/upcoming/', UpcomingBookingsView.as_view(), name='upcoming-bookings'),
@@ -131,6 +137,8 @@ urlpatterns = [
     path('notifications/mark_all_as_read/', MarkAllNotificationsAsReadView.as_view(), name='mark-all-notifications-read'),
     path('notifications/<int:pk>/read/', NotificationMarkAsReadView.as_view(), name='notification-mark-read'),
     path('notifications/<int:pk>/delete/', NotificationDeleteView.as_view(), name='notification-delete'),
+    path('notifications/broadcast-<int:pk>/read/', BroadcastMarkAsReadView.as_view(), name='broadcast-mark-read'),
+    path('notifications/broadcast-<int:pk>/delete/', BroadcastDeleteView.as_view(), name='broadcast-delete'),
     
     # System administration endpoints
     path('admin/system-alert/', SystemAlertCreateView.as_view(), name='system-alert-create'),
@@ -185,6 +193,11 @@ urlpatterns = [
     path('admin/user-history/<int:user_id>/stats/', user_history_views.admin_user_stats, name='admin-user-stats'),
     path('admin/users/', user_history_views.admin_users_list, name='admin-users-list'),
     
+    # Background export jobs (Admin only)
+    path('admin/exports/', export_job_views.ExportJobListCreateView.as_view(), name='export-job-list-create'),
+    path('admin/exports/<int:pk>/', export_job_views.ExportJobDetailView.as_view(), name='export-job-detail'),
+    path('admin/exports/<int:pk>/download/', export_job_views.ExportJobDownloadView.as_view(), name='export-job-download'),
+    
     # ============================================================================
     # PRICING RATE MANAGEMENT - Admin endpoints for managing parking rates
     # ============================================================================
@@ -194,6 +207,7 @@ urlpatterns = [
     path('admin/rates/<int:pk>/', PricingRateRetrieveUpdateDestroyView.as_view(), name='pricing-rate-detail'),
     path('admin/rates/<int:pk>/set-default/', SetDefaultRateView.as_view(), name='pricing-rate-set-default'),
     path('admin/rates/by-vehicle/<str:vehicle_type>/', PricingRateByVehicleTypeView.as_view(), name='pricing-rate-by-vehicle'),
+    path('admin/rates/quote-cache/', QuoteCacheStatsView.as_view(), name='quote-cache-stats'),
     
     # Public/User: View rates and calculate fees
     path('rates/active/', ActiveRatesView.as_view(), name='active-rates'),
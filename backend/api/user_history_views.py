@@ -10,13 +10,12 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-from django.db.models import Count, Sum, Avg, Q
+from django.db.models import Avg, Q
 from django.utils import timezone
 from datetime import timedelta, datetime
-from decimal import Decimal
-import csv
-from django.http import HttpResponse
 
+from . import user_stats
+from .csv_export import csv_response, export_rows
 from .models import Booking, User, AuditLog
 from .permissions import IsAdminUser
 from .serializers import (
@@ -160,6 +159,39 @@ def user_parking_history_detail(request, pk):
         )
 
 
+def _parking_stats(user, filters):
+    """
+    The user's stored stats row, or stats computed from their bookings when
+    a start_date/end_date (YYYY-MM-DD) window is requested
+    """
+    queryset = Booking.objects.filter(user=user)
+    windowed = False
+    
+    start_date = filters.get('start_date')
+    end_date = filters.get('end_date')
+    
+    if start_date:
+        try:
+            start_datetime = datetime.strptime(start_date, '%Y-%m-%d')
+            queryset = queryset.filter(start_time__gte=start_datetime)
+            windowed = True
+        except ValueError:
+            pass
+    
+    if end_date:
+        try:
+            end_datetime = datetime.strptime(end_date, '%Y-%m-%d')
+            end_datetime = end_datetime + timedelta(days=1)
+            queryset = queryset.filter(start_time__lt=end_datetime)
+            windowed = True
+        except ValueError:
+            pass
+    
+    if windowed:
+        return user_stats.compute(queryset, user.pk)
+    return user_stats.get_stats(user)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def user_parking_stats(request):
@@ -171,130 +203,8 @@ def user_parking_stats(request):
     - end_date: Calculate stats to date (YYYY-MM-DD)
     """
     try:
-        user = request.user
-        
-        # Base queryset
-        queryset = Booking.objects.filter(user=user)
-        
-        # Date range filter
-        filters = request.GET
-        start_date = filters.get('start_date')
-        end_date = filters.get('end_date')
-        
-        if start_date:
-            try:
-                start_datetime = datetime.strptime(start_date, '%Y-%m-%d')
-                queryset = queryset.filter(start_time__gte=start_datetime)
-            except ValueError:
-                pass
-        
-        if end_date:
-            try:
-                end_datetime = datetime.strptime(end_date, '%Y-%m-%d')
-                end_datetime = end_datetime + timedelta(days=1)
-                queryset = queryset.filter(start_time__lt=end_datetime)
-            except ValueError:
-                pass
-        
-        # Calculate statistics
-        total_sessions = queryset.count()
-        
-        # Total time parked (only completed sessions)
-        completed_bookings = queryset.filter(
-            status='checked_out',
-            checked_in_at__isnull=False,
-            checked_out_at__isnull=False
-        )
-        
-        total_minutes = 0
-        for booking in completed_bookings:
-            duration = booking.checked_out_at - booking.checked_in_at
-            total_minutes += int(duration.total_seconds() / 60)
-        
-        total_hours = total_minutes // 60
-        
-        # Total amount paid
-        total_amount = queryset.filter(
-            status='checked_out'
-        ).aggregate(
-            total=Sum('total_price')
-        )['total'] or Decimal('0.00')
-        
-        # Favorite location
-        location_stats = queryset.filter(
-            slot__parking_lot__isnull=False
-        ).values(
-            'slot__parking_lot__name'
-        ).annotate(
-            count=Count('id')
-        ).order_by('-count').first()
-        
-        favorite_location = None
-        if location_stats:
-            favorite_location = {
-                'name': location_stats['slot__parking_lot__name'],
-                'count': location_stats['count']
-            }
-        
-        # Most used vehicle
-        vehicle_stats = queryset.filter(
-            vehicle__isnull=False
-        ).values(
-            'vehicle__vehicle_type',
-            'vehicle__number_plate'
-        ).annotate(
-            count=Count('id')
-        ).order_by('-count').first()
-        
-        most_used_vehicle = None
-        if vehicle_stats:
-            most_used_vehicle = {
-                'type': vehicle_stats['vehicle__vehicle_type'],
-                'plate': vehicle_stats['vehicle__number_plate'],
-                'count': vehicle_stats['count']
-            }
-        
-        # Average duration
-        average_duration = total_minutes // total_sessions if total_sessions > 0 else 0
-        
-        # Average amount
-        average_amount = total_amount / total_sessions if total_sessions > 0 else Decimal('0.00')
-        
-        # This month's stats
-        now = timezone.now()
-        month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        month_bookings = queryset.filter(start_time__gte=month_start)
-        month_sessions = month_bookings.count()
-        month_amount = month_bookings.filter(
-            status='checked_out'
-        ).aggregate(
-            total=Sum('total_price')
-        )['total'] or Decimal('0.00')
-        
-        # Active vs completed sessions
-        active_sessions = queryset.filter(status__in=['confirmed', 'checked_in']).count()
-        completed_sessions = queryset.filter(status='checked_out').count()
-        
-        # Build response
-        stats_data = {
-            'total_sessions': total_sessions,
-            'total_time_parked': {
-                'minutes': total_minutes,
-                'formatted': f"{total_hours} hours"
-            },
-            'total_amount_paid': float(total_amount),
-            'favorite_location': favorite_location,
-            'most_used_vehicle': most_used_vehicle,
-            'average_duration_minutes': average_duration,
-            'average_amount': float(average_amount),
-            'this_month': {
-                'sessions': month_sessions,
-                'total_amount': float(month_amount)
-            },
-            'active_sessions': active_sessions,
-            'completed_sessions': completed_sessions
-        }
+        stats = _parking_stats(request.user, request.GET)
+        stats_data = user_stats.as_response(stats, timezone.now())
         
         return Response(stats_data)
     
@@ -317,9 +227,7 @@ def user_parking_history_export(request):
         user = request.user
         
         # Base queryset
-        queryset = Booking.objects.filter(user=user).select_related(
-            'user', 'slot', 'slot__parking_lot', 'vehicle'
-        ).order_by('-start_time')
+        queryset = Booking.objects.filter(user=user).order_by('-start_time')
         
         # Apply same filters as list endpoint
         filters = request.GET
@@ -336,7 +244,7 @@ def user_parking_history_export(request):
         
         if end_date:
             try:
-                end_datetime = datetime.strptime(end_date, '%Y-%m-% d')
+                end_datetime = datetime.strptime(end_date, '%Y-%m-%d')
                 end_datetime = end_datetime + timedelta(days=1)
                 queryset = queryset.filter(start_time__lt=end_datetime)
             except ValueError:
@@ -346,14 +254,7 @@ def user_parking_history_export(request):
         if location:
             queryset = queryset.filter(slot__parking_lot__name__icontains=location)
         
-        # Create CSV response
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="parking_history_{user.username}_{timezone.now().strftime("%Y%m%d")}.csv"'
-        
-        writer = csv.writer(response)
-        
-        # Write header
-        writer.writerow([
+        header = [
             'Booking ID',
             'Vehicle Type',
             'Vehicle Plate',
@@ -366,36 +267,45 @@ def user_parking_history_export(request):
             'Duration',
             'Amount',
             'Status'
-        ])
+        ]
+        fields = (
+            'id', 'vehicle__vehicle_type', 'vehicle__number_plate', 'slot__parking_lot__name',
+            'slot__section', 'slot__floor', 'slot__slot_number',
+            'checked_in_at', 'start_time', 'checked_out_at', 'total_price', 'status',
+        )
         
-        # Write data rows
-        for booking in queryset:
-            check_in = booking.checked_in_at or booking.start_time
-            check_out = booking.checked_out_at
+        def format_row(values):
+            (booking_id, vehicle_type, number_plate, lot_name, section, floor, slot_number,
+             checked_in_at, start_time, check_out, total_price, booking_status) = values
+            check_in = checked_in_at or start_time
             
             # Calculate duration
             duration = 'N/A'
             if check_in and check_out:
-                delta = check_out - check_in
-                minutes = int(delta.total_seconds() / 60)
-                hours = minutes // 60
-                mins = minutes % 60
-                duration = f"{hours}h {mins}m"
+                minutes = int((check_out - check_in).total_seconds() / 60)
+                duration = f"{minutes // 60}h {minutes % 60}m"
             
-            writer.writerow([
-                booking.id,
-                booking.vehicle.vehicle_type if booking.vehicle else 'N/A',
-                booking.vehicle.number_plate if booking.vehicle else 'N/A',
-                booking.slot.parking_lot.name if booking.slot and booking.slot.parking_lot else 'Unknown',
-                booking.slot.section if booking.slot else 'N/A',
-                booking.slot.floor if booking.slot else 'N/A',
-                booking.slot.slot_number if booking.slot else 'N/A',
+            return [
+                booking_id,
+                vehicle_type if vehicle_type is not None else 'N/A',
+                number_plate if number_plate is not None else 'N/A',
+                lot_name if lot_name is not None else 'Unknown',
+                section,
+                floor,
+                slot_number,
                 check_in.strftime('%Y-%m-%d %H:%M:%S') if check_in else 'N/A',
                 check_out.strftime('%Y-%m-%d %H:%M:%S') if check_out else 'N/A',
                 duration,
-                float(booking.total_price) if booking.total_price else 0.00,
-                booking.status
-            ])
+                float(total_price) if total_price else 0.00,
+                booking_status
+            ]
+        
+        response = csv_response(
+            request,
+            f'parking_history_{user.username}_{timezone.now().strftime("%Y%m%d")}',
+            header,
+            export_rows(queryset, fields, format_row),
+        )
         
         return response
     
@@ -517,122 +427,14 @@ def admin_user_stats(request, user_id):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # Calculate stats (reuse logic from user_parking_stats)
-        queryset = Booking.objects.filter(user=target_user)
-        
-        # Date range filter
-        filters = request.GET
-        start_date = filters.get('start_date')
-        end_date = filters.get('end_date')
-        
-        if start_date:
-            try:
-                start_datetime = datetime.strptime(start_date, '%Y-%m-%d')
-                queryset = queryset.filter(start_time__gte=start_datetime)
-            except ValueError:
-                pass
-        
-        if end_date:
-            try:
-                end_datetime = datetime.strptime(end_date, '%Y-%m-%d')
-                end_datetime = end_datetime + timedelta(days=1)
-                queryset = queryset.filter(start_time__lt=end_datetime)
-            except ValueError:
-                pass
-        
-        # Calculate statistics (same logic as user stats)
-        total_sessions = queryset.count()
-        
-        completed_bookings = queryset.filter(
-            status='checked_out',
-            checked_in_at__isnull=False,
-            checked_out_at__isnull=False
-        )
-        
-        total_minutes = 0
-        for booking in completed_bookings:
-            duration = booking.checked_out_at - booking.checked_in_at
-            total_minutes += int(duration.total_seconds() / 60)
-        
-        total_hours = total_minutes // 60
-        
-        total_amount = queryset.filter(
-            status='checked_out'
-        ).aggregate(
-            total=Sum('total_price')
-        )['total'] or Decimal('0.00')
-        
-        location_stats = queryset.filter(
-            slot__parking_lot__isnull=False
-        ).values(
-            'slot__parking_lot__name'
-        ).annotate(
-            count=Count('id')
-        ).order_by('-count').first()
-        
-        favorite_location = None
-        if location_stats:
-            favorite_location = {
-                'name': location_stats['slot__parking_lot__name'],
-                'count': location_stats['count']
-            }
-        
-        vehicle_stats = queryset.filter(
-            vehicle__isnull=False
-        ).values(
-            'vehicle__vehicle_type',
-            'vehicle__number_plate'
-        ).annotate(
-            count=Count('id')
-        ).order_by('-count').first()
-        
-        most_used_vehicle = None
-        if vehicle_stats:
-            most_used_vehicle = {
-                'type': vehicle_stats['vehicle__vehicle_type'],
-                'plate': vehicle_stats['vehicle__number_plate'],
-                'count': vehicle_stats['count']
-            }
-        
-        average_duration = total_minutes // total_sessions if total_sessions > 0 else 0
-        average_amount = total_amount / total_sessions if total_sessions > 0 else Decimal('0.00')
-        
-        now = timezone.now()
-        month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        month_bookings = queryset.filter(start_time__gte=month_start)
-        month_sessions = month_bookings.count()
-        month_amount = month_bookings.filter(
-            status='checked_out'
-        ).aggregate(
-            total=Sum('total_price')
-        )['total'] or Decimal('0.00')
-        
-        active_sessions = queryset.filter(status__in=['confirmed', 'checked_in']).count()
-        completed_sessions = queryset.filter(status='checked_out').count()
-        
+        stats = _parking_stats(target_user, request.GET)
         stats_data = {
             'user': {
                 'id': target_user.id,
                 'username': target_user.username,
                 'email': target_user.email
             },
-            'total_sessions': total_sessions,
-            'total_time_parked': {
-                'minutes': total_minutes,
-                'formatted': f"{total_hours} hours"
-            },
-            'total_amount_paid': float(total_amount),
-            'favorite_location': favorite_location,
-            'most_used_vehicle': most_used_vehicle,
-            'average_duration_minutes': average_duration,
-            'average_amount': float(average_amount),
-            'this_month': {
-                'sessions': month_sessions,
-                'total_amount': float(month_amount)
-            },
-            'active_sessions': active_sessions,
-            'completed_sessions': completed_sessions
+            **user_stats.as_response(stats, timezone.now())
         }
         
         return Response(stats_data)
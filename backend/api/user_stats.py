@@ -0,0 +1,227 @@
+"""
+Per-user parking statistics.
+
+UserParkingStats holds one row per user with session counts, minutes parked,
+amount paid, monthly buckets and favourite lot / vehicle counters, so the
+user and admin stats endpoints read a single row instead of aggregating the
+user's whole booking history.
+
+The row is kept up to date incrementally: the Booking pre_save/post_save and
+pre_delete/post_delete receivers in api/signals.py compare what the booking
+contributed before and after the write and move the difference under a row
+lock, in the same transaction as the checkout. A user's row is created from
+scratch the first time their stats are read. Writers and that first read
+both lock the user row first, so a booking committed while the row is being
+built is either seen by the build or applied to the new row, never lost.
+`verify()` recomputes every row from raw bookings; run it with
+`manage.py verify_user_stats`.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+
+from .models import Booking, ParkingLot, User, UserParkingStats
+
+ZERO = Decimal('0.00')
+ACTIVE_STATUSES = ('confirmed', 'checked_in')
+ROW_FIELDS = (
+    'user_id', 'status', 'start_time', 'checked_in_at', 'checked_out_at', 'total_price',
+    'slot__parking_lot_id', 'vehicle_id', 'vehicle__vehicle_type', 'vehicle__number_plate',
+)
+COUNTERS = ('total_sessions', 'active_sessions', 'completed_sessions', 'total_minutes', 'total_paid')
+STORED_FIELDS = COUNTERS + ('monthly', 'lot_counts', 'vehicle_counts')
+
+
+def contribution_from_row(row):
+    """
+    What a booking (as a ROW_FIELDS tuple) adds to its user's stats:
+    (user_id, month, active, completed, minutes, amount, lot id, vehicle)
+    """
+    (user_id, status, start_time, checked_in_at, checked_out_at, total_price,
+     lot_id, vehicle_id, vehicle_type, number_plate) = row
+    completed = status == 'checked_out'
+    minutes = 0
+    if completed and checked_in_at is not None and checked_out_at is not None:
+        minutes = int((checked_out_at - checked_in_at).total_seconds() / 60)
+    return (
+        user_id,
+        start_time.strftime('%Y-%m') if start_time else None,
+        status in ACTIVE_STATUSES,
+        completed,
+        minutes,
+        Decimal(total_price or 0) if completed else ZERO,
+        str(lot_id) if lot_id is not None else None,
+        (str(vehicle_id), vehicle_type, number_plate) if vehicle_id else None,
+    )
+
+
+def stored_contribution(pk):
+    """The contribution of the booking row currently stored in the database"""
+    row = Booking.objects.filter(pk=pk).values_list(*ROW_FIELDS).first()
+    return contribution_from_row(row) if row is not None else None
+
+
+def _bump(counts, key, sign):
+    counts[key] = counts.get(key, 0) + sign
+    if not counts[key]:
+        del counts[key]
+
+
+def apply_contribution(stats, contribution, sign):
+    """Add (sign=1) or remove (sign=-1) one booking's contribution, in memory"""
+    _, month, active, completed, minutes, amount, lot_id, vehicle = contribution
+    stats.total_sessions += sign
+    stats.active_sessions += sign * active
+    stats.completed_sessions += sign * completed
+    stats.total_minutes += sign * minutes
+    stats.total_paid = Decimal(stats.total_paid) + sign * amount
+
+    if month is not None:
+        bucket = stats.monthly.setdefault(month, {'sessions': 0, 'amount': '0.00'})
+        bucket['sessions'] += sign
+        bucket['amount'] = str(Decimal(bucket['amount']) + sign * amount)
+        if not bucket['sessions']:
+            del stats.monthly[month]
+    if lot_id is not None:
+        _bump(stats.lot_counts, lot_id, sign)
+    if vehicle is not None:
+        vehicle_id, vehicle_type, number_plate = vehicle
+        entry = stats.vehicle_counts.setdefault(vehicle_id, {'type': vehicle_type, 'plate': number_plate, 'count': 0})
+        entry.update(type=vehicle_type, plate=number_plate, count=entry['count'] + sign)
+        if not entry['count']:
+            del stats.vehicle_counts[vehicle_id]
+
+
+def _lock_users(user_ids):
+    """
+    Lock the users' rows until the transaction ends; serialises stats
+    writers with get_stats() building a missing row
+    """
+    list(User.objects.select_for_update().filter(pk__in=user_ids).order_by('pk').values_list('pk', flat=True))
+
+
+def move_booking(before, after):
+    """Move a booking's contribution from its old state to its new one"""
+    if before == after:
+        return
+    user_ids = {c[0] for c in (before, after) if c is not None}
+    with transaction.atomic():
+        _lock_users(user_ids)
+        # Users whose row does not exist yet get it built from scratch on first read
+        for stats in UserParkingStats.objects.select_for_update().filter(user_id__in=user_ids).order_by('pk'):
+            if before is not None and before[0] == stats.user_id:
+                apply_contribution(stats, before, -1)
+            if after is not None and after[0] == stats.user_id:
+                apply_contribution(stats, after, 1)
+            stats.save()
+
+
+def add_bookings(bookings):
+    """Count bookings created without signals (bulk_create) in their users' stats"""
+    rows = Booking.objects.filter(pk__in=[b.pk for b in bookings]).values_list(*ROW_FIELDS)
+    contributions = [contribution_from_row(row) for row in rows]
+    with transaction.atomic():
+        user_ids = {c[0] for c in contributions}
+        _lock_users(user_ids)
+        for stats in UserParkingStats.objects.select_for_update().filter(user_id__in=user_ids).order_by('pk'):
+            for contribution in contributions:
+                if contribution[0] == stats.user_id:
+                    apply_contribution(stats, contribution, 1)
+            stats.save()
+
+
+def compute(bookings, user_id=None):
+    """Unsaved UserParkingStats for a booking queryset, built from one query"""
+    stats = UserParkingStats(user_id=user_id, monthly={}, lot_counts={}, vehicle_counts={})
+    for row in bookings.values_list(*ROW_FIELDS).iterator():
+        apply_contribution(stats, contribution_from_row(row), 1)
+    return stats
+
+
+def get_stats(user):
+    """The user's stats row, built from their bookings if it does not exist yet"""
+    stats = UserParkingStats.objects.filter(user=user).first()
+    if stats is None:
+        with transaction.atomic():
+            # Wait for writers of this user's bookings, then count what they committed
+            _lock_users([user.pk])
+            stats = UserParkingStats.objects.filter(user=user).first()
+            if stats is None:
+                built = compute(Booking.objects.filter(user=user), user.pk)
+                stats = UserParkingStats.objects.create(
+                    user=user, **{field: getattr(built, field) for field in STORED_FIELDS},
+                )
+    return stats
+
+
+def as_response(stats, now):
+    """The stats payload returned by the user and admin stats endpoints"""
+    total_sessions = stats.total_sessions
+    total_paid = Decimal(stats.total_paid)
+
+    favorite_location = None
+    if stats.lot_counts:
+        names = dict(ParkingLot.objects.filter(pk__in=[int(pk) for pk in stats.lot_counts]).values_list('pk', 'name'))
+        lots = [(count, names[int(pk)]) for pk, count in stats.lot_counts.items() if int(pk) in names]
+        if lots:
+            count, name = max(lots)
+            favorite_location = {'name': name, 'count': count}
+
+    most_used_vehicle = None
+    if stats.vehicle_counts:
+        vehicle = max(stats.vehicle_counts.values(), key=lambda entry: entry['count'])
+        most_used_vehicle = {'type': vehicle['type'], 'plate': vehicle['plate'], 'count': vehicle['count']}
+
+    this_month = stats.monthly.get(now.strftime('%Y-%m'), {'sessions': 0, 'amount': '0.00'})
+    return {
+        'total_sessions': total_sessions,
+        'total_time_parked': {
+            'minutes': stats.total_minutes,
+            'formatted': f"{stats.total_minutes // 60} hours"
+        },
+        'total_amount_paid': float(total_paid),
+        'favorite_location': favorite_location,
+        'most_used_vehicle': most_used_vehicle,
+        'average_duration_minutes': stats.total_minutes // total_sessions if total_sessions > 0 else 0,
+        'average_amount': float(total_paid / total_sessions) if total_sessions > 0 else 0.0,
+        'this_month': {
+            'sessions': this_month['sessions'],
+            'total_amount': float(Decimal(this_month['amount']))
+        },
+        'active_sessions': stats.active_sessions,
+        'completed_sessions': stats.completed_sessions
+    }
+
+
+def _snapshot(stats):
+    return (
+        tuple(getattr(stats, field) for field in COUNTERS[:4]) + (Decimal(stats.total_paid),),
+        {month: (b['sessions'], Decimal(b['amount'])) for month, b in stats.monthly.items()},
+        stats.lot_counts,
+        stats.vehicle_counts,
+    )
+
+
+def verify(fix=False):
+    """
+    Recompute every stored row from raw bookings.
+
+    Returns:
+        list of (user_id, stored, expected) for the rows that drifted, where
+        stored and expected are (counters, monthly, lot_counts, vehicle_counts)
+    """
+    mismatches = []
+    for stats in UserParkingStats.objects.order_by('pk').iterator():
+        with transaction.atomic():
+            stored = UserParkingStats.objects.select_for_update().filter(pk=stats.pk).first()
+            if stored is None:
+                continue
+            expected = compute(Booking.objects.filter(user_id=stored.user_id), stored.user_id)
+            if _snapshot(stored) == _snapshot(expected):
+                continue
+            mismatches.append((stored.user_id, _snapshot(stored), _snapshot(expected)))
+            if fix:
+                for field in STORED_FIELDS:
+                    setattr(stored, field, getattr(expected, field))
+                stored.save()
+    return mismatches
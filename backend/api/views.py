@@ -1,13 +1,11 @@
-import math
 import time
 from functools import wraps
-from geopy.distance import geodesic
 
 from django.conf import settings
 from django.contrib.auth import authenticate, get_user_model
 from django.contrib.auth.tokens import default_token_generator
 from django.core.cache import cache
-from django.db import models
+from django.db import models, transaction
 from django.db.models import Count, Q
 from django.http import JsonResponse
 from django.utils import timezone
@@ -20,9 +18,14 @@ from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 
-from .models import Booking, Notification, ParkingLot, ParkingSlot, Vehicle, AuditLog
+from . import broadcasts, event_bus, notification_counter, occupancy, occupancy_snapshot
+from .models import Booking, BroadcastNotification, Notification, ParkingLot, ParkingSlot, Vehicle, AuditLog, RevenueRollup
+from .booking_conflicts import BookingConflictError, ensure_slot_available, slot_write_lock
+from .geo_index import nearest_lots
+from .occupancy_snapshot import get_snapshot
+from .slot_locator import nearest_free_slots
 from .permissions import IsAdminUser, IsCustomerUser, IsSecurityUser
-from .pricing import calculate_booking_price, calculate_extension_price
+from .pricing import calculate_extension_price, quote_booking_prices
 from .serializers import (
     AdminParkingSlotSerializer,
     BookingSerializer,
@@ -48,7 +51,6 @@ from .notification_utils import (
 from .utils import (
     is_within_parking_area,
     validate_location_data,
-    COLLEGE_PARKING_CENTER,
 )
 
 User = get_user_model()
@@ -125,13 +127,18 @@ class APIRootView(APIView):
             }
         })
 
-def create_system_notification(notification_type, title, message, users=None):
+def create_system_notification(notification_type, title, message, users=None, audience='all', created_by=None):
     """
     Helper function to create system-wide or user-specific notifications
+
+    Without users, a single broadcast is stored for the audience ('all',
+    'customers', 'admins' or 'security') and merged into each user's feed at
+    read time (see api/broadcasts.py). With users, one row is created per user.
     """
     if users is None:
-        # Create for all active users if no specific users provided
-        users = User.objects.filter(is_active=True)
+        return broadcasts.create_broadcast(
+            notification_type, title, message, audience=audience, created_by=created_by
+        )
     
     notifications = []
     for user in users:
@@ -147,6 +154,10 @@ def create_system_notification(notification_type, title, message, users=None):
     # Bulk create for efficiency
     if notifications:
         Notification.objects.bulk_create(notifications)
+        # bulk_create skips signals, so count them in the unread counters here
+        notification_counter.add_notifications(notifications)
+        for notification in notifications:
+            event_bus.notification_created(notification)
 
 def check_and_notify_booking_expiry():
     """
@@ -186,12 +197,10 @@ def create_emergency_alert(title, message):
     """
     Create an emergency system alert for all users
     """
-    users = User.objects.filter(is_active=True)
     create_system_notification(
         notification_type='system_alert',
         title=f"🚨 EMERGENCY: {title}",
-        message=message,
-        users=users
+        message=message
     )
 
 def create_scheduled_maintenance_alert(maintenance_date, duration_hours=2):
@@ -205,12 +214,10 @@ def create_scheduled_maintenance_alert(maintenance_date, duration_hours=2):
     
     end_time = maintenance_date + timedelta(hours=duration_hours)
     
-    users = User.objects.filter(is_active=True)
     create_system_notification(
         notification_type='maintenance',
         title='Scheduled System Maintenance',
-        message=f'System maintenance is scheduled from {maintenance_date.strftime("%Y-%m-%d %H:%M")} to {end_time.strftime("%Y-%m-%d %H:%M")}. Some services may be temporarily unavailable.',
-        users=users
+        message=f'System maintenance is scheduled from {maintenance_date.strftime("%Y-%m-%d %H:%M")} to {end_time.strftime("%Y-%m-%d %H:%M")}. Some services may be temporarily unavailable.'
     )
 
 def create_system_status_alert(service_name, status, message=None):
@@ -232,12 +239,10 @@ def create_system_status_alert(service_name, status, message=None):
     
     final_message = message if message else default_message
     
-    users = User.objects.filter(is_active=True)
     create_system_notification(
         notification_type=notification_type,
         title=title,
-        message=final_message,
-        users=users
+        message=final_message
     )
 
 class UserVehiclesView(generics.ListAPIView):
@@ -681,22 +686,17 @@ class AvailableParkingSlotsView(generics.ListAPIView):
         queryset = self.get_queryset()
         serializer = self.get_serializer(queryset, many=True)
         
-        # Add summary statistics
-        vehicle_type_counts = {}
-        for slot in queryset:
-            v_type = slot.vehicle_type
-            if v_type not in vehicle_type_counts:
-                vehicle_type_counts[v_type] = 0
-            vehicle_type_counts[v_type] += 1
+        # Add summary statistics (grouped in the database; the total is their sum)
+        vehicle_type_counts = dict(
+            queryset.order_by().values('vehicle_type').annotate(count=Count('id')).values_list('vehicle_type', 'count')
+        )
         
         return Response({
             'slots': serializer.data,
-            'total_available': queryset.count(),
+            'total_available': sum(vehicle_type_counts.values()),
             'available_by_type': vehicle_type_counts
         })
 
-from .pricing import calculate_booking_price, calculate_extension_price
-
 class PricePreviewView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -704,10 +704,19 @@ class PricePreviewView(APIView):
         serializer = PricePreviewSerializer(data=request.data)
         if serializer.is_valid():
             data = serializer.validated_data
-            price = calculate_booking_price(
-                data['start_time'], data['end_time'], data['vehicle_type']
-            )
-            return Response({'estimated_price': price})
+            slot = data.get('slot')
+            quote = quote_booking_prices([(
+                data['start_time'], data['end_time'], data['vehicle_type'],
+                slot.parking_zone if slot else None,
+                slot.parking_lot_id if slot else None,
+            )])[0]
+            return Response({
+                'estimated_price': quote['price'],
+                'base_price': quote['base_price'],
+                'multiplier': quote['multiplier'],
+                'occupancy_percent': quote['occupancy_percent'],
+                'dynamic_rule': quote['dynamic_rule'],
+            })
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class BookingCreateView(generics.CreateAPIView):
@@ -779,16 +788,26 @@ class ExtendBookingView(APIView):
         # Calculate extension price
         extension_price = calculate_extension_price(booking, new_end_time)
         
-        # Update booking
-        booking.end_time = new_end_time
-        booking.total_price += extension_price
-        booking.extension_count += 1
-        booking.extension_history.append({
-            'extended_at': timezone.now().isoformat(),
-            'new_end_time': new_end_time.isoformat(),
-            'additional_cost': str(extension_price)
-        })
-        booking.save()
+        try:
+            # Re-check under the slot lock so a concurrent booking cannot slip in
+            with slot_write_lock(booking.slot):
+                ensure_slot_available(booking.slot, booking.end_time, new_end_time, exclude=booking)
+                
+                # Update booking
+                booking.end_time = new_end_time
+                booking.total_price += extension_price
+                booking.extension_count += 1
+                booking.extension_history.append({
+                    'extended_at': timezone.now().isoformat(),
+                    'new_end_time': new_end_time.isoformat(),
+                    'additional_cost': str(extension_price)
+                })
+                booking.save()
+        except BookingConflictError:
+            return Response(
+                {"new_end_time": ["Cannot extend, slot is booked by another user."]},
+                status=status.HTTP_409_CONFLICT
+            )
         
         # Use our enhanced notification system
         
@@ -1282,44 +1301,38 @@ class ParkingLotsByLocationView(generics.ListAPIView):
         if not lat or not lon:
             return ParkingLot.objects.none()
 
+        radius = self.request.query_params.get('radius')
+        limit = self.request.query_params.get('limit')
         try:
             user_location = (float(lat), float(lon))
+            radius = float(radius) if radius else None  # Optional radius in km
+            limit = int(limit) if limit else None       # Optional maximum number of results
         except (ValueError, TypeError):
             return ParkingLot.objects.none()
 
-        parking_lots = ParkingLot.objects.all()
-        
-        # Sort parking lots by distance
-        sorted_lots = sorted(
-            parking_lots,
-            key=lambda lot: geodesic(user_location, (lot.latitude, lot.longitude)).kilometers
-        )
-        
-        return sorted_lots
+        # Every lot sorted by distance; a radius or limit narrows the search
+        # to a bounding-box range scan
+        return nearest_lots(*user_location, limit=limit, radius_km=radius)
 
     def list(self, request, *args, **kwargs):
         queryset = self.get_queryset()
         serializer = self.get_serializer(queryset, many=True)
         
         # Add distance to each parking lot in the response
-        lat = request.query_params.get('lat')
-        lon = request.query_params.get('lon')
-        user_location = (float(lat), float(lon))
-
         response_data = []
-        for lot_data in serializer.data:
-            lot_location = (float(lot_data['latitude']), float(lot_data['longitude']))
-            distance = geodesic(user_location, lot_location).kilometers
-            lot_data['distance'] = f"{distance:.2f} km"
+        for lot, lot_data in zip(queryset, serializer.data):
+            lot_data['distance'] = f"{lot.distance_km:.2f} km"
             response_data.append(lot_data)
             
         return Response(response_data)
 
 def find_nearest_slot(request):
     """
-    Finds the nearest unoccupied parking slot to a given point.
+    Finds the nearest unoccupied parking slots to a given point.
     Expects 'lat' and 'lon' as query parameters.
-    Optionally accepts 'vehicle_type' to filter compatible slots.
+    Optionally accepts 'vehicle_type' to filter compatible slots, 'zone' and
+    'floor' to narrow the search, and 'k' (1-50, default 1) for the number
+    of slots returned in 'nearest_slots'.
     """
     try:
         # Entry point or user's current location from query params
@@ -1334,60 +1347,60 @@ def find_nearest_slot(request):
     except (TypeError, ValueError):
         return JsonResponse({'error': 'Invalid position coordinates. Please provide lat and lon parameters.'}, status=400)
 
+    try:
+        k = min(max(int(request.GET.get('k', 1)), 1), 50)
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'k must be an integer between 1 and 50.'}, status=400)
+
     # Get vehicle type filter
     vehicle_type = request.GET.get('vehicle_type')
     
-    # Filter available slots
-    available_slots = ParkingSlot.objects.filter(is_occupied=False)
-    
+    # Compatible slot types: the requested type, else the user's vehicle types
+    vehicle_types = None
     if vehicle_type:
-        # Filter by vehicle type compatibility
-        available_slots = available_slots.filter(
-            models.Q(vehicle_type=vehicle_type) | models.Q(vehicle_type='any')
-        )
+        vehicle_types = {vehicle_type, 'any'}
     elif request.user.is_authenticated:
-        # Filter by user's vehicle types
-        user_vehicle_types = request.user.vehicle_set.values_list('vehicle_type', flat=True)
+        user_vehicle_types = set(request.user.vehicle_set.values_list('vehicle_type', flat=True))
         if user_vehicle_types:
-            q_filter = models.Q(vehicle_type='any')
-            for v_type in user_vehicle_types:
-                q_filter |= models.Q(vehicle_type=v_type)
-            available_slots = available_slots.filter(q_filter)
+            vehicle_types = user_vehicle_types | {'any'}
+
+    # k nearest free slots from the in-process grid index
+    nearest = nearest_free_slots(
+        current_lat, current_lon, k=k,
+        vehicle_types=vehicle_types,
+        parking_zone=request.GET.get('zone') or None,
+        floor=request.GET.get('floor') or None,
+    )
+    # Re-check occupancy: the index can lag a write made by another process
+    slots = ParkingSlot.objects.filter(is_occupied=False).in_bulk([slot_id for _, slot_id in nearest])
+    nearest = [(distance, slots[slot_id]) for distance, slot_id in nearest if slot_id in slots]
 
-    if not available_slots.exists():
+    if not nearest:
         return JsonResponse({
             'message': 'No available parking slots at the moment for your vehicle type.' if vehicle_type else 'No available parking slots at the moment.',
             'vehicle_type_requested': vehicle_type
         }, status=404)
 
-    nearest_slot = None
-    min_distance = float('inf')
-
-    for slot in available_slots:
-        # Simple Euclidean distance calculation using lat/lon coordinates
-        distance = math.sqrt((slot.pos_x - current_lat)**2 + (slot.pos_y - current_lon)**2)
-        if distance < min_distance:
-            min_distance = distance
-            nearest_slot = slot
-
-    if nearest_slot:
-        slot_data = {
-            'slot_id': nearest_slot.id,
-            'slot_number': nearest_slot.slot_number,
-            'floor': nearest_slot.floor,
-            'section': nearest_slot.section,
-            'vehicle_type': nearest_slot.vehicle_type,
-            'vehicle_type_display': nearest_slot.get_vehicle_type_display(),
-            'pos_x': nearest_slot.pos_x,
-            'pos_y': nearest_slot.pos_y,
-            'lat': nearest_slot.pos_x,
-            'lon': nearest_slot.pos_y,
-            'distance': round(min_distance, 2),
+    def slot_data(slot, distance):
+        return {
+            'slot_id': slot.id,
+            'slot_number': slot.slot_number,
+            'floor': slot.floor,
+            'section': slot.section,
+            'vehicle_type': slot.vehicle_type,
+            'vehicle_type_display': slot.get_vehicle_type_display(),
+            'pos_x': slot.pos_x,
+            'pos_y': slot.pos_y,
+            'lat': slot.pos_x,
+            'lon': slot.pos_y,
+            'distance': round(distance, 2),
             'is_compatible': True  # Since we filtered by compatibility
         }
-        return JsonResponse(slot_data)
-    else:
-        return JsonResponse({'message': 'Could not determine the nearest slot.'}, status=500)
+
+    # Nearest slot at the top level (as before), all k in 'nearest_slots'
+    response = slot_data(nearest[0][1], nearest[0][0])
+    response['nearest_slots'] = [slot_data(slot, distance) for distance, slot in nearest]
+    return JsonResponse(response)
 
 
 class NotificationListView(generics.ListAPIView):
@@ -1400,6 +1413,19 @@ class NotificationListView(generics.ListAPIView):
         """
         return Notification.objects.filter(user=self.request.user)
 
+    def list(self, request, *args, **kwargs):
+        """
+        The user's own notifications merged with the broadcasts targeted at them, newest first.
+        """
+        notifications = self.get_serializer(self.get_queryset(), many=True).data
+        user_data = UserSerializer(request.user).data
+        feed = list(notifications) + [
+            broadcasts.as_notification(broadcast, user_data)
+            for broadcast in broadcasts.visible_broadcasts(request.user)
+        ]
+        feed.sort(key=lambda item: item['created_at'], reverse=True)
+        return Response(feed)
+
 class NotificationMarkAsReadView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -1427,15 +1453,48 @@ class NotificationDeleteView(generics.DestroyAPIView):
         return Notification.objects.filter(user=self.request.user)
 
 
+class BroadcastMarkAsReadView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, pk):
+        """
+        Mark a broadcast notification as read for the current user.
+        """
+        if not broadcasts.mark_read(request.user, pk):
+            return Response({"error": "Notification not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class BroadcastDeleteView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def delete(self, request, pk):
+        """
+        Remove a broadcast notification from the current user's feed.
+        """
+        if not broadcasts.delete_for_user(request.user, pk):
+            return Response({"error": "Notification not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
 class NotificationUnreadCountView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request):
         """
         Return the count of unread notifications for the current user.
+        Polls sending the last ETag in If-None-Match get 304 while it is unchanged.
         """
-        count = Notification.objects.filter(user=request.user, is_read=False).count()
-        return Response({"unread_count": count}, status=status.HTTP_200_OK)
+        counter = notification_counter.get_counter(request.user)
+        tag = notification_counter.etag(counter)
+        if notification_counter.if_none_match(request, tag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            count = max(counter.unread_count, 0) + broadcasts.unread_count(request.user)
+            response = Response({"unread_count": count}, status=status.HTTP_200_OK)
+        response["ETag"] = tag
+        response["Cache-Control"] = "private, no-cache"
+        return response
 
 
 class MarkAllNotificationsAsReadView(APIView):
@@ -1445,7 +1504,8 @@ class MarkAllNotificationsAsReadView(APIView):
         """
         Mark all notifications as read for the current user.
         """
-        Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+        notification_counter.mark_all_read(request.user)
+        broadcasts.mark_all_read(request.user)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -1459,7 +1519,7 @@ class SystemAlertCreateView(APIView):
         """
         title = request.data.get('title')
         message = request.data.get('message')
-        target_users = request.data.get('target_users', 'all')  # 'all', 'customers', 'admins'
+        target_users = request.data.get('target_users', 'all')  # 'all', 'customers', 'admins', 'security'
         
         if not title or not message:
             return Response(
@@ -1467,23 +1527,22 @@ class SystemAlertCreateView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Determine target user groups
-        if target_users == 'customers':
-            users = User.objects.filter(role='customer', is_active=True)
-        elif target_users == 'admins':
-            users = User.objects.filter(role='admin', is_active=True)
-        elif target_users == 'security':
-            users = User.objects.filter(role='security', is_active=True)
-        else:  # 'all' or any other value defaults to all users
-            users = User.objects.filter(is_active=True)
+        # Any unknown group defaults to all users
+        if target_users not in broadcasts.AUDIENCES:
+            target_users = 'all'
         
-        create_system_notification(
+        broadcast = create_system_notification(
             notification_type='system_alert',
             title=title,
             message=message,
-            users=users
+            audience=target_users,
+            created_by=request.user
         )
         
+        users = User.objects.filter(is_active=True)
+        if broadcast.audience_role:
+            users = users.filter(role=broadcast.audience_role)
+        
         return Response({
             "message": f"System alert created for {users.count()} users."
         }, status=status.HTTP_201_CREATED)
@@ -1515,17 +1574,15 @@ class MaintenanceAlertCreateView(APIView):
             message += f" Starting at {maintenance_start}."
         
         # Send to all active users
-        users = User.objects.filter(is_active=True)
-        
         create_system_notification(
             notification_type='maintenance',
             title=title,
             message=message,
-            users=users
+            created_by=request.user
         )
         
         return Response({
-            "message": f"Maintenance alert created for {users.count()} users."
+            "message": f"Maintenance alert created for {User.objects.filter(is_active=True).count()} users."
         }, status=status.HTTP_201_CREATED)
 
 
@@ -1552,9 +1609,19 @@ class SystemNotificationStatusView(APIView):
         
         recent_notifications_data = NotificationSerializer(recent_system_notifications, many=True).data
         
+        # System alerts and maintenance notices are stored once per audience
+        broadcast_stats = BroadcastNotification.objects.values('notification_type', 'audience_role').annotate(
+            total=Count('id')
+        ).order_by('-total')
+        recent_broadcasts = BroadcastNotification.objects.values(
+            'id', 'notification_type', 'title', 'message', 'audience_role', 'created_at'
+        )[:10]
+        
         return Response({
             "notification_stats": list(notification_stats),
             "recent_system_notifications": recent_notifications_data,
+            "broadcast_stats": list(broadcast_stats),
+            "recent_broadcasts": list(recent_broadcasts),
             "total_users": User.objects.filter(is_active=True).count()
         }, status=status.HTTP_200_OK)
 
@@ -1605,6 +1672,8 @@ class BulkSlotUpdateView(APIView):
         
         # Update slots
         updated_count = ParkingSlot.objects.filter(id__in=slot_ids).update(vehicle_type=vehicle_type)
+        # update() skips the post_save receivers that refresh the dashboard snapshot
+        transaction.on_commit(occupancy_snapshot.bump_version)
         
         return Response({
             'message': f'Successfully updated {updated_count} slots to {vehicle_type} type',
@@ -1616,25 +1685,28 @@ class SlotStatisticsView(APIView):
     permission_classes = [permissions.IsAuthenticated, IsAdminUser]
     
     def get(self, request):
-        
+        snapshot = get_snapshot()
         
         # Get slot counts by vehicle type
-        slot_stats = ParkingSlot.objects.values('vehicle_type').annotate(
-            total_slots=Count('id'),
-            occupied_slots=Count('id', filter=Q(is_occupied=True)),
-            available_slots=Count('id', filter=Q(is_occupied=False))
-        )
+        slot_stats = [
+            {
+                'vehicle_type': vehicle_type,
+                'total_slots': counts['total'],
+                'occupied_slots': counts['occupied'],
+                'available_slots': counts['available'],
+            }
+            for vehicle_type, counts in snapshot.breakdown('vehicle_type').items()
+        ]
         
         # Get booking statistics by vehicle type
-        booking_stats = Booking.objects.filter(is_active=True).values(
-            'vehicle__vehicle_type'
-        ).annotate(
-            active_bookings=Count('id')
-        )
+        booking_stats = [
+            {'vehicle__vehicle_type': vehicle_type, 'active_bookings': count}
+            for vehicle_type, count in snapshot.active_bookings_by_vehicle_type().items()
+        ]
         
         return Response({
-            'slot_statistics': list(slot_stats),
-            'booking_statistics': list(booking_stats)
+            'slot_statistics': slot_stats,
+            'booking_statistics': booking_stats
         })
 
 
@@ -1648,6 +1720,8 @@ class NearestParkingView(APIView):
     - latitude (required): User's current latitude
     - longitude (required): User's current longitude
     - max_results (optional): Maximum number of locations to return (default: 10)
+    - start_time, end_time (optional): Booking window; availability is then the
+      forecast for that window (peak booked slots, next 14 days)
     
     Returns:
     - List of parking locations sorted by distance (nearest first)
@@ -1700,6 +1774,15 @@ class NearestParkingView(APIView):
                 'details': str(e)
             }, status=status.HTTP_400_BAD_REQUEST)
         
+        # Optional booking window: report forecast availability for it
+        try:
+            window = occupancy.parse_window(request.query_params)
+        except ValueError as e:
+            return Response({
+                'error': 'Invalid booking window',
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
         # Get nearest parking locations
         try:
             from .utils import get_nearest_parking_locations
@@ -1707,7 +1790,8 @@ class NearestParkingView(APIView):
             nearest_locations = get_nearest_parking_locations(
                 user_lat, 
                 user_lon, 
-                max_results
+                max_results,
+                window
             )
             
             # Serialize the data
@@ -1751,15 +1835,18 @@ class RevenueManagementView(APIView):
             zone_filter = request.GET.get('zone')
             vehicle_type_filter = request.GET.get('vehicle_type')
 
-            # Base query - only checked out bookings
+            # Totals come from the daily revenue rollups (see revenue_rollup);
+            # only the recent transactions list reads bookings
             bookings = Booking.objects.filter(status='checked_out')
+            rollups = RevenueRollup.objects.filter(booking_count__gt=0)
 
-            # Apply date filters
+            # Apply date filters (rollups are per day)
             if start_date:
                 from datetime import datetime
                 try:
                     start_dt = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
                     bookings = bookings.filter(checked_out_at__gte=start_dt)
+                    rollups = rollups.filter(day__gte=start_dt.date())
                 except ValueError:
                     pass
 
@@ -1768,74 +1855,68 @@ class RevenueManagementView(APIView):
                 try:
                     end_dt = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
                     bookings = bookings.filter(checked_out_at__lte=end_dt)
+                    rollups = rollups.filter(day__lte=end_dt.date())
                 except ValueError:
                     pass
 
             # Apply zone filter
             if zone_filter:
                 bookings = bookings.filter(slot__parking_zone=zone_filter)
+                rollups = rollups.filter(parking_zone=zone_filter)
 
             # Apply vehicle type filter
             if vehicle_type_filter:
                 bookings = bookings.filter(vehicle__vehicle_type=vehicle_type_filter)
+                rollups = rollups.filter(vehicle_type=vehicle_type_filter)
 
-            # Calculate total revenue
             from django.db.models import Sum
-            
-            total_booking_revenue = bookings.aggregate(
-                total=Sum('total_price')
-            )['total'] or 0
-            
-            total_overstay_revenue = bookings.aggregate(
-                total=Sum('overstay_amount')
-            )['total'] or 0
-            
-            total_revenue = float(total_booking_revenue) + float(total_overstay_revenue)
 
-            # Calculate today's revenue
             today = timezone.now().date()
-            today_bookings = bookings.filter(checked_out_at__date=today)
-            today_booking_revenue = today_bookings.aggregate(total=Sum('total_price'))['total'] or 0
-            today_overstay_revenue = today_bookings.aggregate(total=Sum('overstay_amount'))['total'] or 0
-            today_revenue = float(today_booking_revenue) + float(today_overstay_revenue)
-
-            # Calculate current month's revenue
             current_month = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            month_bookings = bookings.filter(checked_out_at__gte=current_month)
-            month_booking_revenue = month_bookings.aggregate(total=Sum('total_price'))['total'] or 0
-            month_overstay_revenue = month_bookings.aggregate(total=Sum('overstay_amount'))['total'] or 0
-            month_revenue = float(month_booking_revenue) + float(month_overstay_revenue)
-
-            # Calculate percentage growth (month over previous month)
-            from datetime import timedelta
             # Get first day of previous month
             if current_month.month == 1:
                 prev_month_start = current_month.replace(year=current_month.year - 1, month=12)
             else:
                 prev_month_start = current_month.replace(month=current_month.month - 1)
-            prev_month_bookings = Booking.objects.filter(
-                status='checked_out',
-                checked_out_at__gte=prev_month_start,
-                checked_out_at__lt=current_month
+
+            # Total, today's and current month's revenue in one query
+            is_today = Q(day=today)
+            in_month = Q(day__gte=current_month.date())
+            totals = rollups.aggregate(
+                booking=Sum('booking_revenue'),
+                overstay=Sum('overstay_revenue'),
+                today_booking=Sum('booking_revenue', filter=is_today),
+                today_overstay=Sum('overstay_revenue', filter=is_today),
+                month_booking=Sum('booking_revenue', filter=in_month),
+                month_overstay=Sum('overstay_revenue', filter=in_month),
             )
-            prev_month_booking_revenue = prev_month_bookings.aggregate(total=Sum('total_price'))['total'] or 0
-            prev_month_overstay_revenue = prev_month_bookings.aggregate(total=Sum('overstay_amount'))['total'] or 0
-            prev_month_revenue = float(prev_month_booking_revenue) + float(prev_month_overstay_revenue)
+            total_booking_revenue = totals['booking'] or 0
+            total_overstay_revenue = totals['overstay'] or 0
+            total_revenue = float(total_booking_revenue) + float(total_overstay_revenue)
+            today_revenue = float(totals['today_booking'] or 0) + float(totals['today_overstay'] or 0)
+            month_revenue = float(totals['month_booking'] or 0) + float(totals['month_overstay'] or 0)
+
+            # Calculate percentage growth (month over previous month, all zones and vehicle types)
+            prev_month = RevenueRollup.objects.filter(
+                day__gte=prev_month_start.date(),
+                day__lt=current_month.date()
+            ).aggregate(booking=Sum('booking_revenue'), overstay=Sum('overstay_revenue'))
+            prev_month_revenue = float(prev_month['booking'] or 0) + float(prev_month['overstay'] or 0)
             
             percentage = 0
             if prev_month_revenue > 0:
                 percentage = ((month_revenue - prev_month_revenue) / prev_month_revenue) * 100
 
             # Revenue by zone
-            zone_stats = bookings.values('slot__parking_zone').annotate(
-                bookings_count=Count('id'),
-                zone_booking_revenue=Sum('total_price'),
-                zone_overstay_revenue=Sum('overstay_amount')
+            zone_stats = rollups.values('parking_zone').annotate(
+                bookings_count=Sum('booking_count'),
+                zone_booking_revenue=Sum('booking_revenue'),
+                zone_overstay_revenue=Sum('overstay_revenue')
             ).order_by('-zone_booking_revenue')
 
             by_zone = []
             for stat in zone_stats:
-                zone_name = stat['slot__parking_zone']
+                zone_name = stat['parking_zone'] or None
                 # Get zone display name
                 zone_display = dict(ParkingSlot.PARKING_ZONE_CHOICES).get(zone_name, zone_name)
                 
@@ -1850,15 +1931,15 @@ class RevenueManagementView(APIView):
                 })
 
             # Revenue by vehicle type
-            vehicle_stats = bookings.values('vehicle__vehicle_type').annotate(
-                vehicle_count=Count('id'),
-                vehicle_booking_revenue=Sum('total_price'),
-                vehicle_overstay_revenue=Sum('overstay_amount')
+            vehicle_stats = rollups.values('vehicle_type').annotate(
+                vehicle_count=Sum('booking_count'),
+                vehicle_booking_revenue=Sum('booking_revenue'),
+                vehicle_overstay_revenue=Sum('overstay_revenue')
             ).order_by('-vehicle_booking_revenue')
 
             by_vehicle_type = []
             for stat in vehicle_stats:
-                vehicle_type = stat['vehicle__vehicle_type'] or 'Unknown'
+                vehicle_type = stat['vehicle_type'] or 'Unknown'
                 booking_rev = float(stat['vehicle_booking_revenue'] or 0)
                 overstay_rev = float(stat['vehicle_overstay_revenue'] or 0)
                 
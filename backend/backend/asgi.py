@@ -0,0 +1,37 @@
+"""
+ASGI config for backend project.
+
+Serves only the Server-Sent Events stream (api/event_stream.py); every other
+path gets a 404. The API itself stays on WSGI (backend/wsgi.py): Django 4.1
+runs sync views under ASGI one at a time on a single thread per worker, and
+iterates streaming bodies such as the CSV exports on the event loop. Run the
+two side by side and route /api/events/ to this one, e.g.
+
+    gunicorn backend.wsgi:application --workers 4
+    uvicorn backend.asgi:application --workers 2
+"""
+import json
+import os
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+django.setup(set_prefix=False)
+
+from api.event_stream import EVENT_STREAM_PATH, event_stream_app  # noqa: E402  (needs apps loaded)
+
+NOT_FOUND = json.dumps({'success': False, 'error': 'Not found'}).encode()
+
+
+async def application(scope, receive, send):
+    if scope['type'] != 'http':
+        return
+    if scope['path'] == EVENT_STREAM_PATH:
+        await event_stream_app(scope, receive, send)
+        return
+    await send({
+        'type': 'http.response.start',
+        'status': 404,
+        'headers': [(b'content-type', b'application/json; charset=utf-8')],
+    })
+    await send({'type': 'http.response.body', 'body': NOT_FOUND})
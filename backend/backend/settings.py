@@ -2,8 +2,11 @@ import os
 from pathlib import Path
 from decouple import config, Config, RepositoryEnv  # Import config and Config, RepositoryEnv from python-decouple
 
-# Create a custom config that reads from .env file
-config = Config(RepositoryEnv(os.path.join(Path(__file__).resolve().parent.parent, '.env')))
+# Create a custom config that reads from .env file when there is one;
+# otherwise decouple's config reads the environment
+ENV_FILE = os.path.join(Path(__file__).resolve().parent.parent, '.env')
+if os.path.exists(ENV_FILE):
+    config = Config(RepositoryEnv(ENV_FILE))
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -29,6 +32,27 @@ DATABASES = {
     }
 }
 
+# Cache shared by every worker process. Cached indexes and tables (pricing,
+# availability, geofences, ...) are invalidated by bumping a version key in
+# this cache, so it must not be per-process memory. Redis when REDIS_URL is
+# set (needs the redis package), otherwise a database table created with
+# `python manage.py createcachetable`.
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+        }
+    }
+
 # REQUIRED to fix admin + middleware errors
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
@@ -68,6 +92,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     'rest_framework',
     'rest_framework_simplejwt',
@@ -0,0 +1,14 @@
+"""
+WSGI config for backend project.
+
+It exposes the WSGI callable as a module-level variable named ``application``.
+Serves the whole API, e.g. gunicorn backend.wsgi:application; the live event
+stream runs separately under ASGI (backend/asgi.py).
+"""
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+application = get_wsgi_application()